@@ -8,7 +8,12 @@ from flask_migrate import upgrade, init, stamp
 
 from app.extensions import db, socketio, migrate
 from app.repositories.playlist_repository import PlaylistRepository
+from app.services.download_services.partial_download_service import PartialDownloadService
 from app.workers.download_worker import DownloadManager
+from app.workers.job_manager import JobManager
+from app.workers.library_watcher import LibraryWatcher
+from app.workers.sync_scheduler import SyncScheduler
+from app.workers.transcode_pool import TranscodePool
 from app.database_migrator import DatabaseMigrator
 from config import Config
 
@@ -82,10 +87,27 @@ def create_app(app_config=Config):
     if not app.config.get("TESTING"):
         os.makedirs(os.path.join(os.getcwd(), app.config.get("DOWNLOAD_FOLDER")), exist_ok=True)
 
+    app.transcode_pool = TranscodePool(app.config.get("TRANSCODE_WORKERS"))
     app.download_manager = DownloadManager(app)
+    app.job_manager = JobManager(app)
+
+    app.library_watcher = None
+    if app.config.get("LIBRARY_WATCHER_ENABLED") and not app.config.get("TESTING"):
+        app.library_watcher = LibraryWatcher(app)
+        app.library_watcher.start()
+
+    app.sync_scheduler = SyncScheduler(app)
+    if app.config.get("SYNC_SCHEDULER_ENABLED") and not app.config.get("TESTING"):
+        app.sync_scheduler.start()
 
     with app.app_context():
         PlaylistRepository.reset_download_statuses_to_ready()
+        if not app.config.get("TESTING"):
+            # Nothing is downloading yet, so partial files are either resumable or left over
+            try:
+                PartialDownloadService.clean_stale_partials()
+            except Exception as e:
+                logger.error(f"Failed to clean partial downloads: {e}")
 
     return app
 
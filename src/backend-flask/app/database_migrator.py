@@ -68,6 +68,36 @@ class DatabaseMigrator:
                 conn.commit()
                 logger.info("Applied migration: convert_absolute_paths_to_relative")
             
+            if 'add_content_hash_to_tracks' not in applied_migrations:
+                DatabaseMigrator._add_content_hash_to_tracks(conn, cursor)
+                cursor.execute("INSERT INTO migration_history (migration_name) VALUES ('add_content_hash_to_tracks')")
+                conn.commit()
+                logger.info("Applied migration: add_content_hash_to_tracks")
+
+            if 'add_download_retry_state' not in applied_migrations:
+                DatabaseMigrator._add_download_retry_state(conn, cursor)
+                cursor.execute("INSERT INTO migration_history (migration_name) VALUES ('add_download_retry_state')")
+                conn.commit()
+                logger.info("Applied migration: add_download_retry_state")
+
+            if 'add_partial_downloads' not in applied_migrations:
+                DatabaseMigrator._add_partial_downloads_table(conn, cursor)
+                cursor.execute("INSERT INTO migration_history (migration_name) VALUES ('add_partial_downloads')")
+                conn.commit()
+                logger.info("Applied migration: add_partial_downloads")
+
+            if 'add_track_duration' not in applied_migrations:
+                DatabaseMigrator._add_track_duration(conn, cursor)
+                cursor.execute("INSERT INTO migration_history (migration_name) VALUES ('add_track_duration')")
+                conn.commit()
+                logger.info("Applied migration: add_track_duration")
+
+            if 'add_sync_schedule' not in applied_migrations:
+                DatabaseMigrator._add_sync_schedule(conn, cursor)
+                cursor.execute("INSERT INTO migration_history (migration_name) VALUES ('add_sync_schedule')")
+                conn.commit()
+                logger.info("Applied migration: add_sync_schedule")
+            
             conn.close()
             logger.info("Database migration completed successfully")
             
@@ -200,4 +230,89 @@ class DatabaseMigrator:
                 logger.error(f"Error converting path for track {track_id}: {e}")
         
         conn.commit()
-        logger.info(f"Converted {tracks_updated} track paths from absolute to relative format")
\ No newline at end of file
+        logger.info(f"Converted {tracks_updated} track paths from absolute to relative format")
+
+    @staticmethod
+    def _add_content_hash_to_tracks(conn, cursor):
+        """Add content_hash field to tracks table, and index it and download_url for deduplication lookups"""
+        cursor.execute("PRAGMA table_info(tracks)")
+        columns = {row[1] for row in cursor.fetchall()}
+
+        if 'content_hash' not in columns:
+            cursor.execute("ALTER TABLE tracks ADD COLUMN content_hash TEXT")
+        cursor.execute("CREATE INDEX IF NOT EXISTS ix_tracks_content_hash ON tracks(content_hash)")
+        cursor.execute("CREATE INDEX IF NOT EXISTS ix_tracks_download_url ON tracks(download_url)")
+        conn.commit()
+        logger.info("Added content_hash field to tracks table")
+
+    @staticmethod
+    def _add_download_retry_state(conn, cursor):
+        """Add the download retry fields to the tracks table, and the download_attempts history table"""
+        cursor.execute("PRAGMA table_info(tracks)")
+        columns = {row[1] for row in cursor.fetchall()}
+
+        if 'download_attempts' not in columns:
+            cursor.execute("ALTER TABLE tracks ADD COLUMN download_attempts INTEGER NOT NULL DEFAULT 0")
+        if 'error_category' not in columns:
+            cursor.execute("ALTER TABLE tracks ADD COLUMN error_category TEXT")
+        if 'next_retry_at' not in columns:
+            cursor.execute("ALTER TABLE tracks ADD COLUMN next_retry_at DATETIME")
+        if 'dead_lettered' not in columns:
+            cursor.execute("ALTER TABLE tracks ADD COLUMN dead_lettered BOOLEAN NOT NULL DEFAULT 0")
+
+        cursor.execute('''
+        CREATE TABLE IF NOT EXISTS download_attempts (
+            id INTEGER PRIMARY KEY,
+            track_id INTEGER NOT NULL,
+            attempted_at DATETIME,
+            error_category VARCHAR NOT NULL,
+            error_message TEXT,
+            FOREIGN KEY (track_id) REFERENCES tracks (id) ON DELETE CASCADE
+        )
+        ''')
+        cursor.execute("CREATE INDEX IF NOT EXISTS ix_download_attempts_track_id ON download_attempts(track_id)")
+        conn.commit()
+        logger.info("Added download retry fields to tracks table")
+
+    @staticmethod
+    def _add_partial_downloads_table(conn, cursor):
+        """Add the partial_downloads table, tracking downloads in progress so they can be resumed"""
+        cursor.execute('''
+        CREATE TABLE IF NOT EXISTS partial_downloads (
+            id INTEGER PRIMARY KEY,
+            track_id INTEGER NOT NULL UNIQUE,
+            file_stem VARCHAR NOT NULL,
+            source_url VARCHAR NOT NULL,
+            started_at DATETIME,
+            FOREIGN KEY (track_id) REFERENCES tracks (id) ON DELETE CASCADE
+        )
+        ''')
+        conn.commit()
+        logger.info("Added partial_downloads table")
+
+    @staticmethod
+    def _add_track_duration(conn, cursor):
+        """Add the duration field to the tracks table"""
+        cursor.execute("PRAGMA table_info(tracks)")
+        columns = {row[1] for row in cursor.fetchall()}
+        if 'duration' not in columns:
+            cursor.execute("ALTER TABLE tracks ADD COLUMN duration INTEGER")
+            conn.commit()
+        logger.info("Added duration field to tracks table")
+
+    @staticmethod
+    def _add_sync_schedule(conn, cursor):
+        """Add the automatic sync interval fields to the playlists and folders tables"""
+        cursor.execute("PRAGMA table_info(playlists)")
+        columns = {row[1] for row in cursor.fetchall()}
+        if 'sync_interval' not in columns:
+            cursor.execute("ALTER TABLE playlists ADD COLUMN sync_interval INTEGER")
+        if 'next_sync_at' not in columns:
+            cursor.execute("ALTER TABLE playlists ADD COLUMN next_sync_at DATETIME")
+
+        cursor.execute("PRAGMA table_info(folders)")
+        columns = {row[1] for row in cursor.fetchall()}
+        if 'sync_interval' not in columns:
+            cursor.execute("ALTER TABLE folders ADD COLUMN sync_interval INTEGER")
+        conn.commit()
+        logger.info("Added sync interval fields to playlists and folders tables")
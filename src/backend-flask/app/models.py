@@ -16,6 +16,7 @@ class Folder(db.Model):
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     disabled = db.Column(db.Boolean, default=True)
     expanded = db.Column(db.Boolean, default=True)
+    sync_interval = db.Column(db.Integer, nullable=True)  # Minutes between automatic syncs of its playlists
 
     # Relationship to allow nesting folders (subfolders)
     subfolders = db.relationship(
@@ -44,6 +45,7 @@ class Folder(db.Model):
             'created_at': self.created_at.isoformat() if self.created_at else None,
             'disabled': self.disabled,
             'expanded': self.expanded,
+            'sync_interval': self.sync_interval,
             'subfolders': [subfolder.to_dict() for subfolder in self.subfolders],
             'playlists': [playlist.to_dict() for playlist in self.playlists],
             'children_count': self.children_count(),
@@ -68,6 +70,8 @@ class Playlist(db.Model):
     download_progress = db.Column(db.Integer, default=0)
     date_limit = db.Column(db.DateTime, nullable=True)  # Only sync/download tracks added after this date
     track_limit = db.Column(db.Integer, nullable=True)  # Maximum number of tracks to sync/download
+    sync_interval = db.Column(db.Integer, nullable=True)  # Minutes between automatic syncs, else its folder's
+    next_sync_at = db.Column(db.DateTime, nullable=True)  # When the next automatic sync is due, see SyncScheduler
     
     folder_id = db.Column(db.Integer, db.ForeignKey('folders.id'), nullable=True)
     custom_order = db.Column(db.Integer, nullable=False, default=0)
@@ -100,6 +104,8 @@ class Playlist(db.Model):
             'download_progress': 0, #self.download_progress,
             'date_limit': self.date_limit.isoformat() if self.date_limit else None,
             'track_limit': self.track_limit,
+            'sync_interval': self.sync_interval,
+            'next_sync_at': self.next_sync_at.isoformat() if self.next_sync_at else None,
             'folder_id': self.folder_id,
             'custom_order': self.custom_order,
         }
@@ -112,11 +118,18 @@ class Track(db.Model):
     platform = db.Column(db.String, nullable=False)
     name = db.Column(db.String, nullable=False)
     artist = db.Column(db.String, nullable=False)
-    download_url = db.Column(db.String, nullable=True)
+    download_url = db.Column(db.String, nullable=True, index=True)
     download_location = db.Column(db.String, nullable=True)
+    content_hash = db.Column(db.String, nullable=True, index=True)  # Hash of the audio, excluding tags
     album = db.Column(db.String, nullable=True)
     album_art_url = db.Column(db.String, nullable=True)
+    duration = db.Column(db.Integer, nullable=True)  # Seconds, if the platform gives it
     notes_errors = db.Column(db.Text)
+    # Download retry state, see DownloadRetryService
+    download_attempts = db.Column(db.Integer, nullable=False, default=0)  # Failed attempts since the last success
+    error_category = db.Column(db.String, nullable=True)  # Category of the last failure
+    next_retry_at = db.Column(db.DateTime, nullable=True)  # Syncs skip the track until then
+    dead_lettered = db.Column(db.Boolean, nullable=False, default=False)  # Given up on until retried manually
 
     __table_args__ = (
         db.UniqueConstraint('platform', 'platform_id', name='uq_platform_track'),)  # Prevent duplicate tracks
@@ -135,9 +148,9 @@ class Track(db.Model):
         else:
             self.download_location = None
             
-    def is_downloaded(self):
-        """Check if the track is already downloaded."""
-        return FileDownloadUtils.is_track_already_downloaded(self.download_location)
+    def is_downloaded(self, library_index=None):
+        """Check if the track is already downloaded, optionally against a LibraryIndex of the download folder."""
+        return FileDownloadUtils.is_track_already_downloaded(self.download_location, library_index)
 
     def to_dict(self):
         return {
@@ -148,9 +161,33 @@ class Track(db.Model):
             'artist': self.artist,
             'album': self.album,
             'album_art_url': self.album_art_url,
+            'duration': self.duration,
             'download_url': self.download_url,
             'download_location': self.absolute_download_path,
             'notes_errors': self.notes_errors,
+            'download_attempts': self.download_attempts,
+            'error_category': self.error_category,
+            'next_retry_at': self.next_retry_at.isoformat() if self.next_retry_at else None,
+            'dead_lettered': self.dead_lettered,
+        }
+
+
+class DownloadAttempt(db.Model):
+    """A failed attempt to download a track, kept as the track's retry history."""
+    __tablename__ = 'download_attempts'
+    id = db.Column(db.Integer, primary_key=True)
+    track_id = db.Column(db.Integer, db.ForeignKey('tracks.id', ondelete="CASCADE"), nullable=False, index=True)
+    attempted_at = db.Column(db.DateTime, default=datetime.utcnow)
+    error_category = db.Column(db.String, nullable=False)
+    error_message = db.Column(db.Text)
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'track_id': self.track_id,
+            'attempted_at': self.attempted_at.isoformat() if self.attempted_at else None,
+            'error_category': self.error_category,
+            'error_message': self.error_message,
         }
 
 
@@ -168,3 +205,25 @@ class PlaylistTrack(db.Model):
     __table_args__ = (
         db.UniqueConstraint('playlist_id', 'track_id',
                             name='uq_playlist_track'),)  # Avoid duplicate track in a playlist
+
+
+class PartialDownload(db.Model):
+    """A track download in progress, so its partial files can be resumed after a crash or cleaned up."""
+    __tablename__ = 'partial_downloads'
+    id = db.Column(db.Integer, primary_key=True)
+    track_id = db.Column(db.Integer, db.ForeignKey('tracks.id', ondelete="CASCADE"), nullable=False, unique=True)
+    file_stem = db.Column(db.String, nullable=False)  # Relative to the download folder, without extension
+    source_url = db.Column(db.String, nullable=False)
+    started_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    @property
+    def absolute_file_stem(self):
+        return FileDownloadUtils.get_absolute_path(self.file_stem)
+
+    def to_dict(self):
+        return {
+            'track_id': self.track_id,
+            'file_stem': self.absolute_file_stem,
+            'source_url': self.source_url,
+            'started_at': self.started_at.isoformat() if self.started_at else None,
+        }
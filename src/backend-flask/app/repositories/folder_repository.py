@@ -1,6 +1,9 @@
 import logging
+from collections import defaultdict
 from datetime import datetime
-from typing import List, Optional, Dict, Any, Tuple, Set
+from typing import List, Optional, Dict, Any, Tuple, Set, Iterator, Union
+
+from sqlalchemy.orm import selectinload
 
 from app.extensions import db, socketio
 from app.models import Playlist, PlaylistTrack, Track, Folder
@@ -119,48 +122,67 @@ class FolderRepository:
         return True
 
     @staticmethod
-    def get_playlists_in_custom_order(enabled_only=True) -> List[Playlist]:
+    def load_folder_tree(with_tracks: bool = False) -> 'FolderTree':
         """
-        Retrieve all playlists ordered by custom_order within folders hierarchy.
+        Load the whole folder/playlist hierarchy with two flat queries and build it into an ordered tree.
+
+        :param with_tracks: Also eager load each playlist's tracks (in a constant number of extra queries)
         """
-        ordered_playlists: List[Playlist] = []
+        folders = Folder.query.all()
 
-        # Fetch root-level folders and playlists
-        root_folders = Folder.query.filter_by(parent_id=None).order_by(Folder.custom_order).all()
-        root_playlists = Playlist.query.filter_by(folder_id=None).order_by(Playlist.custom_order).all()
+        playlist_query = Playlist.query
+        if with_tracks:
+            playlist_query = playlist_query.options(selectinload(Playlist.tracks).selectinload(PlaylistTrack.track))
+        playlists = playlist_query.all()
 
-        # Combine and sort items by custom_order
-        items = []
-        for folder in root_folders:
-            items.append((folder.custom_order, 'folder', folder))
-        for pl in root_playlists:
-            items.append((pl.custom_order, 'playlist', pl))
+        return FolderTree(folders, playlists)
 
-        for _, item_type, item in sorted(items, key=lambda x: x[0]):
-            if item_type == 'playlist':
-                ordered_playlists.append(item)
-            else:
-                FolderRepository._traverse_folder(item, ordered_playlists)
+    @staticmethod
+    def get_playlists_in_custom_order(enabled_only=True) -> List[Playlist]:
+        """
+        Retrieve all playlists ordered by custom_order within folders hierarchy.
+        """
+        ordered_playlists = list(FolderRepository.load_folder_tree().iter_playlists())
 
         if enabled_only:
             ordered_playlists = [playlist for playlist in ordered_playlists if not playlist.disabled]
 
         return ordered_playlists
 
-    @staticmethod
-    def _traverse_folder(folder: Folder, ordered_playlists: List[Playlist]) -> None:
+
+class FolderTree:
+    """
+    In-memory ordered tree of folders and playlists.
+
+    Children of each folder (and of the root, keyed None) are folders and playlists merged and sorted by
+    custom_order, so the tree can be walked without lazy loading subfolders or playlists at every level.
+    """
+
+    def __init__(self, folders: List[Folder], playlists: List[Playlist]) -> None:
+        self.folders: Dict[int, Folder] = {folder.id: folder for folder in folders}
+        self._children: Dict[Optional[int], List[Tuple[int, str, Union[Folder, Playlist]]]] = defaultdict(list)
+
+        for folder in folders:
+            self._children[folder.parent_id].append((folder.custom_order, 'folder', folder))
+        for playlist in playlists:
+            self._children[playlist.folder_id].append((playlist.custom_order, 'playlist', playlist))
+
+        for items in self._children.values():
+            items.sort(key=lambda x: x[0])
+
+    def get_children(self, folder_id: Optional[int] = None) -> List[Tuple[str, Union[Folder, Playlist]]]:
         """
-        Recursively traverse a folder's content and append playlists in custom order.
+        Get the folders and playlists directly within a folder, in custom order.
+
+        :param folder_id: The ID of the folder, or None for the root level
+        :returns: List of (item_type, item) tuples where item_type is 'folder' or 'playlist'
         """
-        items = []
-        # Add subfolders and playlists with their custom_order
-        for subfolder in folder.subfolders:
-            items.append((subfolder.custom_order, 'folder', subfolder))
-        for pl in folder.playlists:
-            items.append((pl.custom_order, 'playlist', pl))
+        return [(item_type, item) for _, item_type, item in self._children.get(folder_id, [])]
 
-        for _, item_type, item in sorted(items, key=lambda x: x[0]):
+    def iter_playlists(self, folder_id: Optional[int] = None) -> Iterator[Playlist]:
+        """Depth first iteration of all playlists within a folder (or the root), in custom order."""
+        for item_type, item in self.get_children(folder_id):
             if item_type == 'playlist':
-                ordered_playlists.append(item)
+                yield item
             else:
-                FolderRepository._traverse_folder(item, ordered_playlists)
+                yield from self.iter_playlists(item.id)
@@ -1,6 +1,8 @@
 import logging
 from datetime import datetime
-from typing import List
+from typing import Dict, List
+
+from sqlalchemy import func
 
 from app.extensions import db, socketio
 from app.models import Playlist, PlaylistTrack, Track
@@ -95,6 +97,21 @@ class PlaylistRepository:
         commit_with_retries(db.session)
         logger.info("Deleted playlists with IDs: %s", playlist_ids)
 
+    @staticmethod
+    def get_downloaded_track_counts(playlist_ids: List[int]) -> Dict[int, int]:
+        """Count the downloaded tracks of each playlist in one grouped query, without loading the tracks."""
+        if not playlist_ids:
+            return {}
+        counts = {playlist_id: 0 for playlist_id in playlist_ids}
+        rows = (
+            db.session.query(PlaylistTrack.playlist_id, func.count(Track.id))
+            .join(Track, Track.id == PlaylistTrack.track_id)
+            .filter(PlaylistTrack.playlist_id.in_(playlist_ids), Track.download_location.isnot(None))
+            .group_by(PlaylistTrack.playlist_id)
+        )
+        counts.update(dict(rows.all()))
+        return counts
+
     @staticmethod
     def set_download_progress(playlist, progress):
         socketio.emit("download_status", {
@@ -2,4 +2,4 @@ from flask import Blueprint
 
 api = Blueprint('api', __name__)
 
-from app.routes import playlists, tracks, export, settings
+from app.routes import playlists, tracks, export, settings, library, throttling
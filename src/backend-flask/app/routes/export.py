@@ -7,22 +7,66 @@ from app.extensions import db, socketio
 from app.models import Track
 from app.repositories.playlist_repository import PlaylistRepository
 from app.services.export_services.export_itunesxml_service import ExportItunesXMLService
+from app.services.export_services.export_rekorbox_service import RekordboxExportService
 from app.services.playlist_manager_service import PlaylistManagerService
+from app.workers.job_manager import Job, JobAlreadyRunningError
 from config import Config
 from app.routes import api
 
 logger = logging.getLogger(__name__)
 
+EXPORT_JOB_TYPE = "export"
+EXPORT_FORMATS = ("itunes", "rekordbox")
 
-# GET /api/export – trigger export of data and return the export path
-@api.route('/api/export', methods=['GET'])
+
+def run_export_job(job: Job, export_format: str) -> dict:
+    """ Background job that generates the export, reporting progress as each playlist is processed. """
+    if export_format == "rekordbox":
+        export_path, changes = RekordboxExportService.generate_rekordbox_xml_from_db(
+            Config.EXPORT_FOLDER, Config.REKORDBOX_EXPORT_FILENAME, progress_callback=job.report_progress)
+    else:
+        export_path, changes = ExportItunesXMLService.generate_rekordbox_xml_with_report(
+            Config.EXPORT_FOLDER, Config.EXPORT_FILENAME, progress_callback=job.report_progress)
+    logger.info("Export successful, location: %s, changes: %s", export_path, changes)
+    return {'export_path': os.path.normpath(export_path), 'format': export_format, 'changes': changes}
+
+
+# POST /api/export – start an export in the background and return the job
+# Optional body: {"format": "itunes" | "rekordbox"}, defaults to the iTunes XML format
+@api.route('/api/export', methods=['POST'])
 def export_rekordbox():
-    logger.info("Exporting Rekordbox XML")
+    data = request.get_json(silent=True) or {}
+    export_format = data.get('format', 'itunes')
+    if export_format not in EXPORT_FORMATS:
+        return jsonify({'error': f'Unknown export format: {export_format}'}), 400
+
+    logger.info("Exporting Rekordbox XML, format: %s", export_format)
 
     try:
-        export_path = ExportItunesXMLService.generate_rekordbox_xml_from_db(Config.EXPORT_FOLDER, Config.EXPORT_FILENAME)
-        logger.info("Export successful, location: %s", export_path)
-        return jsonify({'export_path': os.path.normpath(export_path)}), 200
+        job = current_app.job_manager.start_job(EXPORT_JOB_TYPE, run_export_job, export_format, exclusive=True)
+        return jsonify(job.to_dict()), 202
+    except JobAlreadyRunningError as e:
+        logger.info("Export not started: %s", e)
+        return jsonify({'error': 'An export is already running'}), 409
     except Exception as e:
         logger.error("Export failed: %s", e)
         return jsonify({'error': 'Export failed', 'message': str(e)}), 500
+
+
+# GET /api/export/<job_id> – export job status, progress and results
+@api.route('/api/export/<job_id>', methods=['GET'])
+def get_export_job(job_id):
+    job = current_app.job_manager.get_job(job_id)
+    if not job or job.type != EXPORT_JOB_TYPE:
+        return jsonify({'error': 'Export job not found'}), 404
+    return jsonify(job.to_dict()), 200
+
+
+# DELETE /api/export/<job_id> – cancel a running export
+@api.route('/api/export/<job_id>', methods=['DELETE'])
+def cancel_export_job(job_id):
+    job = current_app.job_manager.get_job(job_id)
+    if not job or job.type != EXPORT_JOB_TYPE:
+        return jsonify({'error': 'Export job not found'}), 404
+    current_app.job_manager.cancel_job(job_id)
+    return jsonify(job.to_dict()), 200
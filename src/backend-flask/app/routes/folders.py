@@ -5,6 +5,7 @@ from sqlalchemy import desc
 from app.extensions import db
 from app.models import Folder, Playlist
 from app.utils.db_utils import commit_with_retries
+from app.workers.sync_scheduler import SyncScheduler
 
 # todo: Move other routes to separate blueprints
 bp = Blueprint('folders', __name__, url_prefix='/api/folders')
@@ -24,6 +25,7 @@ def get_folders():
                     'created_at': folder.created_at.isoformat() if folder.created_at else None,
                     'disabled': folder.disabled,
                     'expanded': folder.expanded,
+                    'sync_interval': folder.sync_interval,
                     'children_count': folder.children_count(),
                 }
                 for folder in folders
@@ -160,6 +162,13 @@ def update_folder(folder_id):
                     current = current.parent
 
             folder.parent_id = parent_id
+
+        # Update sync interval (minutes between automatic syncs of its playlists) if provided
+        if 'sync_interval' in data:
+            try:
+                folder.sync_interval = SyncScheduler.validate_interval(data['sync_interval'])
+            except ValueError as e:
+                return jsonify({'error': str(e)}), 400
         
         commit_with_retries(db.session)
         
@@ -168,7 +177,8 @@ def update_folder(folder_id):
             'name': folder.name,
             'parent_id': folder.parent_id,
             'custom_order': folder.custom_order,
-            'created_at': folder.created_at.isoformat() if folder.created_at else None
+            'created_at': folder.created_at.isoformat() if folder.created_at else None,
+            'sync_interval': folder.sync_interval
         }), 200
         
     except Exception as e:
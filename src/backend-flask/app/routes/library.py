@@ -0,0 +1,121 @@
+import logging
+
+from flask import request, jsonify, current_app
+
+from app.services.download_services.download_layout_service import DownloadLayoutService, LAYOUTS
+from app.services.library_reconciliation_service import LibraryReconciliationService
+from app.services.library_retag_service import LibraryRetagService
+from config import Config
+from app.workers.job_manager import Job, JobAlreadyRunningError
+from app.routes import api
+
+logger = logging.getLogger(__name__)
+
+RECONCILE_JOB_TYPE = "reconcile"
+RELAYOUT_JOB_TYPE = "relayout"
+RETAG_JOB_TYPE = "retag"
+
+
+def run_reconcile_job(job: Job, dry_run: bool) -> dict:
+    """ Background job that reconciles the database with the download folder. """
+    return LibraryReconciliationService.reconcile(dry_run=dry_run, progress_callback=job.report_progress)
+
+
+def run_relayout_job(job: Job, layout: str) -> dict:
+    """ Background job that moves existing downloads into the folders of a layout. """
+    return DownloadLayoutService.relayout(layout, progress_callback=job.report_progress)
+
+
+def run_retag_job(job: Job, dry_run: bool) -> dict:
+    """ Background job that rewrites downloaded files' tags from the tracks' metadata. """
+    return LibraryRetagService.retag(dry_run=dry_run, progress_callback=job.report_progress)
+
+
+# POST /api/library/reconcile – scan the download folder and fix up track locations in the background
+# Optional body: {"dry_run": true} to only report what would change
+@api.route('/api/library/reconcile', methods=['POST'])
+def reconcile_library():
+    data = request.get_json(silent=True) or {}
+    dry_run = bool(data.get('dry_run', False))
+    logger.info("Reconciling library, dry run: %s", dry_run)
+
+    try:
+        job = current_app.job_manager.start_job(RECONCILE_JOB_TYPE, run_reconcile_job, dry_run, exclusive=True)
+        return jsonify(job.to_dict()), 202
+    except JobAlreadyRunningError as e:
+        logger.info("Reconciliation not started: %s", e)
+        return jsonify({'error': 'A library reconciliation is already running'}), 409
+    except Exception as e:
+        logger.error("Reconciliation failed: %s", e)
+        return jsonify({'error': 'Reconciliation failed', 'message': str(e)}), 500
+
+
+# GET /api/library/reconcile/<job_id> – reconciliation job status and report
+@api.route('/api/library/reconcile/<job_id>', methods=['GET'])
+def get_reconcile_job(job_id):
+    job = current_app.job_manager.get_job(job_id)
+    if not job or job.type != RECONCILE_JOB_TYPE:
+        return jsonify({'error': 'Reconciliation job not found'}), 404
+    return jsonify(job.to_dict()), 200
+
+
+# POST /api/library/relayout – switch the download layout and move existing downloads to match in the background
+# Body: {"layout": "flat" | "artist_initial" | "hash_prefix" | "playlist"}, defaults to the current layout, which
+# resumes an interrupted relayout
+@api.route('/api/library/relayout', methods=['POST'])
+def relayout_library():
+    data = request.get_json(silent=True) or {}
+    layout = data.get('layout', Config.DOWNLOAD_LAYOUT)
+    if layout not in LAYOUTS:
+        return jsonify({'error': f'Unknown download layout: {layout}'}), 400
+
+    logger.info("Relayout of library to '%s'", layout)
+
+    try:
+        job = current_app.job_manager.start_job(RELAYOUT_JOB_TYPE, run_relayout_job, layout, exclusive=True)
+        # New downloads use the new layout straight away
+        Config.save_settings({'DOWNLOAD_LAYOUT': layout})
+        return jsonify(job.to_dict()), 202
+    except JobAlreadyRunningError as e:
+        logger.info("Relayout not started: %s", e)
+        return jsonify({'error': 'A relayout is already running'}), 409
+    except Exception as e:
+        logger.error("Relayout failed: %s", e)
+        return jsonify({'error': 'Relayout failed', 'message': str(e)}), 500
+
+
+# GET /api/library/relayout/<job_id> – relayout job status and report
+@api.route('/api/library/relayout/<job_id>', methods=['GET'])
+def get_relayout_job(job_id):
+    job = current_app.job_manager.get_job(job_id)
+    if not job or job.type != RELAYOUT_JOB_TYPE:
+        return jsonify({'error': 'Relayout job not found'}), 404
+    return jsonify(job.to_dict()), 200
+
+
+# POST /api/library/retag – rewrite the tags of downloaded files whose tags differ from the database in the background
+# Optional body: {"dry_run": true} to only report which files and tags would change
+@api.route('/api/library/retag', methods=['POST'])
+def retag_library():
+    data = request.get_json(silent=True) or {}
+    dry_run = bool(data.get('dry_run', False))
+    logger.info("Re-tagging library, dry run: %s", dry_run)
+
+    try:
+        job = current_app.job_manager.start_job(RETAG_JOB_TYPE, run_retag_job, dry_run, exclusive=True)
+        return jsonify(job.to_dict()), 202
+    except JobAlreadyRunningError as e:
+        logger.info("Re-tag not started: %s", e)
+        return jsonify({'error': 'A library re-tag is already running'}), 409
+    except Exception as e:
+        logger.error("Re-tag failed: %s", e)
+        return jsonify({'error': 'Re-tag failed', 'message': str(e)}), 500
+
+
+# GET /api/library/retag/<job_id> – re-tag job status and report
+@api.route('/api/library/retag/<job_id>', methods=['GET'])
+def get_retag_job(job_id):
+    job = current_app.job_manager.get_job(job_id)
+    if not job or job.type != RETAG_JOB_TYPE:
+        return jsonify({'error': 'Re-tag job not found'}), 404
+    return jsonify(job.to_dict()), 200
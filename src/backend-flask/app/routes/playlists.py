@@ -15,6 +15,8 @@ from app.services.playlist_manager_service import PlaylistManagerService
 from config import Config
 from app.routes import api
 from app.utils.db_utils import commit_with_retries
+from app.workers.download_queue import PRIORITIES
+from app.workers.sync_scheduler import SyncScheduler
 from app.services.platform_services.soundcloud_service import SoundCloudAuthError
 
 
@@ -77,6 +79,10 @@ def sync_playlists():
     data = request.get_json() or {}
     selected_ids = data.get('playlist_ids', [])
     quick_sync = data.get('quick_sync', True)
+    priority_name = data.get('priority', 'user')
+    if priority_name not in PRIORITIES:
+        return jsonify({'error': f"Invalid priority, must be one of: {', '.join(PRIORITIES)}"}), 400
+    priority = PRIORITIES[priority_name]
 
     try:
         # Get playlists in custom order and filter by selected IDs if provided.
@@ -99,7 +105,7 @@ def sync_playlists():
                 if isinstance(e, SoundCloudAuthError):
                     return jsonify({'error': 'Authentication Error. Please refresh your SoundCloud token in Settings.'}), 401
                 raise
-            current_app.download_manager.add_to_queue(playlist.id, quick_sync)
+            current_app.download_manager.add_to_queue(playlist.id, quick_sync, priority)
 
         updated_playlists = [p.to_dict() for p in playlists]
         return jsonify(updated_playlists), 200
@@ -140,6 +146,46 @@ def cancel_download(playlist_id):
         return jsonify({'error': 'Playlist not found'}), 404
 
 
+# POST /api/download/pause – pause downloading, the download in progress holds where it is
+@api.route("/api/download/pause", methods=["POST"])
+def pause_downloads():
+    current_app.download_manager.pause()
+    return jsonify(current_app.download_manager.get_status()), 200
+
+
+# GET /api/sync-schedule – the automatic sync settings, whether syncs can start now and when playlists are next due
+@api.route("/api/sync-schedule", methods=["GET"])
+def get_sync_schedule():
+    return jsonify(current_app.sync_scheduler.to_dict()), 200
+
+
+# PUT /api/sync-schedule – replace the automatic sync settings
+# Body: {"windows": [{"start": "01:00", "end": "06:00", "days": [0, 1, 2, 3, 4]}], "max_concurrent": 2, "jitter": 0.1}
+@api.route("/api/sync-schedule", methods=["PUT"])
+def set_sync_schedule():
+    try:
+        SyncScheduler.set_settings(request.get_json(silent=True))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        logger.error("Error setting sync schedule: %s", e, exc_info=True)
+        return jsonify({'error': 'Failed to set sync schedule', 'message': str(e)}), 500
+    return jsonify(current_app.sync_scheduler.to_dict()), 200
+
+
+# POST /api/download/resume – resume paused downloading
+@api.route("/api/download/resume", methods=["POST"])
+def resume_downloads():
+    current_app.download_manager.resume()
+    return jsonify(current_app.download_manager.get_status()), 200
+
+
+# GET /api/download/queue – whether downloading is paused, the running task and the queued ones in order
+@api.route("/api/download/queue", methods=["GET"])
+def get_download_queue():
+    return jsonify(current_app.download_manager.get_status()), 200
+
+
 @api.route('/api/playlists/toggle', methods=['POST'])
 def toggle_playlist():
     data = request.get_json() or {}
@@ -250,6 +296,13 @@ def update_playlist(playlist_id):
     else:
         playlist.track_limit = None
 
+    # Update sync_interval (minutes between automatic syncs) if provided, null uses the folder's
+    if 'sync_interval' in data:
+        try:
+            playlist.sync_interval = SyncScheduler.validate_interval(data['sync_interval'])
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+
     commit_with_retries(db.session)
 
     return jsonify(playlist.to_dict()), 200
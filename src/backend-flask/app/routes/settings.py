@@ -8,6 +8,8 @@ import requests
 
 from config import Config
 from app.routes import api
+from app.services.download_services.download_layout_service import LAYOUTS
+from app.services.download_services.track_storage_service import AUDIO_FORMATS
 from app.services.platform_services.spotify_api_service import SpotifyApiService
 
 logger = logging.getLogger(__name__)
@@ -36,20 +38,27 @@ def settings():
         return jsonify({
             'spotify_client_id': settings_data.get('SPOTIFY_CLIENT_ID', ''),
             'spotify_client_secret': settings_data.get('SPOTIFY_CLIENT_SECRET', ''),
-            'soundcloud_client_id': settings_data.get('SOUNDCLOUD_CLIENT_ID', '')
+            'soundcloud_client_id': settings_data.get('SOUNDCLOUD_CLIENT_ID', ''),
+            'download_layout': settings_data.get('DOWNLOAD_LAYOUT', Config.DOWNLOAD_LAYOUT),
+            'audio_format': settings_data.get('AUDIO_FORMAT', Config.AUDIO_FORMAT)
         }), 200
 
     elif request.method == 'POST':
         data = request.get_json() or {}
-        new_settings = {
-            'SPOTIFY_CLIENT_ID': data.get('spotify_client_id'),
-            'SPOTIFY_CLIENT_SECRET': data.get('spotify_client_secret'),
-            'SOUNDCLOUD_CLIENT_ID': data.get('soundcloud_client_id')
+        # Only the settings sent are updated, any others in the file are kept
+        setting_keys = {
+            'spotify_client_id': 'SPOTIFY_CLIENT_ID',
+            'spotify_client_secret': 'SPOTIFY_CLIENT_SECRET',
+            'soundcloud_client_id': 'SOUNDCLOUD_CLIENT_ID',
+            'download_layout': 'DOWNLOAD_LAYOUT',
+            'audio_format': 'AUDIO_FORMAT'
         }
-        with open(settings_path, 'w') as f:
-            yaml.safe_dump(new_settings, f)
+        if 'download_layout' in data and data['download_layout'] not in LAYOUTS:
+            return jsonify({'error': f"Unknown download layout: {data['download_layout']}"}), 400
+        if 'audio_format' in data and data['audio_format'] not in AUDIO_FORMATS:
+            return jsonify({'error': f"Unknown audio format: {data['audio_format']}"}), 400
 
-        Config.load_settings()
+        Config.save_settings({key: data[field] for field, key in setting_keys.items() if field in data})
 
         return jsonify({'message': 'Settings updated successfully'}), 200
 
@@ -0,0 +1,51 @@
+import logging
+
+from flask import jsonify, request
+
+from app.routes import api
+from app.utils.bandwidth_limiter import BandwidthLimiter
+from app.utils.rate_limiter import AdaptiveRateLimiter
+from app.utils.response_cache import ResponseCache
+
+logger = logging.getLogger(__name__)
+
+
+# GET /api/rate-limits – the current (learnt) request rate for each platform
+@api.route('/api/rate-limits', methods=['GET'])
+def get_rate_limits():
+    limiters = AdaptiveRateLimiter.get_all()
+    return jsonify([limiter.to_dict() for _platform, limiter in sorted(limiters.items())]), 200
+
+
+# GET /api/response-cache – hits and misses of the platform response cache, overall and per kind of fetch
+@api.route('/api/response-cache', methods=['GET'])
+def get_response_cache_stats():
+    return jsonify(ResponseCache.stats()), 200
+
+
+# DELETE /api/response-cache – forget cached platform responses, so the next syncs fetch fresh ones
+@api.route('/api/response-cache', methods=['DELETE'])
+def clear_response_cache():
+    ResponseCache.clear()
+    return jsonify(ResponseCache.stats()), 200
+
+
+# GET /api/bandwidth – the configured bandwidth limits and those in force now
+@api.route('/api/bandwidth', methods=['GET'])
+def get_bandwidth_limits():
+    return jsonify(BandwidthLimiter.to_dict()), 200
+
+
+# PUT /api/bandwidth – replace the bandwidth limits, applied to downloads in progress too
+# Body: {"global": bytes/s | null, "platforms": {"youtube": bytes/s | null}, "schedule": [{"start": "09:00",
+#        "end": "18:00", "days": [0, 1, 2, 3, 4], "global": ..., "platforms": {...}}]}
+@api.route('/api/bandwidth', methods=['PUT'])
+def set_bandwidth_limits():
+    try:
+        BandwidthLimiter.set_limits(request.get_json(silent=True))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        logger.error("Error setting bandwidth limits: %s", e, exc_info=True)
+        return jsonify({'error': 'Failed to set bandwidth limits', 'message': str(e)}), 500
+    return jsonify(BandwidthLimiter.to_dict()), 200
@@ -1,5 +1,4 @@
 import logging
-import os
 import time
 
 import yaml
@@ -9,10 +8,12 @@ from app.extensions import db, socketio
 from app.models import Track
 from app.repositories.playlist_repository import PlaylistRepository
 from app.routes import api
+from app.services.download_services.download_retry_service import DownloadRetryService
 from app.services.export_services.export_itunesxml_service import ExportItunesXMLService
 from app.services.playlist_manager_service import PlaylistManagerService
 from app.utils.file_download_utils import FileDownloadUtils
 from app.utils.db_utils import commit_with_retries
+from app.workers.download_worker import DOWNLOAD_SERVICES, TRACK_DOWNLOAD_JOB_TYPE
 from config import Config
 
 logger = logging.getLogger(__name__)
@@ -66,6 +67,8 @@ def update_track(track_id):
         db.session.rollback()
         return jsonify({'error': 'Failed to update track', 'message': str(e)}), 500
 
+# POST /api/tracks/<track_id>/download – re-download a track in the background and return its job
+# The download is queued ahead of playlist syncs, "job_finished" is emitted with the updated track as its result
 @api.route('/api/tracks/<int:track_id>/download', methods=['POST', 'OPTIONS'])
 def re_download_track(track_id):
     try:
@@ -73,37 +76,80 @@ def re_download_track(track_id):
         track: Track = Track.query.get(track_id)
         if not track:
             return jsonify({'error': 'Track not found'}), 404
+        if track.platform.lower() not in DOWNLOAD_SERVICES:
+            return jsonify({'error': 'Platform not supported for downloading'}), 400
 
-        # Get the absolute path for file operations
-        absolute_path = track.absolute_download_path
-        logger.info("Clearing previous download for track %s, location %s", track_id, absolute_path)
-        
-        if absolute_path and os.path.exists(absolute_path):
-            logger.info("Removing file, location %s", absolute_path)
-            os.remove(absolute_path)
-
-        # Optionally clear previous download details
-        track.download_location = None
         track.notes_errors = ""
+        # A manual re-download is tried now, whatever its retry schedule
+        DownloadRetryService.clear_retry_state(track)
         db.session.commit()
 
-        # Determine which download service to use based on platform
-        if track.platform.lower() == "spotify":
-            from app.services.download_services.spotify_download_service import SpotifyDownloadService
-            SpotifyDownloadService.download_track(track)
-        elif track.platform.lower() == "soundcloud":
-            from app.services.download_services.soundcloud_download_service import SoundcloudDownloadService
-            SoundcloudDownloadService.download_track(track)
-        elif track.platform.lower() == "youtube":
-            from app.services.download_services.youtube_download_service import YouTubeDownloadService
-            YouTubeDownloadService.download_track(track)
-
-        else:
-            return jsonify({'error': 'Platform not supported for downloading'}), 400
-        logger.info("Re-downloaded track %s", Track.query.get(track_id).to_dict())
-        return jsonify(Track.query.get(track_id).to_dict()), 200
+        # The existing file is only removed once the download starts, so cancelling the queued job keeps it
+        job = current_app.download_manager.add_track_to_queue(track.id, replace_existing=True)
+        return jsonify(job.to_dict()), 202
 
     except Exception as e:
         logger.error("Error re-downloading track (ID: %s): %s", track_id, e, exc_info=True)
         db.session.rollback()
         return jsonify({'error': 'Failed to re-download track', 'message': str(e)}), 500
+
+
+# DELETE /api/tracks/<track_id>/download – cancel the track's download, queued or in progress
+@api.route('/api/tracks/<int:track_id>/download', methods=['DELETE'])
+def cancel_track_download(track_id):
+    if not current_app.download_manager.cancel_track(track_id):
+        return jsonify({'error': 'Track is not being downloaded'}), 404
+    return jsonify({'cancelled': track_id}), 200
+
+
+# GET /api/tracks/download-jobs/<job_id> – track download job status and result
+@api.route('/api/tracks/download-jobs/<job_id>', methods=['GET'])
+def get_track_download_job(job_id):
+    job = current_app.job_manager.get_job(job_id)
+    if not job or job.type != TRACK_DOWNLOAD_JOB_TYPE:
+        return jsonify({'error': 'Track download job not found'}), 404
+    return jsonify(job.to_dict()), 200
+
+
+# DELETE /api/tracks/download-jobs/<job_id> – cancel a track download that hasn't started yet
+@api.route('/api/tracks/download-jobs/<job_id>', methods=['DELETE'])
+def cancel_track_download_job(job_id):
+    job = current_app.job_manager.get_job(job_id)
+    if not job or job.type != TRACK_DOWNLOAD_JOB_TYPE:
+        return jsonify({'error': 'Track download job not found'}), 404
+    current_app.job_manager.cancel_job(job_id)
+    return jsonify(job.to_dict()), 200
+
+
+# GET /api/tracks/<track_id>/download-attempts – the track's failed download attempts
+@api.route('/api/tracks/<int:track_id>/download-attempts', methods=['GET'])
+def get_track_download_attempts(track_id):
+    track = db.session.get(Track, track_id)
+    if not track:
+        return jsonify({'error': 'Track not found'}), 404
+    return jsonify([attempt.to_dict() for attempt in DownloadRetryService.get_attempts(track_id)]), 200
+
+
+# GET /api/tracks/dead-letter – tracks whose downloads have been given up on
+@api.route('/api/tracks/dead-letter', methods=['GET'])
+def get_dead_lettered_tracks():
+    return jsonify([track.to_dict() for track in DownloadRetryService.get_dead_lettered_tracks()]), 200
+
+
+# POST /api/tracks/dead-letter/retry – retry given up on tracks at the next sync
+# Optional body: {"track_ids": [1, 2]} to only retry some tracks (also clears waiting tracks' backoff), defaults to all
+@api.route('/api/tracks/dead-letter/retry', methods=['POST'])
+def retry_dead_lettered_tracks():
+    data = request.get_json(silent=True) or {}
+    track_ids = data.get('track_ids')
+    if track_ids is not None and not isinstance(track_ids, list):
+        return jsonify({'error': 'track_ids must be a list'}), 400
+
+    try:
+        count = DownloadRetryService.reset(track_ids)
+        logger.info("Reset retry state of %d tracks", count)
+        return jsonify({'reset': count}), 200
+    except Exception as e:
+        logger.error("Error resetting retry state: %s", e, exc_info=True)
+        db.session.rollback()
+        return jsonify({'error': 'Failed to reset retry state', 'message': str(e)}), 500
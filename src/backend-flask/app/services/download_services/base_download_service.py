@@ -3,24 +3,35 @@ import os
 import platform
 import sys
 import threading
-import time
 from abc import ABC, abstractmethod
+from concurrent.futures import Future
+from typing import List, Optional, Tuple
 
+from flask import Flask, current_app
 from yt_dlp import YoutubeDL
 
 from app.extensions import db, emit_error_message
 from app.models import Playlist, Track
 from app.repositories.playlist_repository import PlaylistRepository
+from app.services.download_services.download_layout_service import DownloadLayoutService
+from app.services.download_services.download_retry_service import DownloadRetryService
+from app.services.download_services.partial_download_service import PARTIAL_FILE_PATTERN, PartialDownloadService
+from app.services.download_services.track_storage_service import TrackStorageService
+from app.utils.bandwidth_limiter import BandwidthLimiter
+from app.utils.disk_space import DiskSpaceGuard, InsufficientDiskSpaceError
 from app.utils.file_download_utils import FileDownloadUtils
+from app.utils.library_index import LibraryIndex
+from app.utils.rate_limiter import AdaptiveRateLimiter
 from app.utils.db_utils import commit_with_retries
+from app.workers.download_control import DownloadCancelledError, DownloadControl
+from app.workers.transcode_pool import TranscodePool
 from config import Config
 
-DOWNLOAD_SLEEP_TIME = 0.05  # To reduce bot detection
 logger = logging.getLogger(__name__)
 
 
 class BaseDownloadService(ABC):
-    DOWNLOAD_SLEEP_TIME = DOWNLOAD_SLEEP_TIME
+    RATE_LIMIT_PLATFORM = 'youtube'  # Platform whose AdaptiveRateLimiter paces this service's yt-dlp requests
 
     @classmethod
     def download_playlist(cls, playlist: Playlist, quick_sync: bool, cancellation_flags: dict[threading.Event]):
@@ -44,6 +55,16 @@ class BaseDownloadService(ABC):
 
             total_tracks = len(tracks)
 
+            # A full sync checks every track's file, one folder scan is much cheaper than a stat per track.
+            # The library watcher's live index makes even that scan unnecessary.
+            library_index = None
+            if not quick_sync:
+                library_index = LibraryIndex.get_live_index()
+                if library_index is None:
+                    library_index = LibraryIndex.build()
+
+            # Transcodes run in the background while the next tracks download, the playlist is done once they finish
+            transcodes: List[Tuple[Track, Future]] = []
             for i, track in enumerate(tracks, start=1):
                 progress_percent = int((i / total_tracks) * 100)
                 PlaylistRepository.set_download_progress(playlist, progress_percent)
@@ -56,17 +77,35 @@ class BaseDownloadService(ABC):
                                 playlist.name, playlist.id)
                     break
 
+                # Failed tracks wait for their retry, hopeless ones are dead-lettered
+                if not DownloadRetryService.is_due(track):
+                    logger.debug("Skipping track '%s', its download is retried after %s", track.name,
+                                 track.next_retry_at or "a manual retry")
+                    continue
+
                 try:
-                    cls.download_track(track)
+                    transcode = cls.download_track(track, library_index, wait=False)
+                    if transcode is not None:
+                        transcodes.append((track, transcode))
+                except InsufficientDiskSpaceError:
+                    raise  # Every remaining track would fail too
+                except DownloadCancelledError as e:
+                    if not e.track_only:
+                        logger.info("Download for playlist '%s' stopped mid-track: %s. (id: %s)",
+                                    playlist.name, e, playlist.id)
+                        break
+                    logger.info("Download of track '%s' cancelled", track.name)
                 except Exception as e:
                     logger.warning("Error downloading track '%s': %s", track.name, e)
                     error_message = f"Error downloading playlist '{playlist.name}': {str(e)}"
                     emit_error_message( "" , error_message)
 
-                time.sleep(cls.DOWNLOAD_SLEEP_TIME)
-
+            cls._wait_for_transcodes(playlist, transcodes)
             logger.info("Download finished for playlist '%s'", playlist.name)
             PlaylistRepository.set_download_status(playlist, 'ready')
+        except InsufficientDiskSpaceError as e:
+            logger.warning("Stopped downloading playlist '%s': %s", playlist.name, e)
+            raise
         except Exception as e:
             logger.error("Error downloading playlist '%s': %s", playlist.name, e)
             error_message = f"Error downloading playlist '{playlist.name}': {str(e)}"
@@ -75,31 +114,233 @@ class BaseDownloadService(ABC):
             raise e
 
     @classmethod
-    def download_track(cls, track: Track):
-        """ Download a single track. """
+    def _wait_for_transcodes(cls, playlist: Playlist, transcodes: List[Tuple[Track, Future]]) -> None:
+        """
+        Wait for a playlist's transcodes to finish, reporting any that failed like a failed download.
+
+        :raises InsufficientDiskSpaceError: Once they've all finished, if any failed because the disk was full
+        """
+        disk_full_error = None
+        for track, transcode in transcodes:
+            try:
+                transcode.result()
+            except InsufficientDiskSpaceError as e:
+                logger.warning("Error transcoding track '%s': %s", track.name, e)
+                disk_full_error = disk_full_error or e
+            except Exception as e:
+                logger.warning("Error transcoding track '%s': %s", track.name, e)
+                error_message = f"Error downloading playlist '{playlist.name}': {str(e)}"
+                emit_error_message("", error_message)
+        if transcodes:
+            # Tracks were updated by the transcode workers' sessions
+            db.session.expire_all()
+        if disk_full_error:
+            raise disk_full_error
+
+    @classmethod
+    def download_track(cls, track: Track, library_index: LibraryIndex = None, wait: bool = True) -> Optional[Future]:
+        """
+        Download a single track.
+
+        :param library_index: Index of the download folder used to check if the track is already downloaded.
+        :param wait: Wait for the track's transcode to finish. Otherwise the transcode's future is returned, and the
+            track is only updated in the database (by the transcode worker) once it completes.
+        :return: The pending transcode, if not waiting and the download needs one.
+        """
         logger.debug(f"Download Track location: %s", track.download_location)
 
         track.notes_errors = ""
         db.session.add(track)
         commit_with_retries(db.session)
 
-        if track.is_downloaded():
+        if track.is_downloaded(library_index):
             logger.info("Track '%s' already downloaded, skipping.", track.name)
-            return
+            return None
 
+        transcode = None
         try:
-            cls.download_track_with_ytdlp(track)
+            with DownloadControl.track(track.id):
+                DownloadControl.checkpoint(track.id)
+                DiskSpaceGuard.admit(track)
+                transcode = cls.download_track_with_ytdlp(track)
+            if transcode is not None and wait:
+                transcode.result()
+                db.session.refresh(track)
+                transcode = None
+            if transcode is None and track.download_attempts and track.download_location:
+                DownloadRetryService.clear_retry_state(track)
+                commit_with_retries(db.session)
+            return transcode
+        except (DownloadCancelledError, InsufficientDiskSpaceError):
+            raise  # Not a failure, the track is downloaded again next time
         except Exception as e:
+            if DiskSpaceGuard.is_disk_full_error(e):
+                raise InsufficientDiskSpaceError(f"Disk full while downloading '{track.name}'") from e
             logger.error("Error downloading track '%s - %s`: %s", track.name, track.artist, e, exc_info=True)
+            if transcode is not None:
+                db.session.refresh(track)  # The transcode worker already recorded the failure
+            else:
+                DownloadRetryService.record_failure(track, e)
             track.notes_errors = str(e)
             db.session.add(track)
             commit_with_retries(db.session)
             # todo: display frontend error            
             raise e
 
+    @classmethod
+    def _download_to_storage(cls, track: Track, download_url: str, filename: str,
+                             query: str = None) -> Optional[Future]:
+        """
+        Common download path for all platforms: reuses files already downloaded from the same URL, resolves filename
+        collisions, downloads the audio, and shares the file of any track with identical audio instead of storing it
+        twice. Only newly stored files are tagged.
+
+        Downloads are saved as the source's raw audio. When they need transcoding to MP3 that is handed to the
+        app's TranscodePool, and storing the file (hashing, deduplicating and tagging) happens after it there.
+
+        :param download_url: URL for yt-dlp to download from
+        :param filename: Sanitised filename (without extension) to download to, placed in the configured layout
+        :param query: Query used for the yt-dlp options, defaults to the filename
+        :return: The pending transcode, or None if the track was stored straight away
+        """
+        source_track = TrackStorageService.find_downloaded_track_with_source(track, download_url)
+        if source_track:
+            logger.info("Track '%s' shares its source with '%s', reusing '%s'",
+                        track.name, source_track.name, source_track.download_location)
+            track.set_download_location(source_track.absolute_download_path)
+            track.content_hash = source_track.content_hash
+            db.session.add(track)
+            commit_with_retries(db.session)
+            return None
+
+        # An interrupted download is resumed at the path it was writing to
+        file_stem = PartialDownloadService.get_resume_stem(track, download_url)
+        if file_stem is None:
+            file_stem = TrackStorageService.resolve_file_stem(
+                track, os.path.join(DownloadLayoutService.get_subfolder(track, filename), filename))
+        file_path = TrackStorageService.find_existing_file(file_stem)
+        needs_transcode = file_path is not None and cls._needs_transcode(file_path)
+
+        if needs_transcode:
+            # A raw download left waiting to be transcoded (or by a failed transcode), e.g. before a crash
+            logger.info("Track '%s' has a raw download at '%s', transcoding it.", track.name, file_path)
+        elif file_path:
+            logger.info("Track '%s' already exists at '%s'. Skipping download.", track.name, file_path)
+            if not track.content_hash:
+                track.content_hash = TrackStorageService.hash_audio_content(file_path)
+        else:
+            ydl_opts = cls._generate_yt_dlp_options(query or filename,
+                                                    os.path.relpath(file_stem, Config.DOWNLOAD_FOLDER))
+            PartialDownloadService.start(track, file_stem, download_url)
+            try:
+                with YoutubeDL(ydl_opts) as ydl:
+                    logger.info("Downloading track '%s' from URL: %s", track.name, download_url)
+                    info = cls._extract_info(ydl, download_url, download=True)
+            except Exception as e:
+                cancellation = DownloadControl.raised_cancellation()
+                if cancellation is None:
+                    raise
+                if not cancellation.preempted:
+                    PartialDownloadService.discard(track)
+                    commit_with_retries(db.session)
+                if cancellation is e:
+                    raise
+                raise cancellation from e
+            file_path = cls._get_downloaded_file_path(info, file_stem)
+            needs_transcode = cls._needs_transcode(file_path)
+            if not needs_transcode:
+                file_path = cls._store_downloaded_file(track, file_path)
+
+        if needs_transcode:
+            app = current_app._get_current_object()
+            return app.transcode_pool.submit(cls._transcode_and_store, app, track.id, file_path,
+                                             file_stem + '.mp3', cls.get_ffmpeg_location())
+
+        PartialDownloadService.finish(track)
+        track.set_download_location(file_path)
+        db.session.add(track)
+        commit_with_retries(db.session)
+        return None
+
+    @staticmethod
+    def _needs_transcode(file_path: str) -> bool:
+        """Whether the file is raw audio still to be transcoded, rather than a file in the configured format."""
+        return Config.AUDIO_FORMAT == 'mp3' and os.path.splitext(file_path)[1].lower() != '.mp3'
+
+    @classmethod
+    def _transcode_and_store(cls, app: Flask, track_id: int, source_path: str, target_path: str,
+                             ffmpeg_location: str) -> None:
+        """Runs in the TranscodePool: transcodes a raw download to MP3 then stores it for the track."""
+        with app.app_context():
+            track = db.session.get(Track, track_id)
+            try:
+                file_path = TranscodePool.transcode_to_mp3(ffmpeg_location, source_path, target_path)
+                file_path = cls._store_downloaded_file(track, file_path)
+                track.set_download_location(file_path)
+                PartialDownloadService.finish(track)
+                if track.download_attempts:
+                    DownloadRetryService.clear_retry_state(track)
+            except Exception as e:
+                logger.error("Error transcoding track '%s - %s`: %s", track.name, track.artist, e)
+                if DiskSpaceGuard.is_disk_full_error(e):
+                    raise InsufficientDiskSpaceError(f"Disk full while transcoding '{track.name}'") from e
+                track.notes_errors = str(e)
+                DownloadRetryService.record_failure(track, e)
+                raise
+            finally:
+                db.session.add(track)
+                commit_with_retries(db.session)
+
+    @staticmethod
+    def _store_downloaded_file(track: Track, file_path: str) -> str:
+        """
+        Hash a newly downloaded file and share the file of any track with identical audio, otherwise tag it.
+
+        :return: The path the track's audio is stored at
+        """
+        # Hash before tagging, tags differ between tracks but the audio doesn't
+        track.content_hash = TrackStorageService.hash_audio_content(file_path)
+        duplicate_track = TrackStorageService.find_downloaded_track_with_content(track, track.content_hash)
+        if duplicate_track and os.path.normpath(duplicate_track.absolute_download_path) != os.path.normpath(file_path):
+            logger.info("Track '%s' has the same audio as '%s', sharing '%s'",
+                        track.name, duplicate_track.name, duplicate_track.download_location)
+            os.remove(file_path)
+            return duplicate_track.absolute_download_path
+
+        FileDownloadUtils.embed_track_metadata(file_path, track)
+        logger.info("Downloaded track '%s' to '%s'", track.name, file_path)
+        return file_path
+
+    @classmethod
+    def _extract_info(cls, ydl: YoutubeDL, url: str, download: bool = False) -> dict:
+        """Run a yt-dlp request paced by the platform's rate limiter, which backs off on 429s and bot checks."""
+        limiter = AdaptiveRateLimiter.get(cls.RATE_LIMIT_PLATFORM)
+        return limiter.call(ydl.extract_info, url, download=download, track_latency=not download)
+
+    @staticmethod
+    def _get_downloaded_file_path(info: dict, file_stem: str) -> str:
+        """The path yt-dlp saved the audio to. Its extension depends on the source's codec unless transcoded."""
+        requested_downloads = (info or {}).get('requested_downloads') or []
+        if requested_downloads and requested_downloads[0].get('filepath'):
+            return requested_downloads[0]['filepath']
+
+        file_path = TrackStorageService.find_existing_file(file_stem)
+        if not file_path:
+            # Raw downloads may be in a container (e.g. webm) that isn't one of the stored audio formats
+            file_path = next(iter(sorted(path for path in PartialDownloadService.find_files(file_stem)
+                                         if not PARTIAL_FILE_PATTERN.search(path))), None)
+        if not file_path:
+            raise FileNotFoundError(f"Downloaded file not found at '{file_stem}'")
+        return file_path
+
     @classmethod
     def _generate_yt_dlp_options(cls, query: str, filename: str = None):
-        """Generate yt-dlp options using a sanitized filename from the YouTube title."""
+        """
+        Generate yt-dlp options using a sanitized filename from the YouTube title.
+        With Config.AUDIO_FORMAT 'mp3' the source's raw audio is saved, for the TranscodePool to encode to MP3 outside
+        the download thread. With 'native' the source's audio stream is kept as is (preferring m4a) and only remuxed
+        out of its video container, so no encoding happens.
+        """
         if not filename:
             filename = FileDownloadUtils.sanitize_filename(query)
 
@@ -107,21 +348,37 @@ class BaseDownloadService(ABC):
                                        Config.DOWNLOAD_FOLDER,
                                        f"{filename}.%(ext)s")  # Ensure correct filename format
 
-        return {
-            'format': 'bestaudio/best',
-            'audioformat': 'mp3',
+        if Config.AUDIO_FORMAT == 'native':
+            audio_format = 'bestaudio[ext=m4a]/bestaudio/best'
+            postprocessors = [{
+                'key': 'FFmpegExtractAudio',
+                'preferredcodec': 'best',  # Copies the audio stream rather than re-encoding it
+            }]
+        else:
+            audio_format = 'bestaudio/best'
+            postprocessors = []  # Transcoded to MP3 by the TranscodePool
+
+        options = {
+            'format': audio_format,
             'extractaudio': True,
             'nocheckcertificate': True,
             'outtmpl': output_template,  # Set output file name
             'noplaylist': True,
-            'postprocessors': [{
-                'key': 'FFmpegExtractAudio',
-                'preferredcodec': 'mp3',
-                'preferredquality': '192',  # Bitrate for MP3/AAC
-            }],
+            'postprocessors': postprocessors,
             'ffmpeg_location': cls.get_ffmpeg_location(),
+            'progress_hooks': [
+                DownloadControl.progress_hook,  # Lets cancel and pause reach running downloads
+                BandwidthLimiter.progress_hook(cls.RATE_LIMIT_PLATFORM),  # Shares the bandwidth budget
+            ],
+            # Interrupted downloads keep their .part file and continue from it (see PartialDownloadService)
+            'continuedl': True,
+            'nopart': False,
             'quiet': False
         }
+        ratelimit = BandwidthLimiter.get_ratelimit(cls.RATE_LIMIT_PLATFORM)
+        if ratelimit:
+            options['ratelimit'] = ratelimit
+        return options
 
     @classmethod
     @abstractmethod
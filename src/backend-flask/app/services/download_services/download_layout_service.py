@@ -0,0 +1,183 @@
+import hashlib
+import json
+import logging
+import os
+import shutil
+from typing import Any, Callable, Dict, Optional
+
+from app.extensions import db
+from app.models import Playlist, PlaylistTrack, Track
+from app.services.download_services.track_storage_service import TrackStorageService
+from app.utils.db_utils import commit_with_retries
+from app.utils.file_download_utils import FileDownloadUtils
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+ProgressCallbackType = Callable[..., None]
+
+LAYOUTS = ('flat', 'artist_initial', 'hash_prefix', 'playlist')
+RELAYOUT_BATCH_SIZE = 200
+RELAYOUT_STATE_FILENAME = '.relayout_state.json'
+
+
+class DownloadLayoutService:
+    """
+    Decides which subfolder of the download folder a track's file goes in (Config.DOWNLOAD_LAYOUT), so very large
+    libraries aren't stored as one huge flat folder:
+    - flat: everything in the download folder itself
+    - artist_initial: by the first letter of the artist, e.g. "R/Track.mp3" ("#" for non letters)
+    - hash_prefix: by the first two hex characters of a hash of the filename, spreading files evenly over 256 folders
+    - playlist: by the name of the first playlist the track was added to
+    Download locations in the database stay relative to the download folder, including the subfolder.
+    """
+
+    @staticmethod
+    def get_subfolder(track: Track, filename: str, layout: Optional[str] = None) -> str:
+        """
+        The subfolder, relative to the download folder, a track's file belongs in.
+
+        :param filename: The file's name without extension
+        :param layout: Layout to use, defaults to Config.DOWNLOAD_LAYOUT
+        """
+        layout = layout or Config.DOWNLOAD_LAYOUT
+        if layout == 'artist_initial':
+            artist = FileDownloadUtils.sanitize_filename(track.artist or "").lstrip()
+            initial = artist[:1].upper()
+            return initial if initial.isalpha() else "#"
+        if layout == 'hash_prefix':
+            return hashlib.sha1(filename.lower().encode('UTF-8')).hexdigest()[:2]
+        if layout == 'playlist':
+            playlist_name = DownloadLayoutService._get_first_playlist_name(track)
+            return FileDownloadUtils.sanitize_filename(playlist_name) if playlist_name else ""
+        return ""
+
+    @staticmethod
+    def _get_first_playlist_name(track: Track) -> Optional[str]:
+        if track.id is None:
+            return None
+        row = (
+            db.session.query(Playlist.name)
+            .join(PlaylistTrack, PlaylistTrack.playlist_id == Playlist.id)
+            .filter(PlaylistTrack.track_id == track.id)
+            .order_by(PlaylistTrack.id)
+            .first()
+        )
+        return row.name if row else None
+
+    @staticmethod
+    def relayout(layout: Optional[str] = None, batch_size: int = RELAYOUT_BATCH_SIZE,
+                 progress_callback: Optional[ProgressCallbackType] = None) -> Dict[str, Any]:
+        """
+        Move existing downloads into the folders of a layout, in batches of tracks.
+
+        Each batch is committed and the last track id recorded in a state file in the download folder, so an
+        interrupted relayout picks up where it left off. Moves are also safe to repeat: a file already at its new
+        location with nothing left at the old one just has its database row updated.
+
+        :param layout: Layout to move files into, defaults to Config.DOWNLOAD_LAYOUT
+        :param progress_callback: Called after each batch with processed and total keyword arguments.
+            May raise to stop the relayout (e.g. when cancelled), it can be resumed later.
+        :return: Counts of files moved, already in place and missing.
+        """
+        layout = layout or Config.DOWNLOAD_LAYOUT
+        if layout not in LAYOUTS:
+            raise ValueError(f"Unknown download layout: {layout}")
+
+        state = DownloadLayoutService._load_state()
+        last_track_id = state.get('last_track_id', 0) if state.get('layout') == layout else 0
+        if last_track_id:
+            logger.info("Resuming relayout to '%s' after track id %s", layout, last_track_id)
+
+        downloaded = Track.query.filter(Track.download_location.isnot(None))
+        total = downloaded.filter(Track.id > last_track_id).count()
+        report = {'layout': layout, 'moved': 0, 'unchanged': 0, 'missing': 0, 'processed': 0, 'total': total}
+        moved_paths: Dict[str, str] = {}  # Old -> new location of files moved this run, they may be shared by tracks
+
+        while True:
+            batch = downloaded.filter(Track.id > last_track_id).order_by(Track.id).limit(batch_size).all()
+            if not batch:
+                break
+
+            for track in batch:
+                result = DownloadLayoutService._relayout_track(track, layout, moved_paths)
+                report[result] += 1
+
+            last_track_id = batch[-1].id
+            commit_with_retries(db.session)
+            DownloadLayoutService._save_state({'layout': layout, 'last_track_id': last_track_id})
+
+            report['processed'] += len(batch)
+            if progress_callback:
+                progress_callback(processed=report['processed'], total=total)
+
+        DownloadLayoutService._clear_state()
+        DownloadLayoutService._remove_empty_folders(Config.DOWNLOAD_FOLDER)
+        logger.info("Relayout to '%s' finished: %s", layout, report)
+        return report
+
+    @staticmethod
+    def _relayout_track(track: Track, layout: str, moved_paths: Dict[str, str]) -> str:
+        """Move one track's file to where the layout puts it. Returns 'moved', 'unchanged' or 'missing'."""
+        old_location = os.path.normpath(track.download_location)
+        if os.path.isabs(old_location) or old_location in moved_paths:
+            # Outside the download folder, or shared with a track whose file was already moved (and updated)
+            return 'unchanged'
+
+        filename = os.path.basename(old_location)
+        subfolder = DownloadLayoutService.get_subfolder(track, os.path.splitext(filename)[0], layout)
+        new_location = os.path.normpath(os.path.join(subfolder, filename))
+        if new_location == old_location:
+            return 'unchanged'
+
+        old_path = FileDownloadUtils.get_absolute_path(old_location)
+        new_path = FileDownloadUtils.get_absolute_path(new_location)
+        if not os.path.exists(old_path):
+            if not os.path.exists(new_path):
+                return 'missing'
+            # Moved by an earlier, interrupted run, only the database needs updating
+        else:
+            if os.path.exists(new_path):
+                stem, extension = os.path.splitext(filename)
+                new_location = os.path.join(subfolder, f"{stem} - {TrackStorageService.get_collision_suffix(track)}"
+                                                       f"{extension}")
+                new_path = FileDownloadUtils.get_absolute_path(new_location)
+            os.makedirs(os.path.dirname(new_path), exist_ok=True)
+            shutil.move(old_path, new_path)
+
+        # Every track sharing the file moves with it
+        Track.query.filter(Track.download_location == track.download_location).update(
+            {'download_location': new_location}, synchronize_session=False)
+        moved_paths[old_location] = new_location
+        return 'moved'
+
+    @staticmethod
+    def _remove_empty_folders(root: str) -> None:
+        for folder, _dirs, _files in os.walk(root, topdown=False):
+            if os.path.abspath(folder) != os.path.abspath(root):
+                try:
+                    os.rmdir(folder)  # Only succeeds if empty
+                except OSError:
+                    pass
+
+    @staticmethod
+    def _state_path() -> str:
+        return os.path.join(Config.DOWNLOAD_FOLDER, RELAYOUT_STATE_FILENAME)
+
+    @staticmethod
+    def _load_state() -> Dict[str, Any]:
+        try:
+            with open(DownloadLayoutService._state_path(), 'r', encoding='UTF-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    @staticmethod
+    def _save_state(state: Dict[str, Any]) -> None:
+        with open(DownloadLayoutService._state_path(), 'w', encoding='UTF-8') as f:
+            json.dump(state, f)
+
+    @staticmethod
+    def _clear_state() -> None:
+        if os.path.exists(DownloadLayoutService._state_path()):
+            os.remove(DownloadLayoutService._state_path())
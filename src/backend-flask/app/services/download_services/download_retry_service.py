@@ -0,0 +1,130 @@
+import logging
+import re
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+
+from app.extensions import db
+from app.models import DownloadAttempt, Track
+from app.utils.db_utils import commit_with_retries
+from app.utils.rate_limiter import AdaptiveRateLimiter
+
+logger = logging.getLogger(__name__)
+
+ERROR_MESSAGE_MAX_LENGTH = 2000
+
+# Checked in order, the first match wins. Anything unmatched is assumed to be transient (e.g. a network error).
+# Removed tracks are dead-lettered after one failure, so only yt-dlp's messages for unavailable media count: a 404 is
+# only a removal when the page or metadata is gone, not a media fragment.
+REMOVED_PATTERN = re.compile(
+    r"video unavailable|has been removed|no longer available|private video|account .* terminated|"
+    r"this track was not found|does not exist|"
+    r"unable to download (webpage|json metadata|api json)[^\n]*http error 404", re.IGNORECASE)
+GEO_BLOCKED_PATTERN = re.compile(
+    r"not available in your country|in your country|geo.?restrict|geo.?block|not available in your region",
+    re.IGNORECASE)
+
+# How failures of each category are retried: the delay before the first retry, doubling with each further failure up
+# to max_delay, and the number of failures after which the track is dead-lettered.
+RETRY_POLICIES: Dict[str, Dict] = {
+    'transient': {'base_delay': timedelta(minutes=5), 'max_delay': timedelta(days=1), 'max_attempts': 8},
+    'rate_limited': {'base_delay': timedelta(minutes=30), 'max_delay': timedelta(days=1), 'max_attempts': 10},
+    'geo_blocked': {'base_delay': timedelta(days=1), 'max_delay': timedelta(days=7), 'max_attempts': 3},
+    'removed': {'base_delay': timedelta(days=1), 'max_delay': timedelta(days=1), 'max_attempts': 1},
+}
+
+
+class DownloadRetryService:
+    """
+    Decides when failed track downloads are retried, so syncs don't keep spending time on tracks that can't be
+    downloaded.
+
+    Each failure is classified (transient, rate_limited, geo_blocked or removed), recorded in the track's
+    download_attempts history, and schedules the track's next retry with exponential backoff for its category.
+    Syncs skip tracks until their retry is due. After a category's max attempts the track is dead-lettered and only
+    retried when asked to manually (e.g. re-downloading it). A successful download clears the retry state.
+    """
+
+    @staticmethod
+    def classify_error(error) -> str:
+        message = str(error)
+        if AdaptiveRateLimiter.is_throttle_error(message):
+            return 'rate_limited'
+        if GEO_BLOCKED_PATTERN.search(message):
+            return 'geo_blocked'
+        if REMOVED_PATTERN.search(message):
+            return 'removed'
+        return 'transient'
+
+    @staticmethod
+    def is_due(track: Track, now: Optional[datetime] = None) -> bool:
+        """Whether a sync should try downloading the track, it isn't dead-lettered or waiting to be retried."""
+        if track.dead_lettered:
+            return False
+        return track.next_retry_at is None or track.next_retry_at <= (now or datetime.utcnow())
+
+    @staticmethod
+    def record_failure(track: Track, error, now: Optional[datetime] = None) -> str:
+        """
+        Record a failed download and schedule the track's retry, or dead-letter it. The caller commits.
+
+        :return: The error's category
+        """
+        now = now or datetime.utcnow()
+        category = DownloadRetryService.classify_error(error)
+        policy = RETRY_POLICIES[category]
+
+        track.download_attempts = (track.download_attempts or 0) + 1
+        track.error_category = category
+        db.session.add(DownloadAttempt(track_id=track.id, attempted_at=now, error_category=category,
+                                       error_message=str(error)[:ERROR_MESSAGE_MAX_LENGTH]))
+
+        if track.download_attempts >= policy['max_attempts']:
+            track.dead_lettered = True
+            track.next_retry_at = None
+            logger.info("Giving up on downloading track '%s' after %d attempts (%s)",
+                        track.name, track.download_attempts, category)
+        else:
+            delay = min(policy['base_delay'] * 2 ** (track.download_attempts - 1), policy['max_delay'])
+            track.next_retry_at = now + delay
+            logger.info("Retrying download of track '%s' (%s) after %s", track.name, category, track.next_retry_at)
+        db.session.add(track)
+        return category
+
+    @staticmethod
+    def clear_retry_state(track: Track) -> None:
+        """
+        Clear the track's retry state, after a successful download or to retry it manually. Its history is kept.
+        The caller commits.
+        """
+        track.download_attempts = 0
+        track.error_category = None
+        track.next_retry_at = None
+        track.dead_lettered = False
+        db.session.add(track)
+
+    @staticmethod
+    def reset(track_ids: Optional[List[int]] = None) -> int:
+        """
+        Make dead-lettered and waiting tracks due again, so the next sync retries them.
+
+        :param track_ids: Tracks to reset, defaults to every dead-lettered track
+        :return: Number of tracks reset
+        """
+        query = Track.query
+        if track_ids is None:
+            query = query.filter(Track.dead_lettered.is_(True))
+        else:
+            query = query.filter(Track.id.in_(track_ids))
+        count = query.update({'download_attempts': 0, 'error_category': None, 'next_retry_at': None,
+                              'dead_lettered': False}, synchronize_session=False)
+        commit_with_retries(db.session)
+        return count
+
+    @staticmethod
+    def get_dead_lettered_tracks() -> List[Track]:
+        return Track.query.filter(Track.dead_lettered.is_(True)).order_by(Track.id).all()
+
+    @staticmethod
+    def get_attempts(track_id: int) -> List[DownloadAttempt]:
+        return (DownloadAttempt.query.filter(DownloadAttempt.track_id == track_id)
+                .order_by(DownloadAttempt.attempted_at, DownloadAttempt.id).all())
@@ -0,0 +1,157 @@
+import glob
+import logging
+import os
+import re
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+
+from app.extensions import db
+from app.models import PartialDownload, Track
+from app.utils.db_utils import commit_with_retries
+from app.utils.file_download_utils import FileDownloadUtils
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+# Files yt-dlp (and the transcode pool) write while a download is in progress
+PARTIAL_FILE_PATTERN = re.compile(r"\.(part\d*|ytdl|temp)$|\.part-Frag\d+(\.part)?$", re.IGNORECASE)
+# What follows a download's stem in the names of its files: the audio (or raw container) extension, then any of the
+# suffixes above. Anything else (e.g. "Intro. Live.mp3" for the stem "Intro") is another track's file.
+DOWNLOAD_FILE_SUFFIX_PATTERN = re.compile(
+    r"^(\.f\d+)?(\.temp)?\.(mp3|m4a|aac|opus|ogg|flac|wav|aiff|webm|mp4|mka)"
+    r"(\.part\d*|\.ytdl|\.temp|\.part-Frag\d+(\.part)?)?$", re.IGNORECASE)
+
+
+class PartialDownloadService:
+    """
+    Keeps track of the downloads in progress, one PartialDownload per track, so an interrupted download (a crash,
+    restart or preemption) resumes where it left off: the next attempt downloads to the same path, where yt-dlp
+    continues its .part file and reuses a finished raw download that was waiting to be transcoded.
+
+    Partial files are removed when a download is cancelled, its source changes, or on startup once they are stale
+    (Config.PARTIAL_DOWNLOAD_MAX_AGE) or belong to no download in progress.
+    """
+
+    @staticmethod
+    def get(track: Track) -> Optional[PartialDownload]:
+        return PartialDownload.query.filter_by(track_id=track.id).first()
+
+    @staticmethod
+    def get_resume_stem(track: Track, source_url: str) -> Optional[str]:
+        """
+        The path (without extension) an interrupted download of the track was writing to, if it can be resumed.
+        A partial download from a different source is removed.
+        """
+        partial = PartialDownloadService.get(track)
+        if partial is None:
+            return None
+
+        file_stem = partial.absolute_file_stem
+        if partial.source_url != source_url:
+            logger.info("Source of track '%s' changed, discarding its partial download", track.name)
+            PartialDownloadService.discard(track, partial)
+            return None
+        if not PartialDownloadService.find_files(file_stem):
+            PartialDownloadService.finish(track)
+            return None
+
+        logger.info("Resuming partial download of track '%s' at '%s'", track.name, file_stem)
+        return file_stem
+
+    @staticmethod
+    def start(track: Track, file_stem: str, source_url: str) -> None:
+        """Record that the track is being downloaded to the path."""
+        partial = PartialDownloadService.get(track) or PartialDownload(track_id=track.id)
+        partial.file_stem = FileDownloadUtils.get_relative_path(file_stem)
+        partial.source_url = source_url
+        partial.started_at = partial.started_at or datetime.utcnow()
+        db.session.add(partial)
+        commit_with_retries(db.session)
+
+    @staticmethod
+    def finish(track: Track) -> None:
+        """Forget the track's download in progress, once it has been stored. The caller commits."""
+        PartialDownload.query.filter_by(track_id=track.id).delete(synchronize_session=False)
+
+    @staticmethod
+    def discard(track: Track, partial: Optional[PartialDownload] = None) -> None:
+        """Remove the partial files of the track's download in progress and forget it. The caller commits."""
+        partial = partial or PartialDownloadService.get(track)
+        if partial is not None:
+            PartialDownloadService.remove_files(partial.absolute_file_stem)
+            db.session.delete(partial)
+
+    @staticmethod
+    def find_files(file_stem: str) -> List[str]:
+        """The files of the download at the path: its audio, raw download and partial files."""
+        stem_length = len(os.path.basename(file_stem))
+        return [path for path in glob.glob(glob.escape(file_stem) + '.*')
+                if DOWNLOAD_FILE_SUFFIX_PATTERN.match(os.path.basename(path)[stem_length:])]
+
+    @staticmethod
+    def remove_files(file_stem: str) -> None:
+        """Remove what a download left behind (.part and .ytdl files, or an unfinished raw download)."""
+        for path in PartialDownloadService.find_files(file_stem):
+            try:
+                os.remove(path)
+                logger.info("Removed partial download '%s'", path)
+            except OSError as e:
+                logger.warning("Failed to remove partial download '%s': %s", path, e)
+
+    @staticmethod
+    def clean_stale_partials(max_age: timedelta = None) -> Dict[str, int]:
+        """
+        Startup cleanup: forget downloads in progress whose files are gone, remove those older than max_age, and
+        remove partial files in the download folder that belong to no download in progress (nothing is downloading
+        yet, so those were left by downloads that were never recorded).
+
+        :return: Counts of the partial downloads kept and removed, and orphaned files removed
+        """
+        max_age = max_age or Config.PARTIAL_DOWNLOAD_MAX_AGE
+        cutoff = datetime.utcnow() - max_age
+        kept_stems = set()
+        counts = {'kept': 0, 'removed': 0, 'orphaned_files_removed': 0}
+
+        for partial in PartialDownload.query.all():
+            file_stem = partial.absolute_file_stem
+            if not PartialDownloadService.find_files(file_stem):
+                db.session.delete(partial)
+            elif partial.started_at and partial.started_at < cutoff:
+                logger.info("Removing stale partial download '%s'", file_stem)
+                PartialDownloadService.remove_files(file_stem)
+                db.session.delete(partial)
+                counts['removed'] += 1
+            else:
+                kept_stems.add(os.path.normcase(os.path.normpath(file_stem)))
+                counts['kept'] += 1
+        commit_with_retries(db.session)
+
+        for root, _, files in os.walk(Config.DOWNLOAD_FOLDER):
+            for name in files:
+                if not PARTIAL_FILE_PATTERN.search(name):
+                    continue
+                path = os.path.join(root, name)
+                if PartialDownloadService._belongs_to(path, kept_stems):
+                    continue
+                try:
+                    os.remove(path)
+                    counts['orphaned_files_removed'] += 1
+                    logger.info("Removed orphaned partial download '%s'", path)
+                except OSError as e:
+                    logger.warning("Failed to remove orphaned partial download '%s': %s", path, e)
+
+        logger.info("Partial downloads cleaned: %s", counts)
+        return counts
+
+    @staticmethod
+    def _belongs_to(path: str, file_stems: set) -> bool:
+        """Whether the file is one of the stems' files, e.g. '<stem>.webm.part' for '<stem>'."""
+        normalised = os.path.normcase(os.path.normpath(path))
+        stem = os.path.splitext(normalised)[0]
+        while True:
+            if stem in file_stems:
+                return True
+            shorter = os.path.splitext(stem)[0]
+            if shorter == stem:
+                return False
+            stem = shorter
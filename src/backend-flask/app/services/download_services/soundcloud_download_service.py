@@ -1,23 +1,21 @@
 import logging
-import os
-
-from yt_dlp import YoutubeDL
+from concurrent.futures import Future
+from typing import Optional
 
 from app.extensions import db
 from app.models import Track
 from app.services.download_services.base_download_service import BaseDownloadService
 from app.utils.file_download_utils import FileDownloadUtils
 from app.utils.db_utils import commit_with_retries
-from config import Config
-
-DOWNLOAD_SLEEP_TIME = 0.05  # To reduce bot detection
 
 logger = logging.getLogger(__name__)
 
 
 class SoundcloudDownloadService(BaseDownloadService):
+    RATE_LIMIT_PLATFORM = 'soundcloud'
+
     @classmethod
-    def download_track_with_ytdlp(cls, track: Track) -> None:
+    def download_track_with_ytdlp(cls, track: Track) -> Optional[Future]:
         """
         Download a track using yt-dlp.
         Uses the track's SoundCloud URL and saves the audio as an MP3 file.
@@ -31,24 +29,4 @@ class SoundcloudDownloadService(BaseDownloadService):
 
         track_title = f"{track.name}"
         sanitized_title = FileDownloadUtils.sanitize_filename(track_title)
-        file_path = os.path.join(Config.DOWNLOAD_FOLDER, f"{sanitized_title}.mp3")
-
-        if os.path.exists(file_path):
-            logger.info("Track '%s' already exists at '%s'. Skipping download.", track.name, file_path)
-            track.set_download_location(file_path)
-
-        else:
-            ydl_opts = SoundcloudDownloadService._generate_yt_dlp_options(sanitized_title)
-            with YoutubeDL(ydl_opts) as ydl:
-                # Download the track from its SoundCloud URL
-                logger.info("Downloading track '%s' from SoundCloud URL: %s", track.name, track.download_url)
-                logger.info("yt-dlp options: %s", ydl_opts)
-                ydl.download([track.download_url])
-
-            FileDownloadUtils.embed_track_metadata(file_path, track)
-
-            track.set_download_location(file_path)
-            logger.info("Downloaded track '%s' to '%s'", track.name, file_path)
-
-        db.session.add(track)
-        commit_with_retries(db.session)
+        return cls._download_to_storage(track, track.download_url, sanitized_title)
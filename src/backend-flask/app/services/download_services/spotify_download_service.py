@@ -1,5 +1,6 @@
 import logging
-import os
+from concurrent.futures import Future
+from typing import Optional
 
 from yt_dlp import YoutubeDL
 
@@ -8,14 +9,13 @@ from app.models import Track
 from app.services.download_services.base_download_service import BaseDownloadService
 from app.utils.file_download_utils import FileDownloadUtils
 from app.utils.db_utils import commit_with_retries
-from config import Config
 
 logger = logging.getLogger(__name__)
 
 
 class SpotifyDownloadService(BaseDownloadService):
     @classmethod
-    def download_track_with_ytdlp(cls, track: Track) -> None:
+    def download_track_with_ytdlp(cls, track: Track) -> Optional[Future]:
         """Download a track using yt-dlp and embed metadata.
 
         First checks if a download URL is already stored in the database.
@@ -25,23 +25,9 @@ class SpotifyDownloadService(BaseDownloadService):
         query = f"{track.name} {track.artist}"
 
         sanitized_title, url_to_use = cls._determine_download_details(query, track)
-        file_path = os.path.join(Config.DOWNLOAD_FOLDER, f"{sanitized_title}.mp3")
-
-        if os.path.exists(file_path):
-            logger.info("Track '%s' already exists at '%s'. Skipping download.", track.name, file_path)
-            track.set_download_location(file_path)
-        else:
-            ydl_opts = SpotifyDownloadService._generate_yt_dlp_options(query, sanitized_title)
-            with YoutubeDL(ydl_opts) as ydl:
-                ydl.download([url_to_use])
-
-            FileDownloadUtils.embed_track_metadata(file_path, track)
-            track.set_download_location(file_path)
-            logger.info("Downloaded track '%s' to '%s'", track.name, file_path)
-
-        db.session.add(track)
-        commit_with_retries(db.session)
-        logger.info("Processed track '%s' with file '%s'", track.name, file_path)
+        transcode = cls._download_to_storage(track, url_to_use, sanitized_title, query)
+        logger.info("Processed track '%s' with file '%s'", track.name, track.download_location)
+        return transcode
 
     @classmethod
     def _determine_download_details(cls, query, track):
@@ -56,13 +42,13 @@ class SpotifyDownloadService(BaseDownloadService):
             logger.info("Using pre-existing download URL for track '%s'", track.name)
             # Extract video information from the existing URL
             with YoutubeDL(SpotifyDownloadService._generate_yt_dlp_options(query)) as ydl:
-                video_info = ydl.extract_info(url_to_use, download=False)
+                video_info = cls._extract_info(ydl, url_to_use)
                 youtube_title = video_info.get('title', query)
                 sanitized_title = FileDownloadUtils.sanitize_filename(youtube_title)
         else:
             logger.info("No download URL in DB. Searching YouTube for track: '%s'", query)
             with YoutubeDL(SpotifyDownloadService._generate_yt_dlp_options(query)) as ydl:
-                info = ydl.extract_info(f"ytsearch:{query}", download=False)
+                info = cls._extract_info(ydl, f"ytsearch:{query}")
                 if 'entries' in info and len(info['entries']) > 0:
                     video_info = info['entries'][0]
                 else:
@@ -0,0 +1,138 @@
+import hashlib
+import logging
+import os
+from typing import Optional, Tuple
+
+from app.models import Track
+from app.utils.file_download_utils import FileDownloadUtils
+from app.utils.library_index import AUDIO_EXTENSIONS
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+HASH_CHUNK_SIZE = 1024 * 1024
+ID3V2_HEADER_SIZE = 10
+ID3V1_TAG_SIZE = 128
+
+AUDIO_FORMATS = ('mp3', 'native')
+# Formats yt-dlp may keep in native mode, most preferred first (m4a is the native format Rekordbox can play)
+NATIVE_EXTENSIONS = ('.m4a', '.opus', '.ogg', '.aac', '.flac', '.wav', '.aiff')
+
+
+class TrackStorageService:
+    """
+    Decides where downloaded tracks are stored, so that audio is only stored (and downloaded) once.
+
+    - Tracks sharing a download URL share the file, without downloading it again.
+    - Finished downloads are hashed (audio only, tags excluded) and reuse any existing file with identical audio.
+    - Different tracks whose titles sanitise to the same filename get a deterministic suffix instead of silently
+      sharing one file.
+    """
+
+    @staticmethod
+    def hash_audio_content(file_path: str) -> str:
+        """
+        Hash a file's audio, skipping any ID3v2 tag at the start and ID3v1 tag at the end, so the hash stays the
+        same when the file is (re)tagged.
+        """
+        sha256 = hashlib.sha256()
+        with open(file_path, 'rb') as f:
+            start, end = TrackStorageService._get_audio_bounds(f, os.fstat(f.fileno()).st_size)
+            f.seek(start)
+            remaining = end - start
+            while remaining > 0:
+                chunk = f.read(min(HASH_CHUNK_SIZE, remaining))
+                if not chunk:
+                    break
+                sha256.update(chunk)
+                remaining -= len(chunk)
+        return sha256.hexdigest()
+
+    @staticmethod
+    def _get_audio_bounds(f, size: int) -> Tuple[int, int]:
+        start, end = 0, size
+
+        header = f.read(ID3V2_HEADER_SIZE)
+        if len(header) == ID3V2_HEADER_SIZE and header[:3] == b'ID3':
+            # Tag size is a 28 bit "syncsafe" integer, 7 bits per byte
+            tag_size = (header[6] << 21) | (header[7] << 14) | (header[8] << 7) | header[9]
+            has_footer = header[5] & 0x10
+            start = min(size, ID3V2_HEADER_SIZE + tag_size + (ID3V2_HEADER_SIZE if has_footer else 0))
+
+        if end - start >= ID3V1_TAG_SIZE:
+            f.seek(end - ID3V1_TAG_SIZE)
+            if f.read(3) == b'TAG':
+                end -= ID3V1_TAG_SIZE
+        return start, end
+
+    @staticmethod
+    def resolve_file_stem(track: Track, filename: str) -> str:
+        """
+        The path (without extension) to download a track to. If another track already owns the filename, in any audio
+        format, a suffix derived from the track's platform id is added, so the same track always resolves to the same
+        path.
+        """
+        file_stem = os.path.join(Config.DOWNLOAD_FOLDER, filename)
+        owner = TrackStorageService._get_file_owner(file_stem, track)
+        if owner is None:
+            return file_stem
+
+        suffixed_stem = f"{file_stem} - {TrackStorageService.get_collision_suffix(track)}"
+        logger.info("Filename '%s' already belongs to track '%s', using '%s' for track '%s'",
+                    os.path.basename(file_stem), owner.name, os.path.basename(suffixed_stem), track.name)
+        return suffixed_stem
+
+    @staticmethod
+    def find_existing_file(file_stem: str) -> Optional[str]:
+        """
+        An already downloaded file at the path, in any audio format. The configured format is preferred if there
+        are several.
+        """
+        extensions = ('.mp3',) + NATIVE_EXTENSIONS
+        if Config.AUDIO_FORMAT == 'native':
+            extensions = NATIVE_EXTENSIONS + ('.mp3',)
+        return next((file_stem + extension for extension in extensions if os.path.exists(file_stem + extension)), None)
+
+    @staticmethod
+    def get_collision_suffix(track: Track) -> str:
+        return hashlib.sha1(f"{track.platform}:{track.platform_id}".encode('UTF-8')).hexdigest()[:8]
+
+    @staticmethod
+    def _get_file_owner(file_stem: str, track: Track) -> Optional[Track]:
+        relative_stem = FileDownloadUtils.get_relative_path(file_stem)
+        return Track.query.filter(
+            Track.download_location.in_([relative_stem + extension for extension in AUDIO_EXTENSIONS]),
+            Track.id != track.id,
+        ).first()
+
+    @staticmethod
+    def is_file_shared(track: Track) -> bool:
+        """Whether other tracks are stored at the track's file, e.g. tracks with the same source or audio."""
+        if not track.download_location:
+            return False
+        return Track.query.filter(
+            Track.download_location == track.download_location,
+            Track.id != track.id,
+        ).first() is not None
+
+    @staticmethod
+    def find_downloaded_track_with_source(track: Track, download_url: str) -> Optional[Track]:
+        """Another track already downloaded from the same URL, whose file can be reused without downloading."""
+        if not download_url:
+            return None
+        candidates = Track.query.filter(
+            Track.download_url == download_url,
+            Track.id != track.id,
+            Track.download_location.isnot(None),
+        ).all()
+        return next((candidate for candidate in candidates if candidate.is_downloaded()), None)
+
+    @staticmethod
+    def find_downloaded_track_with_content(track: Track, content_hash: str) -> Optional[Track]:
+        """Another track whose file has identical audio, so this track can share it."""
+        candidates = Track.query.filter(
+            Track.content_hash == content_hash,
+            Track.id != track.id,
+            Track.download_location.isnot(None),
+        ).all()
+        return next((candidate for candidate in candidates if candidate.is_downloaded()), None)
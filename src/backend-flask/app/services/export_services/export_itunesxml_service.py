@@ -1,21 +1,39 @@
 import logging
 import os
+import threading
 import urllib
 import xml.etree.ElementTree as ET
-from typing import Optional, Union, Any
-from xml.dom import minidom
+from collections import defaultdict
+from typing import Optional, Union, Any, Dict, Tuple, Callable
 from datetime import datetime
 
-from mutagen.easyid3 import EasyID3
-from mutagen.mp3 import MP3
+from mutagen import File as MutagenFile
 
 from app.extensions import db
 from app.models import Playlist, Folder, Track
+from app.repositories.folder_repository import FolderRepository, FolderTree
 from app.repositories.playlist_repository import PlaylistRepository
+from app.services.export_services.export_manifest import ExportManifest
+from config import Config
 
 logger = logging.getLogger(__name__)
 
 DownloadedTrackType = tuple[int, str]
+ProgressCallbackType = Callable[..., None]
+
+TRACK_KINDS = {
+    '.mp3': "MPEG audio file",
+    '.m4a': "AAC audio file",
+    '.aac': "AAC audio file",
+    '.opus': "Opus audio file",
+    '.ogg': "Ogg Vorbis audio file",
+    '.flac': "FLAC audio file",
+    '.wav': "WAV audio file",
+    '.aiff': "AIFF audio file",
+}
+
+# Held while an export is being generated so two exports can't write the same files at once
+export_lock = threading.Lock()
 
 
 class ExportItunesXMLService:
@@ -25,45 +43,91 @@ class ExportItunesXMLService:
         Generates a Rekordbox XML file reflecting the folder/playlist structure
         while mixing playlists and folders in a custom order.
         """
-        # Instantiate the XML library helper
-        xml_lib = RekordboxXMLLibrary()
+        export_path, _ = ExportItunesXMLService.generate_rekordbox_xml_with_report(EXPORT_FOLDER, EXPORT_FILENAME)
+        return export_path
+
+    @staticmethod
+    def generate_rekordbox_xml_with_report(EXPORT_FOLDER, EXPORT_FILENAME,
+                                           progress_callback: Optional[ProgressCallbackType] = None
+                                           ) -> Tuple[str, Dict[str, Any]]:
+        """
+        Generates the Rekordbox XML file incrementally, using the manifest of the previous export.
+
+        Tag data is only read for tracks whose files changed since the last export and the XML file is
+        only rewritten when a playlist, folder or track changed.
+
+        :param progress_callback: Called after each playlist with playlists_processed, playlists_total and
+            tracks_processed keyword arguments. May raise to abort the export (e.g. when cancelled).
+        :return: The export path and a report of what changed since the last export.
+        """
+        with export_lock:
+            manifest = ExportManifest.load(EXPORT_FOLDER, Config.EXPORT_MANIFEST_FILENAME)
+
+            # Instantiate the XML library helper
+            xml_lib = RekordboxXMLLibrary(manifest)
+
+            # Load the folder hierarchy (and tracks) up front rather than querying at every level
+            folder_tree = FolderRepository.load_folder_tree(with_tracks=True)
+
+            playlists_total = ExportItunesXMLService._count_enabled_playlists(folder_tree)
+            playlists_processed = 0
+
+            def on_playlist_processed():
+                nonlocal playlists_processed
+                playlists_processed += 1
+                if progress_callback:
+                    progress_callback(playlists_processed=playlists_processed, playlists_total=playlists_total,
+                                      tracks_processed=len(xml_lib.exported_track_ids))
+
+            # Process top-level items (those with no parent folder) using "PySyncDJ" as the root persistent ID
+            ExportItunesXMLService._process_container(xml_lib, folder_tree, parent_folder_id=None,
+                                                      parent_persistent_id="PySyncDJ",
+                                                      on_playlist_processed=on_playlist_processed)
+
+            report = manifest.compare(xml_lib.playlist_entries, xml_lib.track_entries)
+            report['tracks_read'] = xml_lib.tracks_read
+
+            export_path = os.path.join(EXPORT_FOLDER, EXPORT_FILENAME)
+            if report['has_changes'] or not os.path.exists(export_path):
+                # Save the resulting XML
+                xml_lib.save_xml(EXPORT_FOLDER, EXPORT_FILENAME)
+                report['written'] = True
+            else:
+                logger.info("Library unchanged since last export, keeping %s", export_path)
+                report['written'] = False
 
-        # Process top-level items (those with no parent folder) using "PySyncDJ" as the root persistent ID
-        ExportItunesXMLService._process_container(xml_lib, parent_folder_id=None, parent_persistent_id="PySyncDJ")
+            manifest.save(xml_lib.playlist_entries, xml_lib.track_entries)
+            return export_path, report
 
-        # Save the resulting XML
-        xml_lib.save_xml(EXPORT_FOLDER, EXPORT_FILENAME)
-        return os.path.join(EXPORT_FOLDER, EXPORT_FILENAME)
+    @staticmethod
+    def _count_enabled_playlists(folder_tree: FolderTree, folder_id=None) -> int:
+        """Count the enabled playlists that will be exported, skipping disabled folders."""
+        count = 0
+        for item_type, item in folder_tree.get_children(folder_id):
+            if item.disabled:
+                continue
+            if item_type == 'playlist':
+                count += 1
+            else:
+                count += ExportItunesXMLService._count_enabled_playlists(folder_tree, item.id)
+        return count
 
     @staticmethod
-    def _process_container(xml_lib, parent_folder_id, parent_persistent_id):
+    def _process_container(xml_lib, folder_tree: FolderTree, parent_folder_id, parent_persistent_id,
+                           on_playlist_processed: Optional[Callable[[], None]] = None):
         """
-        Processes all items (playlists and folders) that have the given parent.
-        Both playlists and folders are merged and sorted by their custom order.
+        Processes all enabled items (playlists and folders) that have the given parent.
+        Items come from the folder tree already merged and sorted by their custom order.
         For folders, the method calls itself recursively.
         """
-        # Fetch playlists that belong to the current container
-        playlists = Playlist.query.filter(
-            Playlist.folder_id == parent_folder_id,
-            Playlist.disabled == False
-        ).all()
-        
-        # Fetch folders (subfolders) that have this parent
-        folders = Folder.query.filter(
-            Folder.parent_id == parent_folder_id,
-            Folder.disabled == False
-        ).all()
-
-        # Merge both lists and sort by the custom_order property
-        items = playlists + folders
-        items.sort(key=lambda item: item.custom_order)
+        items = [item for _, item in folder_tree.get_children(parent_folder_id) if not item.disabled]
 
         # Process each item in the sorted order
         for item in items:
             if isinstance(item, Folder):
                 # Generate an XML ID for the folder and form its persistent ID
                 folder_xml_id = xml_lib.gen_playlist_id()
-                folder_persistent_id = f"folder-{folder_xml_id}"
+                folder_persistent_id = f"folder-{item.id}"
                 folder_info = {
                     "Name": item.name,
                     "Description": " ",
@@ -76,48 +140,48 @@ class ExportItunesXMLService:
 
                 # Recursively process the subfolder's items
                 ExportItunesXMLService._process_container(
-                    xml_lib, 
-                    parent_folder_id=item.id, 
-                    parent_persistent_id=folder_persistent_id
+                    xml_lib,
+                    folder_tree,
+                    parent_folder_id=item.id,
+                    parent_persistent_id=folder_persistent_id,
+                    on_playlist_processed=on_playlist_processed
                 )
 
             elif isinstance(item, Playlist):
-                # For a playlist, grab the absolute file paths from its tracks
-                file_locations = [
-                    pt.track.absolute_download_path 
-                    for pt in item.tracks 
+                # Reference tracks by their database id so a track shared by several playlists
+                # is only written (and only has its tags read) once
+                downloaded_tracks = [
+                    (pt.track.id, pt.track.absolute_download_path)
+                    for pt in item.tracks
                     if pt.track and pt.track.download_location
                 ]
-                
-                if not file_locations:
+
+                if not downloaded_tracks:
+                    if on_playlist_processed:
+                        on_playlist_processed()
                     continue
 
+                # Add any tracks not yet in the library to the XML's tracks dictionary
+                xml_lib.add_to_all_track(downloaded_tracks)
+                track_ids = [track_id for track_id, _ in downloaded_tracks if xml_lib.has_track(track_id)]
+
                 playlist_xml_id = xml_lib.gen_playlist_id()
-                
-                # Build track entries
-                track_entries = []
-                track_ids = []
-                for file_location in file_locations:
-                    if file_location:  # Only add if the path is valid
-                        track_id = xml_lib.gen_track_id()
-                        track_ids.append(track_id)
-                        track_entries.append((track_id, file_location))
-                
-                # Add the track info to the XML's tracks dictionary
-                xml_lib.add_to_all_track(track_entries)
 
                 # Add the playlist info
                 playlist_info = {
                     "Name": item.name,
                     "Description": " ",
                     "Playlist ID": playlist_xml_id,
-                    "Playlist Persistent ID": f"{playlist_xml_id}",
+                    "Playlist Persistent ID": f"playlist-{item.id}",
                     "Parent Persistent ID": parent_persistent_id,
                     "All Items": True,
                     "Playlist Items": [{"Track ID": tid} for tid in track_ids]
                 }
                 xml_lib.add_playlist_from_elements(playlist_info)
 
+                if on_playlist_processed:
+                    on_playlist_processed()
+
 
 class RekordboxXMLLibrary:
     """
@@ -126,12 +190,22 @@ class RekordboxXMLLibrary:
     library using Rekordbox's import iTunes library feature.
     """
 
-    def __init__(self) -> None:
+    def __init__(self, manifest: Optional[ExportManifest] = None) -> None:
         """
         Initialize the RekordboxXMLLibrary class.
+
+        :param manifest: Manifest of the previous export, used to skip reading tags of unchanged files.
         """
         self.unique_track_id_counter = -1
         self.unique_playlist_id_counter = 1
+        self.exported_track_ids: set[int] = set()
+        self.unreadable_track_ids: set[int] = set()
+
+        self.manifest = manifest
+        self.playlist_entries: Dict[str, Dict[str, str]] = {}
+        self._children_added: Dict[str, int] = defaultdict(int)  # Parent persistent ID -> entries added under it
+        self.track_entries: Dict[str, Dict[str, Any]] = {}
+        self.tracks_read = 0
 
         self.playlists_array: Optional[ET.Element] = None
         self.all_tracks_dict: Optional[ET.Element] = None
@@ -149,6 +223,18 @@ class RekordboxXMLLibrary:
         self.unique_playlist_id_counter += 1
         return self.unique_playlist_id_counter
 
+    def has_track(self, track_id: int) -> bool:
+        """Check if a track has already been added to the Tracks element."""
+        return track_id in self.exported_track_ids
+
+    @staticmethod
+    def gen_persistent_id(track_id: int) -> str:
+        """
+        Generate a persistent id for a track. Derived from the track id so it stays the same between exports,
+        letting Rekordbox match re-imported tracks rather than creating duplicates.
+        """
+        return f"{track_id:016X}"
+
     def create_empty_library_xml(self) -> None:
         # XML declaration and root element setup
         self.plist = ET.Element("plist", version="1.0")
@@ -171,20 +257,23 @@ class RekordboxXMLLibrary:
         self.add_root_playlist()
 
     def save_xml(self, EXPORT_FOLDER, EXPORT_FILENAME: str = "PySyncLibrary.xml") -> None:
-        # Convert to a pretty XML string
-        rough_string = ET.tostring(self.plist, "utf-8")
-        reparsed = minidom.parseString(rough_string)
-        pretty_xml_str = reparsed.toprettyxml(indent="  ", encoding="UTF-8")
+        # Indent in place, much cheaper than re-parsing the whole document to pretty print it
+        ET.indent(self.plist, space="  ")
+        xml_str = ET.tostring(self.plist, encoding="unicode")
 
         # Write the doctype manually since ElementTree won't do it for us (needed by Rekordbox)
+        declaration = '<?xml version="1.0" encoding="UTF-8"?>'
         doctype = '<!DOCTYPE plist PUBLIC "-//Apple Computer//DTD PLIST 1.0//EN" "http://www.apple.com/DTDs/PropertyList-1.0.dtd">'
-        final_xml_content = doctype + '\n' + pretty_xml_str.decode('utf-8')
+        final_xml_content = declaration + '\n' + doctype + '\n' + xml_str + '\n'
 
-        # Save to file based on settings
+        # Save to file based on settings. Written to a temp file first and swapped in, so Rekordbox never
+        # reads a half written library
         file_location = os.path.join(EXPORT_FOLDER,EXPORT_FILENAME)
         os.makedirs(os.path.dirname(file_location), exist_ok=True)
-        with open(file_location, "w", encoding="UTF-8") as f:
+        temp_location = file_location + ".tmp"
+        with open(temp_location, "w", encoding="UTF-8") as f:
             f.write(final_xml_content)
+        os.replace(temp_location, file_location)
         logger.info(f"Exported XML file to {file_location}")
 
     def add_playlist(self, playlist_name: str, file_locations: list[str], parent_persistent_id: str = "PySyncDJ") -> None:
@@ -214,6 +303,19 @@ class RekordboxXMLLibrary:
         self.add_playlist_from_elements(playlist_info)
 
     def add_playlist_from_elements(self, playlist_info: dict) -> None:
+        # Record a hash of the entry so the next export can tell if it changed. Playlist ID is left out as it is
+        # just a position counter, it shifts whenever an earlier playlist is added or removed. The entry's position
+        # among its siblings is hashed instead, so reordering playlists or folders counts as a change.
+        persistent_id = str(playlist_info.get("Playlist Persistent ID"))
+        parent_persistent_id = str(playlist_info.get("Parent Persistent ID"))
+        hashed_entry = {k: v for k, v in playlist_info.items() if k != "Playlist ID"}
+        hashed_entry["Position"] = self._children_added[parent_persistent_id]
+        self._children_added[parent_persistent_id] += 1
+        self.playlist_entries[persistent_id] = {
+            "name": playlist_info.get("Name"),
+            "hash": ExportManifest.hash_entry(hashed_entry),
+        }
+
         playlist_dict = ET.SubElement(self.playlists_array, 'dict')
         for key, value in playlist_info.items():
             ET.SubElement(playlist_dict, 'key').text = key
@@ -232,14 +334,21 @@ class RekordboxXMLLibrary:
     def add_to_all_track(self, tracks_dict: list[DownloadedTrackType]) -> None:
         """
         Adds track information to the Tracks element.
+        Tracks that have already been added are skipped, so each track appears once in the library.
 
         :param tracks_dict: List of tuples (track_id, file_location)
         """
-        formatted_tracks = self.format_tracks_dic(tracks_dict)
-        if formatted_tracks is None:
-            return
+        new_tracks = {}
+        for track_id, file_location in tracks_dict:
+            if track_id not in self.exported_track_ids and track_id not in self.unreadable_track_ids:
+                new_tracks.setdefault(track_id, file_location)
+
+        formatted_tracks = self.format_tracks_dic(list(new_tracks.items()))
+        self.unreadable_track_ids.update(set(new_tracks) - set(formatted_tracks))
 
         for track_id, details in formatted_tracks.items():
+            self.exported_track_ids.add(track_id)
+
             track_key = ET.SubElement(self.all_tracks_dict, 'key')
             track_key.text = str(track_id)
 
@@ -250,16 +359,29 @@ class RekordboxXMLLibrary:
                 child.text = str(value)
 
     def format_tracks_dic(self, downloaded_tracks_dict: list[DownloadedTrackType]) \
-            -> Optional[dict[int, dict[str, Union[str, int, Any]]]]:
+            -> dict[int, dict[str, Union[str, int, Any]]]:
         """
         Formats the track dictionary ready to be saved in the XML tree.
+        Tracks whose file cannot be read are left out.
         """
         formatted_track_dict = {}
 
         for track_id, file_location in downloaded_tracks_dict:
             file_location = os.path.join(file_location)
+
+            # Reuse the details from the last export if the file hasn't changed
+            cached = self.manifest.get_cached_track(track_id, file_location) if self.manifest else None
+            if cached:
+                formatted_track_dict[track_id] = cached['details']
+                self.track_entries[str(track_id)] = cached
+                continue
+
             try:
-                audio = MP3(file_location, ID3=EasyID3)
+                # Easy tags give the same keys for MP3, MP4 and Ogg files
+                audio = MutagenFile(file_location, easy=True)
+                if audio is None:
+                    raise ValueError("Unsupported audio format")
+                self.tracks_read += 1
                 name = audio['title'][0] if 'title' in audio else 'Unknown'
                 artist = audio['artist'][0] if 'artist' in audio else 'Unknown'
                 album = audio['album'][0] if 'album' in audio else 'Unknown'
@@ -272,15 +394,19 @@ class RekordboxXMLLibrary:
                     "Name": name,
                     "Artist": artist,
                     "Album": album,
-                    "Kind": "MPEG audio file",
-                    "Persistent ID": track_id,
+                    "Kind": TRACK_KINDS.get(os.path.splitext(file_location)[1].lower(), "MPEG audio file"),
+                    "Persistent ID": self.gen_persistent_id(track_id),
                     "Track Type": "File",
                     "Location": location
                 }
+                self.track_entries[str(track_id)] = {
+                    "location": file_location,
+                    **(ExportManifest.stat_file(file_location) or {}),
+                    "details": formatted_track_dict[track_id],
+                }
 
             except Exception as e:
                 logger.error(f"Error reading file {file_location}: {e}")
-                return None
 
         return formatted_track_dict
 
@@ -0,0 +1,105 @@
+import hashlib
+import json
+import logging
+import os
+from typing import Any, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+MANIFEST_VERSION = 1
+
+
+class ExportManifest:
+    """
+    Records what was written by the last export so the next export can reuse unchanged work.
+
+    Stores a content hash for every playlist/folder entry and the formatted details of every track
+    (along with the file's size and modified time, so tag data is only re-read when the file changes).
+    Comparing a new export against the manifest also gives a report of what changed.
+    """
+
+    def __init__(self, manifest_path: str, data: Optional[Dict[str, Any]] = None) -> None:
+        self.manifest_path = manifest_path
+        data = data or {}
+        self.playlists: Dict[str, Dict[str, str]] = data.get('playlists', {})
+        self.tracks: Dict[str, Dict[str, Any]] = data.get('tracks', {})
+
+    @classmethod
+    def load(cls, export_folder: str, manifest_filename: str) -> 'ExportManifest':
+        """Load the manifest from the export folder, starting empty if it is missing or unreadable."""
+        manifest_path = os.path.join(export_folder, manifest_filename)
+        if not os.path.exists(manifest_path):
+            return cls(manifest_path)
+
+        try:
+            with open(manifest_path, 'r', encoding='UTF-8') as f:
+                data = json.load(f)
+            if data.get('version') != MANIFEST_VERSION:
+                logger.info("Export manifest version changed, starting a full export")
+                return cls(manifest_path)
+            return cls(manifest_path, data)
+        except Exception as e:
+            logger.warning("Could not read export manifest %s, starting a full export: %s", manifest_path, e)
+            return cls(manifest_path)
+
+    def save(self, playlists: Dict[str, Dict[str, str]], tracks: Dict[str, Dict[str, Any]]) -> None:
+        """Replace the manifest contents with the entries of the latest export and write it to disk."""
+        self.playlists = playlists
+        self.tracks = tracks
+        os.makedirs(os.path.dirname(self.manifest_path), exist_ok=True)
+        with open(self.manifest_path, 'w', encoding='UTF-8') as f:
+            json.dump({'version': MANIFEST_VERSION, 'playlists': playlists, 'tracks': tracks}, f)
+
+    def get_cached_track(self, track_id: int, file_location: str) -> Optional[Dict[str, Any]]:
+        """
+        Returns an entry for the track from the last export if its file has not changed since.
+
+        :return: Dict with the file's location, size, mtime and formatted details, or None if stale/missing.
+        """
+        file_stat = ExportManifest.stat_file(file_location)
+        cached = self.tracks.get(str(track_id))
+        if file_stat and cached and cached.get('location') == file_location \
+                and cached.get('size') == file_stat['size'] and cached.get('mtime') == file_stat['mtime']:
+            return cached
+        return None
+
+    @staticmethod
+    def stat_file(file_location: str) -> Optional[Dict[str, Any]]:
+        try:
+            stat_result = os.stat(file_location)
+        except OSError:
+            return None
+        return {'size': stat_result.st_size, 'mtime': stat_result.st_mtime}
+
+    @staticmethod
+    def hash_entry(entry: Dict[str, Any]) -> str:
+        """Hash a playlist/folder entry so changes in its content can be detected."""
+        return hashlib.sha1(json.dumps(entry, sort_keys=True, default=str).encode('UTF-8')).hexdigest()
+
+    def compare(self, playlists: Dict[str, Dict[str, str]], tracks: Dict[str, Dict[str, Any]]) -> Dict[str, Any]:
+        """
+        Build a report of the differences between the last export and the given entries.
+
+        :param playlists: Playlist/folder entries keyed by persistent id, each with a 'name' and 'hash'.
+        :param tracks: Track entries keyed by track id, each with 'details'.
+        """
+        added = [entry['name'] for key, entry in playlists.items() if key not in self.playlists]
+        removed = [entry['name'] for key, entry in self.playlists.items() if key not in playlists]
+        changed = [entry['name'] for key, entry in playlists.items()
+                   if key in self.playlists and self.playlists[key]['hash'] != entry['hash']]
+
+        tracks_added = [key for key in tracks if key not in self.tracks]
+        tracks_removed = [key for key in self.tracks if key not in tracks]
+        tracks_updated = [key for key, entry in tracks.items()
+                          if key in self.tracks and self.tracks[key].get('details') != entry['details']]
+
+        return {
+            'playlists_added': added,
+            'playlists_removed': removed,
+            'playlists_changed': changed,
+            'playlists_unchanged': len(playlists) - len(added) - len(changed),
+            'tracks_added': len(tracks_added),
+            'tracks_removed': len(tracks_removed),
+            'tracks_updated': len(tracks_updated),
+            'has_changes': bool(added or removed or changed or tracks_added or tracks_removed or tracks_updated),
+        }
@@ -1,321 +1,177 @@
-from app.models import Playlist
-
+import logging
 import os
-import urllib
-import xml.etree.ElementTree as ET
-from typing import Optional, Union, Any
-from xml.dom import minidom
-
-from mutagen.easyid3 import EasyID3
-from mutagen.mp3 import MP3
-
-from app.config import Config
-
-
-class RekordboxExportService:
-    @staticmethod
-    def generate_rekordbox_xml_from_db():
-        """
-        Generates a Rekordbox XML file using data from the SQL database.
-        If the export folder does not exist, it is created.
-        """
-        # Instantiate our repository
-        playlists = Playlist.query.filter_by(disabled=False).all()
-
-        # Create the base Rekordbox XML structure
-        dj_playlists = ET.Element("DJ_PLAYLISTS", Version="1.0.0")
-        ET.SubElement(dj_playlists, "PRODUCT", Name="rekordbox", Version="7.0.4", Company="AlphaTheta")
-        collection = ET.SubElement(dj_playlists, "COLLECTION", Entries="0")
-        playlists_node = ET.SubElement(dj_playlists, "PLAYLISTS")
-        root_playlist_node = ET.SubElement(playlists_node, "NODE", Type="0", Name="ROOT", Count="0")
-
-        track_id_counter = 1
-        track_id_map = {}  # Map from Track.id to Rekordbox TRACK ID
-        total_tracks = 0
-        playlist_count = 0
-
-        # Iterate over playlists to build playlist nodes and the collection
-        for playlist in playlists:
-            playlist_node = ET.SubElement(
-                root_playlist_node,
-                "NODE",
-                Name=playlist.name,
-                Type="1",
-                KeyType="0",
-                Entries="0"  # Will update later
-            )
-            entries_count = 0
-
-            # For each playlist, iterate its tracks in order
-            for pt in playlist.tracks:
-                track = pt.track
-                # Add the track to the collection only once (avoid duplicates)
-                if track.id not in track_id_map:
-                    # Use absolute path for export
-                    absolute_path = track.absolute_download_path
-                    if absolute_path:
-                        location = "file:///" + absolute_path.replace("\\", "/")
-                        location = urllib.parse.quote(location, safe=":/")
-
-                        ET.SubElement(
-                            collection,
-                            "TRACK",
-                            TrackID=str(track_id_counter),
-                            Name=track.name,
-                            Artist=track.artist,
-                            Album=track.album if track.album else "Unknown Album",
-                            Location=location
-                        )
-                        track_id_map[track.id] = track_id_counter
-                        track_id_counter += 1
-                        total_tracks += 1
-                # Reference the track in the current playlist node
-                if track.id in track_id_map:
-                    ET.SubElement(playlist_node, "TRACK", Key=str(track_id_map[track.id]))
-                    entries_count += 1
-
-            # Update playlist node with the number of entries and count this playlist
-            playlist_node.set("Entries", str(entries_count))
-            playlist_count += 1
+import urllib.parse
+from typing import Any, Callable, Dict, List, Optional, TextIO, Tuple
+from xml.sax.saxutils import quoteattr
 
-        collection.set("Entries", str(total_tracks))
-        root_playlist_node.set("Count", str(playlist_count))
+from app.models import Playlist, Track
+from app.repositories.folder_repository import FolderRepository, FolderTree
+from app.services.export_services.export_itunesxml_service import export_lock
 
-        EXPORT_FOLDER = os.path.join(os.getcwd(), Config.EXPORT_FOLDER)
-        EXPORT_FILENAME = 'rekordbox.xml'
-        EXPORT_PATH = os.path.join(EXPORT_FOLDER, EXPORT_FILENAME)
+logger = logging.getLogger(__name__)
 
-        # Ensure the export folder exists
-        if not os.path.exists(EXPORT_FOLDER):
-            os.makedirs(EXPORT_FOLDER)
+ProgressCallbackType = Callable[..., None]
 
-        # Write the XML to the file
-        tree = ET.ElementTree(dj_playlists)
-        tree.write(EXPORT_PATH, encoding="UTF-8", xml_declaration=True)
-        return EXPORT_PATH
+TRACK_KINDS = {
+    '.mp3': 'MP3 File',
+    '.m4a': 'M4A File',
+    '.aac': 'AAC File',
+    '.wav': 'WAV File',
+    '.aiff': 'AIFF File',
+    '.flac': 'FLAC File',
+}
 
-    # @staticmethod
-    # def generate_rekordbox_xml_from_db():
-    #     def generate_rekordbox_xml_from_db(event_logger) -> str:
-    #         """
-    #         Generates a Rekordbox XML file using data from the SQL database and the new RekordboxXMLLibrary.
-    #         Returns the full path to the generated XML file.
-    #         """
-    #         # Instantiate repository and fetch playlists
-    #         playlists = PlaylistRepository.get_all_active_playlists()
-    #
-    #         # Instantiate the new RekordboxXMLLibrary.
-    #         # (We pass in an event_logger; here we use the Flask app's logger.)
-    #         xml_lib = RekordboxXMLLibrary(event_logger)
-    #
-    #         # Iterate over playlists and add each one to the XML.
-    #         # For each playlist, gather the file locations from its tracks.
-    #         for playlist in playlists:
-    #             file_locations = []
-    #             # Assume playlist.tracks is a list of PlaylistTrack objects and each has a .track reference.
-    #             for pt in playlist.tracks:
-    #                 # Check that the track exists and has a download_location defined.
-    #                 if pt.track and pt.track.download_location:
-    #                     file_locations.append(pt.track.download_location)
-    #             if file_locations:
-    #                 xml_lib.add_playlist(playlist.name, file_locations)
-    #
-    #         # Save the XML file.
-    #         # The new library writes the file to a location based on your settings.
-    #         xml_filename = "rekordbox.xml"
-    #         xml_lib.save_xml(xml_filename)
-    #
-    #         # Build the full file path from settings.
-    #         settings = xml_lib.settings  # SettingsSingleton instance
-    #         export_path = os.path.join(settings.dj_library_drive, settings.rekordbox_playlist_folder, xml_filename)
-    #         return export_path
+# Node types in the PLAYLISTS tree
+FOLDER_NODE_TYPE = "0"
+PLAYLIST_NODE_TYPE = "1"
 
 
-class RekordboxXMLLibrary:
-    """
-    This class builds an iTunes Music Library XML file to be used by Rekordbox.
-    The XML mimics an iTunes library so that users can import their whole PySync DJ
-    library using Rekordbox's import iTunes library feature.
+class RekordboxExportService:
     """
+    Exports the library in Rekordbox's native DJ_PLAYLISTS XML format.
 
-    def __init__(self, event_logger: 'EventQueueLogger') -> None:
-        """
-        Initialize the RekordboxXMLLibrary class.
-        """
-        self.unique_track_id_counter = -1
-        self.unique_playlist_id_counter = 1
-
-        self.playlists_array: Optional[ET.Element] = None
-        self.all_tracks_dict: Optional[ET.Element] = None
-        self.plist: Optional[ET.Element] = None
-
-        self.event_logger = event_logger
-        self.create_empty_library_xml()
-
-    def gen_track_id(self) -> int:
-        """Generate a unique track id."""
-        self.unique_track_id_counter += 1
-        return self.unique_track_id_counter
-
-    def gen_playlist_id(self) -> int:
-        """Generate a unique playlist id."""
-        self.unique_playlist_id_counter += 1
-        return self.unique_playlist_id_counter
-
-    def create_empty_library_xml(self) -> None:
-        # XML declaration and root element setup
-        self.plist = ET.Element("plist", version="1.0")
-
-        # Main dictionary element
-        main_dict = ET.SubElement(self.plist, "dict")
-
-        # Add "Library Persistent ID" key with an empty string value
-        ET.SubElement(main_dict, "key").text = "Library Persistent ID"
-        ET.SubElement(main_dict, "string").text = " "  # Needed or Rekordbox won't read the XML
-
-        # All tracks in library dictionary
-        ET.SubElement(main_dict, "key").text = "Tracks"
-        self.all_tracks_dict = ET.SubElement(main_dict, "dict")
-
-        # Playlists array for adding playlist (or folder) dicts
-        ET.SubElement(main_dict, "key").text = "Playlists"
-        self.playlists_array = ET.SubElement(main_dict, "array")
-
-        self.add_root_playlist()
-
-    def save_xml(self, file_name: str = "PySyncLibrary.xml") -> None:
-        # Convert to a pretty XML string
-        rough_string = ET.tostring(self.plist, "utf-8")
-        reparsed = minidom.parseString(rough_string)
-        pretty_xml_str = reparsed.toprettyxml(indent="  ", encoding="UTF-8")
-
-        # Write the doctype manually since ElementTree won't do it for us (needed by Rekordbox)
-        doctype = '<!DOCTYPE plist PUBLIC "-//Apple Computer//DTD PLIST 1.0//EN" "http://www.apple.com/DTDs/PropertyList-1.0.dtd">'
-        final_xml_content = doctype + '\n' + pretty_xml_str.decode('utf-8')
-
-        # Save to file based on settings
-        file_location = os.path.join(
-            self.settings.dj_library_drive,
-            self.settings.rekordbox_playlist_folder,
-            file_name
-        )
-        os.makedirs(os.path.dirname(file_location), exist_ok=True)
-        with open(file_location, "w", encoding="UTF-8") as f:
-            f.write(final_xml_content)
+    Unlike the iTunes XML export, tracks are written straight from the database (no tag reads) into a
+    deduplicated COLLECTION, and the file is streamed out line by line rather than built in memory.
+    Rekordbox imports this format directly, which is much faster for very large collections.
+    """
 
-    def add_playlist(self, playlist_name: str, file_locations: list[str]) -> None:
+    @staticmethod
+    def generate_rekordbox_xml_from_db(EXPORT_FOLDER, EXPORT_FILENAME,
+                                       progress_callback: Optional[ProgressCallbackType] = None
+                                       ) -> Tuple[str, Dict[str, Any]]:
         """
-        Adds playlist information to the playlists element.
+        Generates a DJ_PLAYLISTS XML file reflecting the enabled folder/playlist structure.
 
-        :param playlist_name: Name of the playlist.
-        :param file_locations: List of file locations for tracks.
+        :param progress_callback: Called after each playlist with playlists_processed, playlists_total and
+            tracks_processed keyword arguments. May raise to abort the export (e.g. when cancelled).
+        :return: The export path and a summary of what was exported.
         """
-        track_dict = [(self.gen_track_id(), file_location) for file_location in file_locations]
-
-        self.add_to_all_track(track_dict)
-
-        playlist_id = self.gen_playlist_id()
+        with export_lock:
+            folder_tree = FolderRepository.load_folder_tree(with_tracks=True)
 
-        playlist_info = {
-            "Name": playlist_name,
-            "Description": " ",
-            "Playlist ID": playlist_id,
-            "Playlist Persistent ID": f"{playlist_id}",
-            "Parent Persistent ID": "PySyncDJ",
-            "All Items": True,
-            "Playlist Items": [{"Track ID": track_id} for track_id, _ in track_dict]
-        }
+            # Build the node tree first, the COLLECTION and every NODE needs its entry count up front
+            nodes = RekordboxExportService._build_nodes(folder_tree, folder_id=None)
+            collection: Dict[int, Track] = {}
+            RekordboxExportService._collect_tracks(nodes, collection)
+            playlists_total = RekordboxExportService._count_playlists(nodes)
 
-        self.add_playlist_from_elements(playlist_info)
+            export_path = os.path.join(EXPORT_FOLDER, EXPORT_FILENAME)
+            os.makedirs(EXPORT_FOLDER, exist_ok=True)
+            temp_path = export_path + ".tmp"
 
-    def add_playlist_from_elements(self, playlist_info: dict) -> None:
-        playlist_dict = ET.SubElement(self.playlists_array, 'dict')
-        for key, value in playlist_info.items():
-            ET.SubElement(playlist_dict, 'key').text = key
-            if key == "Playlist Items":
-                array_element = ET.SubElement(playlist_dict, 'array')
-                for item in value:
-                    dict_element = ET.SubElement(array_element, 'dict')
-                    ET.SubElement(dict_element, 'key').text = 'Track ID'
-                    ET.SubElement(dict_element, 'integer').text = str(item['Track ID'])
-            elif isinstance(value, bool):
-                ET.SubElement(playlist_dict, 'true' if value else 'false')
-            else:
-                child_type = 'string' if isinstance(value, str) else 'integer'
-                ET.SubElement(playlist_dict, child_type).text = str(value)
+            progress = {'playlists_processed': 0, 'playlists_total': playlists_total,
+                        'tracks_processed': len(collection)}
 
-    def add_to_all_track(self, tracks_dict: list[tuple[int, str]]) -> None:
-        """
-        Adds track information to the Tracks element.
+            def on_playlist_written():
+                progress['playlists_processed'] += 1
+                if progress_callback:
+                    progress_callback(**progress)
 
-        :param tracks_dict: List of tuples (track_id, file_location)
-        """
-        formatted_tracks = self.format_tracks_dic(tracks_dict)
-        if formatted_tracks is None:
-            return
-
-        for track_id, details in formatted_tracks.items():
-            track_key = ET.SubElement(self.all_tracks_dict, 'key')
-            track_key.text = str(track_id)
-
-            track_dict = ET.SubElement(self.all_tracks_dict, 'dict')
-            for key, value in details.items():
-                ET.SubElement(track_dict, 'key').text = key
-                child = ET.SubElement(track_dict, 'string' if key != 'Track ID' else 'integer')
-                child.text = str(value)
+            try:
+                with open(temp_path, "w", encoding="UTF-8") as f:
+                    f.write('<?xml version="1.0" encoding="UTF-8"?>\n')
+                    f.write('<DJ_PLAYLISTS Version="1.0.0">\n')
+                    f.write('  <PRODUCT Name="rekordbox" Version="7.0.4" Company="AlphaTheta"/>\n')
+
+                    f.write(f'  <COLLECTION Entries="{len(collection)}">\n')
+                    for track in collection.values():
+                        RekordboxExportService._write_track(f, track)
+                    f.write('  </COLLECTION>\n')
+
+                    f.write('  <PLAYLISTS>\n')
+                    f.write(f'    <NODE Type="{FOLDER_NODE_TYPE}" Name="ROOT" Count="{len(nodes)}">\n')
+                    for node in nodes:
+                        RekordboxExportService._write_node(f, node, depth=3, on_playlist_written=on_playlist_written)
+                    f.write('    </NODE>\n')
+                    f.write('  </PLAYLISTS>\n')
+                    f.write('</DJ_PLAYLISTS>\n')
+
+                # Swap the finished file in, so Rekordbox never reads a half written library
+                os.replace(temp_path, export_path)
+            finally:
+                if os.path.exists(temp_path):
+                    os.remove(temp_path)
+
+            logger.info("Exported DJ_PLAYLISTS XML file to %s", export_path)
+            return export_path, {'playlists': playlists_total, 'tracks': len(collection)}
 
-    def format_tracks_dic(
-            self, downloaded_tracks_dict: list[tuple[int, str]]
-    ) -> Optional[dict[int, dict[str, Union[str, int, Any]]]]:
+    @staticmethod
+    def _build_nodes(folder_tree: FolderTree, folder_id) -> List[Dict[str, Any]]:
         """
-        Formats the track dictionary ready to be saved in the XML tree.
+        Builds the enabled folders and playlists within a folder into nested node dicts, in custom order.
+        Playlists without any downloaded tracks are left out.
         """
-        formatted_track_dict = {}
-
-        for track_id, file_location in downloaded_tracks_dict:
-            file_location = os.path.join(self.settings.dj_library_drive, file_location)
-            try:
-                audio = MP3(file_location, ID3=EasyID3)
-                name = audio['title'][0] if 'title' in audio else 'Unknown'
-                artist = audio['artist'][0] if 'artist' in audio else 'Unknown'
-                album = audio['album'][0] if 'album' in audio else 'Unknown'
-                # Optionally, add track length or other data here
+        nodes = []
+        for item_type, item in folder_tree.get_children(folder_id):
+            if item.disabled:
+                continue
+
+            if item_type == 'folder':
+                nodes.append({
+                    'name': item.name,
+                    'type': FOLDER_NODE_TYPE,
+                    'children': RekordboxExportService._build_nodes(folder_tree, item.id),
+                })
+            else:
+                tracks = RekordboxExportService._get_downloaded_tracks(item)
+                if tracks:
+                    nodes.append({'name': item.name, 'type': PLAYLIST_NODE_TYPE, 'tracks': tracks})
+        return nodes
 
-                location = f"file://localhost/{urllib.parse.quote(file_location)}"
+    @staticmethod
+    def _get_downloaded_tracks(playlist: Playlist) -> List[Track]:
+        return [pt.track for pt in playlist.tracks if pt.track and pt.track.download_location]
 
-                formatted_track_dict[track_id] = {
-                    "Track ID": track_id,
-                    "Name": name,
-                    "Artist": artist,
-                    "Album": album,
-                    "Kind": "MPEG audio file",
-                    "Persistent ID": track_id,
-                    "Track Type": "File",
-                    "Location": location
-                }
+    @staticmethod
+    def _collect_tracks(nodes: List[Dict[str, Any]], collection: Dict[int, Track]) -> None:
+        """Gathers every track in the node tree into the collection, keyed by track id so each appears once."""
+        for node in nodes:
+            if node['type'] == FOLDER_NODE_TYPE:
+                RekordboxExportService._collect_tracks(node['children'], collection)
+            else:
+                for track in node['tracks']:
+                    collection.setdefault(track.id, track)
 
-            except Exception as e:
-                print(f"Error reading file {file_location}: {e}")
-                return None
+    @staticmethod
+    def _count_playlists(nodes: List[Dict[str, Any]]) -> int:
+        return sum(RekordboxExportService._count_playlists(node['children']) if node['type'] == FOLDER_NODE_TYPE
+                   else 1 for node in nodes)
 
-        return formatted_track_dict
+    @staticmethod
+    def _write_track(f: TextIO, track: Track) -> None:
+        absolute_path = track.absolute_download_path
+        extension = os.path.splitext(absolute_path)[1].lower()
+        attributes = {
+            'TrackID': str(track.id),
+            'Name': track.name or "Unknown",
+            'Artist': track.artist or "Unknown",
+            'Album': track.album or "Unknown Album",
+            'Kind': TRACK_KINDS.get(extension, 'MP3 File'),
+            'Location': RekordboxExportService.get_track_location(absolute_path),
+        }
+        f.write('    <TRACK ' + ' '.join(f'{key}={quoteattr(value)}' for key, value in attributes.items()) + '/>\n')
 
-    def add_root_playlist(self) -> None:
-        """
-        Add the root "PySync DJ" folder.
-        """
-        root_folder_elements = [
-            ("Name", "string", "PySync DJ"),
-            ("Description", "string", " "),
-            ("Playlist ID", "integer", "1"),
-            ("Playlist Persistent ID", "string", "PySyncDJ"),
-            ("All Items", "true", None),
-            ("Folder", "true", None)
-        ]
+    @staticmethod
+    def _write_node(f: TextIO, node: Dict[str, Any], depth: int, on_playlist_written: Callable[[], None]) -> None:
+        indent = '  ' * depth
+        name = quoteattr(node['name'])
+        if node['type'] == FOLDER_NODE_TYPE:
+            f.write(f'{indent}<NODE Type="{FOLDER_NODE_TYPE}" Name={name} Count="{len(node["children"])}">\n')
+            for child in node['children']:
+                RekordboxExportService._write_node(f, child, depth + 1, on_playlist_written)
+            f.write(f'{indent}</NODE>\n')
+        else:
+            f.write(f'{indent}<NODE Name={name} Type="{PLAYLIST_NODE_TYPE}" KeyType="0" '
+                    f'Entries="{len(node["tracks"])}">\n')
+            for track in node['tracks']:
+                f.write(f'{indent}  <TRACK Key="{track.id}"/>\n')
+            f.write(f'{indent}</NODE>\n')
+            on_playlist_written()
 
-        root_playlist = ET.SubElement(self.playlists_array, "dict")
-        for key, tag, text in root_folder_elements:
-            ET.SubElement(root_playlist, "key").text = key
-            child = ET.SubElement(root_playlist, tag)
-            if text is not None:
-                child.text = text
\ No newline at end of file
+    @staticmethod
+    def get_track_location(absolute_path: str) -> str:
+        """Formats a file path as a Rekordbox location URI, e.g. file://localhost/C:/Music/track.mp3"""
+        path = absolute_path.replace("\\", "/")
+        if not path.startswith("/"):
+            path = "/" + path
+        return "file://localhost" + urllib.parse.quote(path, safe="/:")
@@ -0,0 +1,197 @@
+import logging
+import os
+from typing import Any, Callable, Dict, Iterable, List, Optional, Set
+
+from app.extensions import db
+from app.models import PartialDownload, PlaylistTrack, Track
+from app.utils.db_utils import commit_with_retries
+from app.utils.file_download_utils import FileDownloadUtils
+from app.utils.library_index import LibraryIndex
+
+logger = logging.getLogger(__name__)
+
+ProgressCallbackType = Callable[..., None]
+
+
+class LibraryReconciliationService:
+    """
+    Reconciles the tracks table with the files actually in the download folder.
+
+    The folder is scanned once into a LibraryIndex, then every track is checked against it:
+    - Tracks whose file is still there are left alone.
+    - Tracks whose file has moved (same filename, elsewhere in the folder) are pointed at the new location.
+    - Tracks whose file has gone have their download location cleared, so the next sync downloads them again.
+    - Tracks without a download location adopt an unclaimed file named the way the downloader would have named it.
+    Files no track claims are reported as orphans. All updates are written in one bulk update.
+
+    Files of downloads in progress (a raw download waiting to be transcoded, or the MP3 not yet recorded on its track)
+    are left alone, they belong to the track being downloaded.
+    """
+
+    @staticmethod
+    def reconcile(dry_run: bool = False, library_index: Optional[LibraryIndex] = None,
+                  progress_callback: Optional[ProgressCallbackType] = None) -> Dict[str, Any]:
+        """
+        Reconcile the database against the download folder.
+
+        :param dry_run: Only report what would change, without updating the database.
+        :param library_index: A prebuilt index to use instead of scanning the download folder.
+        :param progress_callback: Called with a stage keyword argument as the reconciliation progresses.
+        :return: A report of the tracks relocated, marked missing and adopted, and the orphaned files.
+        """
+        if progress_callback:
+            progress_callback(stage='scanning')
+        index = library_index if library_index is not None else LibraryIndex.build()
+
+        if progress_callback:
+            progress_callback(stage='reconciling', files_scanned=len(index))
+
+        # Only the columns needed, loading full Track objects for a large library is slow
+        tracks = db.session.query(Track.id, Track.name, Track.artist, Track.download_location).all()
+
+        paths = index.get_paths()
+        claimed: Set[str] = LibraryReconciliationService._get_in_progress_paths(paths)
+        unplaced = []
+        relocated, missing, adopted = [], [], []
+        ok_count = 0
+
+        for track in tracks:
+            if track.download_location and index.contains(track.download_location):
+                claimed.add(index.relative_path(track.download_location))
+                ok_count += 1
+            else:
+                unplaced.append(track)
+
+        # Tracks whose files went missing, and then tracks that were never downloaded, try to find a file
+        unplaced.sort(key=lambda t: t.download_location is None)
+        for track in unplaced:
+            if track.download_location:
+                new_location = LibraryReconciliationService._find_moved_file(index, track.download_location, claimed)
+                if new_location:
+                    relocated.append(LibraryReconciliationService._change(track, new_location))
+                else:
+                    missing.append(LibraryReconciliationService._change(track, None))
+            else:
+                new_location = LibraryReconciliationService._find_orphan_for_track(index, track, claimed)
+                if new_location:
+                    adopted.append(LibraryReconciliationService._change(track, new_location))
+
+        orphans = sorted(path for path in paths if path not in claimed)
+
+        if not dry_run:
+            LibraryReconciliationService._apply_changes(relocated + missing + adopted)
+            logger.info("Reconciled library: %d relocated, %d missing, %d adopted, %d orphans",
+                        len(relocated), len(missing), len(adopted), len(orphans))
+
+        return {
+            'dry_run': dry_run,
+            'files_scanned': len(index),
+            'tracks_checked': len(tracks),
+            'tracks_ok': ok_count,
+            'relocated': relocated,
+            'missing': missing,
+            'adopted': adopted,
+            'orphans': orphans,
+        }
+
+    @staticmethod
+    def apply_file_changes(index: LibraryIndex, created: Iterable[str], deleted: Iterable[str]) -> Dict[str, Any]:
+        """
+        Reconcile only the tracks affected by files appearing or disappearing, e.g. as seen by the library watcher.
+        The index should already reflect the changes.
+
+        :param created: Paths of files that appeared in the download folder.
+        :param deleted: Paths of files that were removed from the download folder.
+        :return: The tracks relocated, marked missing and adopted, and the ids of the playlists containing them.
+        """
+        created_paths = {index.relative_path(path) for path in created} - {None}
+        deleted_paths = {index.relative_path(path) for path in deleted} - {None}
+        # A download's own files coming and going (e.g. its raw file removed once transcoded) is left to it
+        in_progress = LibraryReconciliationService._get_in_progress_paths(created_paths | deleted_paths)
+        deleted_paths -= in_progress
+        relocated, missing, adopted = [], [], []
+
+        columns = (Track.id, Track.name, Track.artist, Track.download_location)
+        claimed = {track.download_location for track in
+                   db.session.query(*columns).filter(Track.download_location.in_(created_paths))}
+        # Only the new files are candidates, everything else in the index is assumed to be claimed already
+        claimed.update(index.get_paths() - created_paths)
+        claimed.update(in_progress)
+
+        if deleted_paths:
+            for track in db.session.query(*columns).filter(Track.download_location.in_(deleted_paths)):
+                new_location = LibraryReconciliationService._find_moved_file(index, track.download_location, claimed)
+                if new_location:
+                    relocated.append(LibraryReconciliationService._change(track, new_location))
+                else:
+                    missing.append(LibraryReconciliationService._change(track, None))
+
+        if created_paths - claimed:
+            for track in db.session.query(*columns).filter(Track.download_location.is_(None)):
+                new_location = LibraryReconciliationService._find_orphan_for_track(index, track, claimed)
+                if new_location:
+                    adopted.append(LibraryReconciliationService._change(track, new_location))
+                if not created_paths - claimed:
+                    break
+
+        changes = relocated + missing + adopted
+        LibraryReconciliationService._apply_changes(changes)
+        playlist_ids = []
+        if changes:
+            playlist_ids = [row.playlist_id for row in db.session.query(PlaylistTrack.playlist_id).filter(
+                PlaylistTrack.track_id.in_([change['track_id'] for change in changes])).distinct()]
+
+        return {'relocated': relocated, 'missing': missing, 'adopted': adopted, 'playlist_ids': playlist_ids}
+
+    @staticmethod
+    def _get_in_progress_paths(paths: Iterable[str]) -> Set[str]:
+        """The paths that are files of a download in progress (a PartialDownload), whatever their extension."""
+        file_stems = {os.path.normcase(os.path.normpath(file_stem))
+                      for (file_stem,) in db.session.query(PartialDownload.file_stem)}
+        if not file_stems:
+            return set()
+        return {path for path in paths if os.path.normcase(os.path.splitext(path)[0]) in file_stems}
+
+    @staticmethod
+    def _apply_changes(changes: List[Dict[str, Any]]) -> None:
+        """Write the new download locations in a single bulk update."""
+        updates = [{'id': change['track_id'], 'download_location': change['new_location']} for change in changes]
+        if updates:
+            db.session.bulk_update_mappings(Track, updates)
+            commit_with_retries(db.session)
+
+    @staticmethod
+    def _find_moved_file(index: LibraryIndex, download_location: str, claimed: Set[str]) -> Optional[str]:
+        """Find the track's file elsewhere in the folder by its filename, if exactly one unclaimed match exists."""
+        candidates = [path for path in index.find_by_basename(os.path.basename(download_location))
+                      if path not in claimed]
+        if len(candidates) != 1:
+            return None
+        claimed.add(candidates[0])
+        return candidates[0]
+
+    @staticmethod
+    def _find_orphan_for_track(index: LibraryIndex, track, claimed: Set[str]) -> Optional[str]:
+        """Find an unclaimed file named the way the download services name this track's file."""
+        for stem in LibraryReconciliationService.get_expected_filename_stems(track.name, track.artist):
+            candidates = [path for path in index.find_by_stem(stem) if path not in claimed]
+            if len(candidates) == 1:
+                claimed.add(candidates[0])
+                return candidates[0]
+        return None
+
+    @staticmethod
+    def get_expected_filename_stems(name: str, artist: str) -> List[str]:
+        """Filenames (without extension) the download services may have saved a track under."""
+        stems = [f"{name} - {artist}", f"{artist} - {name}", name]
+        return [FileDownloadUtils.sanitize_filename(stem) for stem in stems if stem]
+
+    @staticmethod
+    def _change(track, new_location: Optional[str]) -> Dict[str, Any]:
+        return {
+            'track_id': track.id,
+            'name': track.name,
+            'artist': track.artist,
+            'old_location': track.download_location,
+            'new_location': new_location,
+        }
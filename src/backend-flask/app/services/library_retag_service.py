@@ -0,0 +1,116 @@
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from types import SimpleNamespace
+from typing import Any, Callable, Dict, List, Optional
+
+from app.extensions import db
+from app.models import Track
+from app.utils.file_download_utils import FileDownloadUtils
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+ProgressCallbackType = Callable[..., None]
+
+PROGRESS_INTERVAL = 100  # Files checked between progress reports
+
+
+class LibraryRetagService:
+    """
+    Rewrites the tags of downloaded files from the tracks' metadata in the database, e.g. after fixing track
+    metadata, without downloading anything again.
+
+    Only the tags of each file are read and compared with what embed_track_metadata would write, and only files with
+    differences are saved. MP3 tags have padding reserved (see FileDownloadUtils), so rewrites happen in place.
+    Files are checked and written by a thread pool, as the work is almost all file I/O.
+    """
+
+    @staticmethod
+    def retag(dry_run: bool = False, workers: Optional[int] = None,
+              progress_callback: Optional[ProgressCallbackType] = None) -> Dict[str, Any]:
+        """
+        Re-tag every downloaded file whose tags differ from its track's metadata.
+
+        :param dry_run: Only report the differences, without writing any files.
+        :param workers: Number of files checked concurrently, defaults to Config.RETAG_WORKERS
+        :param progress_callback: Called with processed and total keyword arguments as files are checked.
+            May raise to stop the job (e.g. when cancelled), files already re-tagged stay re-tagged.
+        :return: Counts of files up to date, re-tagged (or to re-tag), missing and failed, and each file's changes.
+        """
+        files = LibraryRetagService._get_downloaded_files()
+        total = len(files)
+        report = {'dry_run': dry_run, 'files_checked': 0, 'up_to_date': 0, 'retagged': 0, 'missing': 0,
+                  'failed': 0, 'changes': [], 'errors': []}
+        if progress_callback:
+            progress_callback(processed=0, total=total)
+
+        executor = ThreadPoolExecutor(max_workers=workers or Config.RETAG_WORKERS, thread_name_prefix="retag")
+        try:
+            futures = {executor.submit(LibraryRetagService._retag_file, file_path, track, dry_run): (file_path, track)
+                       for file_path, track in files.items()}
+            for future in as_completed(futures):
+                file_path, track = futures[future]
+                LibraryRetagService._add_to_report(report, future, file_path, track)
+                report['files_checked'] += 1
+                if progress_callback and (report['files_checked'] % PROGRESS_INTERVAL == 0
+                                          or report['files_checked'] == total):
+                    progress_callback(processed=report['files_checked'], total=total)
+        finally:
+            executor.shutdown(wait=True, cancel_futures=True)
+
+        logger.info("Re-tagged library%s: %d re-tagged, %d up to date, %d missing, %d failed",
+                    " (dry run)" if dry_run else "", report['retagged'], report['up_to_date'], report['missing'],
+                    report['failed'])
+        return report
+
+    @staticmethod
+    def _get_downloaded_files() -> Dict[str, SimpleNamespace]:
+        """
+        Downloaded files and the track to tag each with. A file shared by several tracks is tagged from the first one
+        downloaded. Tracks are copied out of the session as the worker threads can't use it.
+        """
+        columns = (Track.id, Track.name, Track.artist, Track.album, Track.album_art_url, Track.download_url,
+                   Track.platform, Track.platform_id, Track.download_location)
+        rows = db.session.query(*columns).filter(Track.download_location.isnot(None)).order_by(Track.id).all()
+
+        files: Dict[str, SimpleNamespace] = {}
+        for row in rows:
+            file_path = os.path.normpath(FileDownloadUtils.get_absolute_path(row.download_location))
+            files.setdefault(file_path, SimpleNamespace(**row._asdict()))
+        return files
+
+    @staticmethod
+    def _retag_file(file_path: str, track: SimpleNamespace, dry_run: bool) -> Optional[List[str]]:
+        """Re-tag a file if its tags differ. Returns the differing tags, or None if the file is missing."""
+        if not os.path.isfile(file_path):
+            return None
+
+        differences = FileDownloadUtils.get_tag_differences(file_path, track)
+        if differences and not dry_run:
+            FileDownloadUtils.embed_track_metadata(file_path, track)
+        return differences
+
+    @staticmethod
+    def _add_to_report(report: Dict[str, Any], future, file_path: str, track: SimpleNamespace) -> None:
+        try:
+            differences = future.result()
+        except Exception as e:
+            logger.warning("Failed to re-tag '%s': %s", file_path, e)
+            report['failed'] += 1
+            report['errors'].append({'track_id': track.id, 'location': track.download_location, 'error': str(e)})
+            return
+
+        if differences is None:
+            report['missing'] += 1
+        elif differences:
+            report['retagged'] += 1
+            report['changes'].append({
+                'track_id': track.id,
+                'name': track.name,
+                'artist': track.artist,
+                'location': track.download_location,
+                'tags': differences,
+            })
+        else:
+            report['up_to_date'] += 1
@@ -10,6 +10,8 @@ from bs4 import BeautifulSoup
 from app.models import Track
 from app.repositories.playlist_repository import PlaylistRepository
 from app.utils.file_download_utils import FileDownloadUtils
+from app.utils.rate_limiter import AdaptiveRateLimiter, RateLimitedError
+from app.utils.response_cache import ResponseCache
 from config import Config
 from app.extensions import emit_error_message
 
@@ -31,8 +33,28 @@ headers = {
     "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/114.0.0.0 Safari/537.36"
 }
 
+THROTTLE_RETRIES = 3  # Times a throttled (429) request is retried, after the rate limiter's pause
+
 
 class SoundcloudService:
+    @staticmethod
+    def _rate_limited_get(url: str, headers: dict, query_params=None) -> requests.Response:
+        """
+        GET request paced by the SoundCloud rate limiter, retrying when throttled.
+        """
+        limiter = AdaptiveRateLimiter.get('soundcloud')
+        for _attempt in range(THROTTLE_RETRIES + 1):
+            limiter.wait()
+            start = time.monotonic()
+            response = requests.get(url, headers=headers, params=query_params)
+            if response.status_code != 429:
+                if response.status_code < 500:
+                    limiter.record_success(time.monotonic() - start)
+                return response
+            logger.warning("Throttled by SoundCloud for URL %s", url)
+            limiter.record_throttled(AdaptiveRateLimiter.parse_retry_after(response.headers.get('Retry-After')))
+        raise RateLimitedError("SoundCloud is rate limiting requests, try again later.")
+
     @staticmethod
     def _make_http_get_request(url: str, headers: dict, query_params=None) -> dict:
         """
@@ -44,7 +66,7 @@ class SoundcloudService:
         if not client_id:
             raise ValueError("Missing SoundCloud client ID in environment variables.")
 
-        response = requests.get(url, headers=headers, params=query_params)
+        response = SoundcloudService._rate_limited_get(url, headers, query_params)
         if response.status_code != 200:
             logger.error("HTTP GET error for URL %s: %s", url, response.text)
 
@@ -66,7 +88,7 @@ class SoundcloudService:
         Helper method for making HTTP GET requests with error handling.
         """
         logger.info("Making GET request to: %s", url)
-        response = requests.get(url, headers=headers)
+        response = SoundcloudService._rate_limited_get(url, headers)
         if response.status_code != 200:
             logger.error("HTTP GET error for URL %s: %s", url, response.text)
 
@@ -94,6 +116,7 @@ class SoundcloudService:
             'artist': track.get('user', {}).get('username') if track.get('user') else None,
             'album': None,  # SoundCloud tracks typically do not have album info
             'album_art_url': track.get('artwork_url'),
+            'duration': track['duration'] // 1000 if track.get('duration') else None,  # Given in milliseconds
             'download_url': permalink or None,
             'notes_errors': error,
         }
@@ -124,7 +147,15 @@ class SoundcloudService:
     @staticmethod
     def _resolve_playlist(playlist_url: str) -> dict:
         """
-        Resolves a SoundCloud playlist URL using the SoundCloud API.
+        Resolves a SoundCloud playlist URL, cached so a sync's playlist data and tracks come from one page fetch.
+        """
+        return ResponseCache.get_or_fetch("soundcloud_playlist", playlist_url,
+                                          lambda: SoundcloudService._fetch_playlist(playlist_url))
+
+    @staticmethod
+    def _fetch_playlist(playlist_url: str) -> dict:
+        """
+        Fetches a SoundCloud playlist's data.
         Playlist data is stored in a script tag in the HTML of the playlist page.
         """
         response_html = SoundcloudService._make_html_get_request(playlist_url, headers)
@@ -226,7 +257,6 @@ class SoundcloudService:
             if not data.get("collection") or not data.get("next_href"):
                 break
             api_url = data.get("next_href")
-            time.sleep(0.1)  # be nice to the API
         liked_tracks_formatted = [SoundcloudService._parse_track(track.get("track")) for track in liked_tracks if
                                   track.get("track")]
 
@@ -318,7 +348,6 @@ class SoundcloudService:
                 logger.info("Fetching track metadata for batch: %s", batch_ids_str)
                 batch_data = SoundcloudService._make_http_get_request(url, headers)
                 tracks_metadata.extend(batch_data)
-                time.sleep(0.1)  # Brief pause between requests
 
             # Parse each track's metadata into our db format
             new_tracks_data = [SoundcloudService._parse_track(track) for track in tracks_metadata]
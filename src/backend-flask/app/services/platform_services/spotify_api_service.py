@@ -1,6 +1,7 @@
 import logging
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Callable, Iterator, Optional
 
 from flask import session, redirect, url_for
 from spotipy import Spotify
@@ -8,11 +9,16 @@ from spotipy.oauth2 import SpotifyClientCredentials, SpotifyOAuth
 
 from app.repositories.playlist_repository import PlaylistRepository
 from app.services.platform_services.spotify_base_service import BaseSpotifyService
+from app.utils.rate_limiter import AdaptiveRateLimiter
+from app.utils.response_cache import ResponseCache
 from config import Config
 
 logger = logging.getLogger(__name__)
 
 SPOTIPY_CALLBACK_URL = f'http://localhost:{Config.SPOTIFY_PORT_NUMBER}/callback'
+SAVED_TRACKS_URL = "https://open.spotify.com/collection/tracks"
+PLAYLIST_ITEMS_PAGE_SIZE = 100  # The most the API returns per page
+SAVED_TRACKS_PAGE_SIZE = 50
 
 
 class SpotifyApiService(BaseSpotifyService):
@@ -49,7 +55,7 @@ class SpotifyApiService(BaseSpotifyService):
             playlist_id = SpotifyApiService._extract_playlist_id(url)
 
             client = SpotifyApiService.get_client()
-            response = client.playlist(playlist_id)
+            response = ResponseCache.get_or_fetch("spotify_playlist", url, lambda: client.playlist(playlist_id))
 
             logger.debug(response.get('tracks', []))
 
@@ -71,7 +77,7 @@ class SpotifyApiService(BaseSpotifyService):
     def _get_saved_tracks_playlist():
         """ Create a playlist that will represent the user's liked tracks. """
         client = SpotifyApiService.get_auth_client()
-        response = client.current_user_saved_tracks()
+        response = SpotifyApiService._get_saved_tracks_first_page(client)
 
         data = {
             'name': "Your Liked Spotify Songs",
@@ -84,6 +90,47 @@ class SpotifyApiService(BaseSpotifyService):
 
         return data
 
+    @staticmethod
+    def _get_saved_tracks_first_page(client: Spotify) -> Dict[str, Any]:
+        """The first page of liked tracks, cached as both the playlist data and its tracks start with it."""
+        return ResponseCache.get_or_fetch(
+            "spotify_saved_tracks", SAVED_TRACKS_URL,
+            lambda: AdaptiveRateLimiter.get('spotify').call(client.current_user_saved_tracks,
+                                                            limit=SAVED_TRACKS_PAGE_SIZE))
+
+    @staticmethod
+    def _iter_page_items(fetch_page: Callable[[int, int], Dict[str, Any]], page_size: int,
+                         first_page: Optional[Dict[str, Any]] = None) -> Iterator[Dict[str, Any]]:
+        """
+        Yields every item of a paged endpoint in order. The first page gives the total, so the offsets of the rest
+        are known and they're fetched concurrently (Config.SPOTIFY_PAGE_WORKERS pages at a time) through the Spotify
+        rate limiter. The next pages are only fetched once the items before them have been consumed, so a caller
+        stopping early (e.g. at a track limit) doesn't fetch the whole playlist.
+
+        :param fetch_page: Fetches the page at (limit, offset)
+        :param first_page: The first page, if already fetched
+        """
+        limiter = AdaptiveRateLimiter.get('spotify')
+        page = first_page or limiter.call(fetch_page, page_size, 0)
+        items = page.get('items') or []
+        yield from items
+        # A page without a total is taken to be the only one
+        total = page.get('total', len(items))
+
+        offsets = list(range(page_size, total, page_size))
+        if not offsets:
+            return
+        workers = min(Config.SPOTIFY_PAGE_WORKERS, len(offsets))
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="spotify-pages") as executor:
+            for start in range(0, len(offsets), workers):
+                # The whole batch is fetched before any of it is yielded, so stopping early never leaves a batch
+                # part fetched
+                futures = [executor.submit(limiter.call, fetch_page, page_size, offset)
+                           for offset in offsets[start:start + workers]]
+                pages = [future.result() for future in futures]
+                for page in pages:
+                    yield from page.get('items') or []
+
     @staticmethod
     def get_playlist_tracks(url: str) -> List[Dict[str, Any]]:
         """
@@ -103,30 +150,21 @@ class SpotifyApiService(BaseSpotifyService):
             date_limit = playlist.to_dict().get('date_limit', None)
 
             tracks_data = []
-            limit = 25
-            offset = 0
-
-            while True:
-                # Fetch a batch of playlist items (tracks)
-                results = client.playlist_items(playlist_id, limit=limit, offset=offset)
-
-                for item in results.get('items', []):
-                    if not SpotifyApiService._is_track_within_date_and_track_limit(len(tracks_data), item, track_limit,
-                                                                                date_limit):
-                        return tracks_data[:track_limit]
-                    track_added_on = item.get('added_at', None)
-                    track = item.get('track')
-                    if not track or track.get('id') is None:
-                        continue  # Skip items that aren't valid tracks (e.g. episodes, missing tracks)
-
-                    track_data = SpotifyApiService._format_track_data(track, track_added_on)
-                    tracks_data.append(track_data)
-
-                # Check if there are more pages to fetch. "URL to the next page of items. (null if none)"
-                if results.get('next'):
-                    offset += limit
-                else:
-                    break
+            items = SpotifyApiService._iter_page_items(
+                lambda limit, offset: client.playlist_items(playlist_id, limit=limit, offset=offset),
+                PLAYLIST_ITEMS_PAGE_SIZE)
+
+            for item in items:
+                if not SpotifyApiService._is_track_within_date_and_track_limit(len(tracks_data), item, track_limit,
+                                                                            date_limit):
+                    return tracks_data[:track_limit]
+                track_added_on = item.get('added_at', None)
+                track = item.get('track')
+                if not track or track.get('id') is None:
+                    continue  # Skip items that aren't valid tracks (e.g. episodes, missing tracks)
+
+                track_data = SpotifyApiService._format_track_data(track, track_added_on)
+                tracks_data.append(track_data)
 
             logger.info("Fetched %d tracks for playlist %s", len(tracks_data), playlist_id)
             return tracks_data
@@ -139,7 +177,7 @@ class SpotifyApiService(BaseSpotifyService):
     def _get_saved_tracks():
         """
         Retrieves the current user's liked tracks (saved tracks) using SpotifyOAuth.
-        It accumulates the tracks page by page while applying a date limit and a track count limit.
+        It accumulates the tracks in order while applying a date limit and a track count limit.
 
         :return: A list of dictionaries, each representing a liked track.
         """
@@ -151,24 +189,23 @@ class SpotifyApiService(BaseSpotifyService):
 
         liked_songs = []
         try:
-            results = client.current_user_saved_tracks()
-
-            while results:
-                for item in results["items"]:
+            items = SpotifyApiService._iter_page_items(
+                lambda limit, offset: client.current_user_saved_tracks(limit=limit, offset=offset),
+                SAVED_TRACKS_PAGE_SIZE, first_page=SpotifyApiService._get_saved_tracks_first_page(client))
 
-                    if not SpotifyApiService._is_track_within_date_and_track_limit(liked_songs, item, track_limit,
-                                                                                date_limit):
-                        return liked_songs[:track_limit]
+            for item in items:
+                if not SpotifyApiService._is_track_within_date_and_track_limit(len(liked_songs), item, track_limit,
+                                                                            date_limit):
+                    return liked_songs[:track_limit]
 
-                    track = item.get('track')
-                    track_added_on = item.get('added_at', None)
-                    if not track or track.get('id') is None:
-                        continue  # Skip items that aren't valid tracks (e.g., episodes, missing tracks)
+                track = item.get('track')
+                track_added_on = item.get('added_at', None)
+                if not track or track.get('id') is None:
+                    continue  # Skip items that aren't valid tracks (e.g., episodes, missing tracks)
 
-                    track_data = SpotifyApiService._format_track_data(track, track_added_on)
-                    liked_songs.append(track_data)
+                track_data = SpotifyApiService._format_track_data(track, track_added_on)
+                liked_songs.append(track_data)
 
-                results = client.next(results) if results.get('next') else None
             return liked_songs[:track_limit]
         except Exception as e:
             logger.error("Error retrieving liked tracks: %s", e)
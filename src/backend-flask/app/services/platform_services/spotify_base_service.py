@@ -43,6 +43,7 @@ class BaseSpotifyService(ABC):
             'album': track['album']['name'] if track.get('album') else None,
             'album_art_url': track['album']['images'][0]['url']
                 if track.get('album') and track['album'].get('images') else None,
+            'duration': track['duration_ms'] // 1000 if track.get('duration_ms') else None,
             'download_url': None,  # Can be populated later
             'added_on': track_added_on,  # When the track was added to the playlist
         }
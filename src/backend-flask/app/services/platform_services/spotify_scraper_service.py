@@ -13,6 +13,7 @@ from app.repositories.playlist_repository import PlaylistRepository
 from app.services.platform_services.spotify_base_service import BaseSpotifyService
 from app.extensions import emit_error_message
 from app.repositories.track_repository import TrackRepository
+from app.utils.response_cache import ResponseCache
 
 
 logger = logging.getLogger(__name__)
@@ -27,6 +28,11 @@ class SpotifyScraperService(BaseSpotifyService):
         return SpotifyClient()
 
 
+    @staticmethod
+    def _get_playlist_info(url: str, client: SpotifyClient) -> Dict[str, Any]:
+        """Scrape a playlist's info, cached so a sync's playlist data and tracks come from one page fetch."""
+        return ResponseCache.get_or_fetch("spotify_scraper_playlist", url, lambda: client.get_playlist_info(url))
+
     @staticmethod
     def _get_playlist_cover_image(playlist_info: Dict[str, Any], playlist_url: str, client: SpotifyClient) -> Optional[str]:
         """
@@ -108,7 +114,7 @@ class SpotifyScraperService(BaseSpotifyService):
             
             try:
                 # Get playlist info
-                playlist_info = client.get_playlist_info(url)
+                playlist_info = SpotifyScraperService._get_playlist_info(url, client)
  
                 # Extract playlist ID from URL or URI
                 playlist_id = SpotifyScraperService._extract_playlist_id(url)
@@ -169,7 +175,7 @@ class SpotifyScraperService(BaseSpotifyService):
 
             client = SpotifyScraperService._get_scraper_client()
             try:
-                playlist_info = client.get_playlist_info(url)
+                playlist_info = SpotifyScraperService._get_playlist_info(url, client)
                 logger.debug(f"playlist_info: {json.dumps(playlist_info, indent=2)}")
                 if not playlist_info.get('tracks'):
                     logger.warning("No tracks found in for playlist %s", url)
@@ -283,6 +289,7 @@ class SpotifyScraperService(BaseSpotifyService):
             'artist': ", ".join([artist['name'] for artist in track_info.get('artists', [])]),
             'album': track_info.get('album', {}).get('name'),
             'album_art_url': album_art_url,
+            'duration': track_info['duration_ms'] // 1000 if track_info.get('duration_ms') else None,
             'download_url': None,
             'added_on': None,  # Scraper doesn't provide this info
         }
@@ -4,6 +4,8 @@ from typing import Optional
 
 from yt_dlp import YoutubeDL
 from app.utils.file_download_utils import FileDownloadUtils
+from app.utils.rate_limiter import AdaptiveRateLimiter
+from app.utils.response_cache import ResponseCache
 
 logger = logging.getLogger(__name__)
 
@@ -32,46 +34,41 @@ class YouTubeService:
         try:
             playlist_id = YouTubeService._extract_playlist_id(url)
             playlist_url = f"https://www.youtube.com/playlist?list={playlist_id}"
+            logger.info("Fetching YouTube playlist data for: %s", playlist_url)
+            info = YouTubeService._extract_playlist_info(playlist_url)
+            if not info:
+                raise Exception("Failed to fetch playlist information")
             
-
+            if info.get('_type') != 'playlist':
+                raise Exception("URL is not a valid playlist")
             
-            with YoutubeDL(YDL_OPTIONS) as ydl:
-                logger.info("Fetching YouTube playlist data for: %s", playlist_url)
-                info = ydl.extract_info(playlist_url, download=False)
-                
-                if not info:
-                    raise Exception("Failed to fetch playlist information")
-                
-                if info.get('_type') != 'playlist':
-                    raise Exception("URL is not a valid playlist")
-                
-                # Get entries count, filtering out unavailable/private videos
-                entries = info.get('entries', [])
-                available_entries = [e for e in entries if e is not None]
-                
-                # Handle empty playlists
-                if len(available_entries) == 0 and len(entries) == 0:
-                    raise Exception("Playlist is empty")
-                
-                # Get thumbnail - prefer playlist thumbnail, fallback to first video
-                image_url = info.get('thumbnails', [{}])[-1].get('url') if info.get('thumbnails') else None
-                if not image_url and available_entries:
-                    first_entry_thumbnails = available_entries[0].get('thumbnails', [])
-                    if first_entry_thumbnails:
-                        image_url = first_entry_thumbnails[-1].get('url')
-                
-                data = {
-                    'name': info.get('title', 'YouTube Playlist'),
-                    'external_id': playlist_id,
-                    'image_url': image_url,
-                    'track_count': len(available_entries),
-                    'url': playlist_url,
-                    'platform': 'youtube'
-                }
-                
-                logger.info("Successfully fetched playlist data: %s tracks", data['track_count'])
-                return data
-                
+            # Get entries count, filtering out unavailable/private videos
+            entries = info.get('entries', [])
+            available_entries = [e for e in entries if e is not None]
+            
+            # Handle empty playlists
+            if len(available_entries) == 0 and len(entries) == 0:
+                raise Exception("Playlist is empty")
+            
+            # Get thumbnail - prefer playlist thumbnail, fallback to first video
+            image_url = info.get('thumbnails', [{}])[-1].get('url') if info.get('thumbnails') else None
+            if not image_url and available_entries:
+                first_entry_thumbnails = available_entries[0].get('thumbnails', [])
+                if first_entry_thumbnails:
+                    image_url = first_entry_thumbnails[-1].get('url')
+            
+            data = {
+                'name': info.get('title', 'YouTube Playlist'),
+                'external_id': playlist_id,
+                'image_url': image_url,
+                'track_count': len(available_entries),
+                'url': playlist_url,
+                'platform': 'youtube'
+            }
+            
+            logger.info("Successfully fetched playlist data: %s tracks", data['track_count'])
+            return data
+
         except Exception as e:
             logger.error("Error fetching YouTube playlist data: %s", e, exc_info=True)
             raise e
@@ -87,43 +84,53 @@ class YouTubeService:
         """
         try:
             logger.info("Fetching tracks for YouTube playlist: %s", playlist_url)
+            info = YouTubeService._extract_playlist_info(playlist_url)
             
-            with YoutubeDL(YDL_OPTIONS) as ydl:
-                info = ydl.extract_info(playlist_url, download=False)
-                
-                if not info or info.get('_type') != 'playlist':
-                    raise Exception("Invalid playlist")
-                
-                entries = info.get('entries', [])
-                tracks_data = []
-                
-                for entry in entries:
-                    # Skip unavailable or private videos
-                    if entry is None:
-                        logger.debug("Skipping unavailable video in playlist")
-                        continue
-
-                    # Skip if essential data is missing
-                    if not entry.get('id'):
-                        logger.debug("Skipping entry without ID")
-                        continue
-
-                    # Skip deleted/delisted videos
-                    if entry.get('title') == '[Deleted video]' or entry.get('title') is None: 
-                        logger.debug("Skipping deleted or delisted video in playlist, id: %s", entry.get('id'))
-                        continue                    
-
-                    track_data = YouTubeService._format_track_data(entry)
-                    track_data["album"] = info.get("title")  # Use playlist title as album
-                    tracks_data.append(track_data)
-                
-                logger.info("Fetched %d tracks from YouTube playlist", len(tracks_data))
-                return tracks_data
-                
+            if not info or info.get('_type') != 'playlist':
+                raise Exception("Invalid playlist")
+            
+            entries = info.get('entries', [])
+            tracks_data = []
+            
+            for entry in entries:
+                # Skip unavailable or private videos
+                if entry is None:
+                    logger.debug("Skipping unavailable video in playlist")
+                    continue
+
+                # Skip if essential data is missing
+                if not entry.get('id'):
+                    logger.debug("Skipping entry without ID")
+                    continue
+
+                # Skip deleted/delisted videos
+                if entry.get('title') == '[Deleted video]' or entry.get('title') is None: 
+                    logger.debug("Skipping deleted or delisted video in playlist, id: %s", entry.get('id'))
+                    continue                    
+
+                track_data = YouTubeService._format_track_data(entry)
+                track_data["album"] = info.get("title")  # Use playlist title as album
+                tracks_data.append(track_data)
+            
+            logger.info("Fetched %d tracks from YouTube playlist", len(tracks_data))
+            return tracks_data
+
         except Exception as e:
             logger.error("Error fetching YouTube playlist tracks: %s", e, exc_info=True)
             raise e
 
+    @staticmethod
+    def _extract_playlist_info(playlist_url: str) -> Optional[dict]:
+        """
+        Extracts a playlist's info and flat entries with yt-dlp, cached so a sync's playlist data and tracks come
+        from one extraction.
+        """
+        def extract():
+            with YoutubeDL(YDL_OPTIONS) as ydl:
+                return AdaptiveRateLimiter.get('youtube').call(ydl.extract_info, playlist_url, download=False)
+
+        return ResponseCache.get_or_fetch("youtube_playlist", playlist_url, extract)
+
     @staticmethod
     def _format_track_data(entry: dict) -> dict:
         """
@@ -157,6 +164,7 @@ class YouTubeService:
             'artist': artist,
             'album': None, 
             'album_art_url': album_art_url,
+            'duration': int(entry['duration']) if entry.get('duration') else None,
             'download_url': entry.get('webpage_url') or f"https://www.youtube.com/watch?v={entry.get('id')}",
             'added_on': None,
         }
@@ -11,6 +11,7 @@ from app.services.platform_services.platform_services_factory import PlatformSer
 from app.services.platform_services.soundcloud_service import SoundcloudService
 from app.services.track_manager_service import TrackManagerService
 from app.utils.db_utils import commit_with_retries
+from app.utils.response_cache import ResponseCache
 
 logger = logging.getLogger(__name__)
 
@@ -29,24 +30,26 @@ class PlaylistManagerService:
         :return: List of playlists that were processed.
         """
         for playlist in playlists:
-            try:
-                data = PlatformServiceFactory.get_service(playlist.platform).get_playlist_data(playlist.url)
-                playlist.name = data['name']
-                playlist.last_synced = datetime.utcnow()
-                playlist.image_url = data['image_url']
-                playlist.track_count = data['track_count']                
-                logger.info("Pulled latest playlist info (ID: %s, external_id: %s)", playlist.id, playlist.external_id)
+            # The playlist's data and tracks usually come from the same upstream response, fetched once
+            with ResponseCache.scope():
+                try:
+                    data = PlatformServiceFactory.get_service(playlist.platform).get_playlist_data(playlist.url)
+                    playlist.name = data['name']
+                    playlist.last_synced = datetime.utcnow()
+                    playlist.image_url = data['image_url']
+                    playlist.track_count = data['track_count']                
+                    logger.info("Pulled latest playlist info (ID: %s, external_id: %s)", playlist.id, playlist.external_id)
                             
-                TrackManagerService.fetch_playlist_tracks(playlist.id) # todo: investigate if this make duplicate calls with get_playlist_data
+                    TrackManagerService.fetch_playlist_tracks(playlist.id)
                 
-                # Get updated tracks after fetching
-                tracks = PlaylistRepository.get_playlist_tracks(playlist.id)
+                    # Get updated tracks after fetching
+                    tracks = PlaylistRepository.get_playlist_tracks(playlist.id)
                 
-                # Emit WebSocket event to update the frontend with track count and tracks
-                emit_playlist_sync_update(playlist.id, data['track_count'], tracks)
+                    # Emit WebSocket event to update the frontend with track count and tracks
+                    emit_playlist_sync_update(playlist.id, data['track_count'], tracks)
 
-            except Exception as e:
-                logger.error("Failed to sync playlist ID %s: %s", playlist.id, e, exc_info=True)
+                except Exception as e:
+                    logger.error("Failed to sync playlist ID %s: %s", playlist.id, e, exc_info=True)
 
         try:
             commit_with_retries(db.session)
@@ -67,6 +70,11 @@ class PlaylistManagerService:
         if not playlist_url:
             logger.info("No url_or_id found: %s", playlist_url)
             return "No URL or ID Detected"
+        with ResponseCache.scope():
+            return PlaylistManagerService._add_playlist(playlist_url, date_limit, track_limit)
+
+    @staticmethod
+    def _add_playlist(playlist_url: str, date_limit=None, track_limit=None) -> Optional[str]:
         try:
             musicPlatformService = PlatformServiceFactory.get_service_by_url(playlist_url)
             playlist_data = musicPlatformService.get_playlist_data(playlist_url)
@@ -55,11 +55,15 @@ class TrackManagerService:
                         artist=track_data['artist'],
                         album=track_data['album'],
                         album_art_url=track_data['album_art_url'],
+                        duration=track_data.get('duration'),
                         download_url=track_data.get('download_url')
                     )
                     db.session.add(track)
                     # Flush to generate the track.id without committing yet
                     db.session.flush()
+                elif track.duration is None and track_data.get('duration'):
+                    # Tracks synced before durations were stored
+                    track.duration = track_data['duration']
 
                 # Now add the association in the PlaylistTrack join table
                 # The join table records which tracks are part of the playlist and their order.
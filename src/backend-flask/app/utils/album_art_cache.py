@@ -0,0 +1,119 @@
+import hashlib
+import logging
+import os
+import threading
+from typing import Callable, Dict, Optional
+
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+
+class AlbumArtCache:
+    """
+    On disk cache of processed (cropped, JPEG encoded) cover art, keyed by the art's URL.
+
+    Tracks from the same album, or the same SoundCloud user, share cover art, so each image only needs downloading
+    and processing once. The cache is bounded by Config.ALBUM_ART_CACHE_MAX_BYTES, evicting the least recently used
+    images (by file modification time, which is bumped on every hit). Concurrent requests for the same URL, e.g. from
+    the transcode pool's workers, wait for a single fetch.
+    """
+    _lock = threading.Lock()
+    _url_locks: Dict[str, threading.Lock] = {}
+    _folder: Optional[str] = None
+    _total_bytes = 0
+
+    @classmethod
+    def get_or_fetch(cls, url: str, fetch: Callable[[str], Optional[bytes]]) -> Optional[bytes]:
+        """
+        The cached image for a URL, fetching and caching it on a miss. Failed fetches (None) aren't cached.
+
+        :param fetch: Downloads and processes the image at a URL, returning JPEG bytes or None
+        """
+        with cls._lock:
+            url_lock = cls._url_locks.setdefault(url, threading.Lock())
+
+        with url_lock:
+            data = cls.get(url)
+            if data is None:
+                data = fetch(url)
+                if data is not None:
+                    cls.put(url, data)
+
+        with cls._lock:
+            cls._url_locks.pop(url, None)
+        return data
+
+    @classmethod
+    def get(cls, url: str) -> Optional[bytes]:
+        path = cls._get_path(url)
+        try:
+            with open(path, 'rb') as f:
+                data = f.read()
+            os.utime(path)  # Mark as recently used
+            logger.debug("Album art cache hit for %s", url)
+            return data
+        except OSError:
+            return None
+
+    @classmethod
+    def put(cls, url: str, data: bytes) -> None:
+        folder = cls._get_folder()
+        path = cls._get_path(url)
+        temp_path = f"{path}.{threading.get_ident()}.tmp"
+        try:
+            with open(temp_path, 'wb') as f:
+                f.write(data)
+            replaced_size = os.path.getsize(path) if os.path.exists(path) else 0
+            os.replace(temp_path, path)
+        except OSError as e:
+            logger.warning("Failed to cache album art for %s: %s", url, e)
+            return
+
+        with cls._lock:
+            cls._total_bytes += len(data) - replaced_size
+            if cls._total_bytes > Config.ALBUM_ART_CACHE_MAX_BYTES:
+                cls._evict(folder, keep=path)
+
+    @classmethod
+    def clear(cls) -> None:
+        folder = cls._get_folder()
+        with cls._lock:
+            for entry in cls._scan(folder):
+                os.remove(entry.path)
+            cls._total_bytes = 0
+
+    @classmethod
+    def _evict(cls, folder: str, keep: str) -> None:
+        """Remove the least recently used images until the cache is within its size limit. Called holding _lock."""
+        entries = sorted((entry for entry in cls._scan(folder) if entry.path != keep),
+                         key=lambda entry: entry.stat().st_mtime)
+        for entry in entries:
+            if cls._total_bytes <= Config.ALBUM_ART_CACHE_MAX_BYTES:
+                break
+            try:
+                size = entry.stat().st_size
+                os.remove(entry.path)
+                cls._total_bytes -= size
+            except OSError:
+                continue
+        logger.debug("Album art cache trimmed to %s bytes", cls._total_bytes)
+
+    @classmethod
+    def _get_path(cls, url: str) -> str:
+        return os.path.join(cls._get_folder(), hashlib.sha1(url.encode('UTF-8')).hexdigest() + '.jpg')
+
+    @classmethod
+    def _get_folder(cls) -> str:
+        folder = Config.ALBUM_ART_CACHE_FOLDER
+        with cls._lock:
+            if cls._folder != folder:
+                # First use (or the folder changed), the size of what's already cached is needed for eviction
+                os.makedirs(folder, exist_ok=True)
+                cls._folder = folder
+                cls._total_bytes = sum(entry.stat().st_size for entry in cls._scan(folder))
+        return folder
+
+    @staticmethod
+    def _scan(folder: str):
+        return [entry for entry in os.scandir(folder) if entry.is_file() and entry.name.endswith('.jpg')]
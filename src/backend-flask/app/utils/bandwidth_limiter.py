@@ -0,0 +1,186 @@
+import logging
+import threading
+import time
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional
+
+from app.utils.time_windows import in_window, validate_window
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+BURST_SECONDS = 1.0  # Unused budget that can build up, as seconds at the limit
+SCHEDULE_REFRESH_INTERVAL = 30  # Seconds between checks for a schedule window starting or ending
+
+
+class TokenBucket:
+    """Thread safe token bucket of bytes. Downloads take bytes as they read them, going into debt when over budget."""
+
+    def __init__(self, rate: Optional[float] = None):
+        self.rate: Optional[float] = None
+        self._tokens = 0.0
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+        self.set_rate(rate)
+
+    def set_rate(self, rate: Optional[float]) -> None:
+        with self._lock:
+            self._refill()
+            was_limited = bool(self.rate)
+            self.rate = rate
+            if not rate:
+                self._tokens = 0.0
+            elif not was_limited:
+                self._tokens = rate * BURST_SECONDS  # Starts with a full burst
+            else:
+                self._tokens = min(self._tokens, rate * BURST_SECONDS)
+
+    def consume(self, amount: float) -> float:
+        """Take bytes from the bucket, returning the seconds to wait to pay back any debt (0 if unlimited)."""
+        with self._lock:
+            if not self.rate:
+                return 0.0
+            self._refill()
+            self._tokens -= amount
+            return max(0.0, -self._tokens / self.rate)
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        if self.rate:
+            self._tokens = min(self.rate * BURST_SECONDS, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+
+class BandwidthLimiter:
+    """
+    Shared bandwidth budget for downloads: a global limit and per platform limits, in bytes per second, which
+    time-of-day schedule windows can replace (Config.BANDWIDTH_LIMITS).
+
+    Every download's yt-dlp progress hook draws the bytes it has read from the global and its platform's token
+    buckets, sleeping when over budget, so downloads running at the same time share the budget between them and a
+    change applies to downloads in progress. yt-dlp's own ratelimit is also set to the limit when a download starts,
+    which smooths its reads out.
+    """
+    _global_bucket = TokenBucket()
+    _platform_buckets: Dict[str, TokenBucket] = {}
+    _lock = threading.Lock()
+    _refreshed_at: Optional[float] = None
+
+    @classmethod
+    def get_limits(cls, now: Optional[datetime] = None) -> Dict[str, Any]:
+        """The limits in force at the time: the configured ones, or those of the schedule window it falls in."""
+        limits = Config.BANDWIDTH_LIMITS or {}
+        now = now or datetime.now()
+        for index, window in enumerate(limits.get('schedule') or []):
+            if in_window(window, now):
+                return {'global': window.get('global'), 'platforms': dict(window.get('platforms') or {}),
+                        'schedule': index}
+        return {'global': limits.get('global'), 'platforms': dict(limits.get('platforms') or {}), 'schedule': None}
+
+    @classmethod
+    def refresh(cls, now: Optional[datetime] = None, force: bool = False) -> None:
+        """Apply the limits in force now to the buckets. Checked every SCHEDULE_REFRESH_INTERVAL unless forced."""
+        monotonic_now = time.monotonic()
+        with cls._lock:
+            if not force and cls._refreshed_at is not None \
+                    and monotonic_now - cls._refreshed_at < SCHEDULE_REFRESH_INTERVAL:
+                return
+            cls._refreshed_at = monotonic_now
+            limits = cls.get_limits(now)
+            cls._global_bucket.set_rate(limits['global'])
+            for platform in set(cls._platform_buckets) | set(limits['platforms']):
+                cls._get_bucket(platform).set_rate(limits['platforms'].get(platform))
+
+    @classmethod
+    def _get_bucket(cls, platform: str) -> TokenBucket:
+        bucket = cls._platform_buckets.get(platform)
+        if bucket is None:
+            bucket = cls._platform_buckets[platform] = TokenBucket()
+        return bucket
+
+    @classmethod
+    def throttle(cls, platform: str, amount: int) -> None:
+        """Account for bytes downloaded from a platform, sleeping as long as needed to stay within budget."""
+        cls.refresh()
+        with cls._lock:
+            platform_bucket = cls._get_bucket(platform)
+        wait = max(cls._global_bucket.consume(amount), platform_bucket.consume(amount))
+        if wait > 0:
+            time.sleep(wait)
+
+    @classmethod
+    def get_ratelimit(cls, platform: str) -> Optional[int]:
+        """The yt-dlp ratelimit for a download from the platform starting now, None if unlimited."""
+        limits = cls.get_limits()
+        rates = [rate for rate in (limits['global'], limits['platforms'].get(platform)) if rate]
+        return int(min(rates)) if rates else None
+
+    @classmethod
+    def progress_hook(cls, platform: str) -> Callable[[dict], None]:
+        """A yt-dlp progress hook that draws each download's bytes from the platform's budget."""
+        downloaded: Dict[str, int] = {}
+
+        def hook(progress: dict) -> None:
+            key = progress.get('tmpfilename') or progress.get('filename') or ''
+            total = progress.get('downloaded_bytes') or 0
+            if progress.get('status') != 'downloading':
+                downloaded.pop(key, None)
+                return
+            previous = downloaded.get(key, total)  # The first report includes bytes resumed from a .part file
+            downloaded[key] = total
+            if total > previous:
+                cls.throttle(platform, total - previous)
+
+        return hook
+
+    @classmethod
+    def set_limits(cls, limits: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Validate and save new limits, applying them straight away.
+
+        :raises ValueError: If the limits are invalid
+        """
+        limits = cls.validate(limits)
+        Config.save_settings({'BANDWIDTH_LIMITS': limits})
+        cls.refresh(force=True)
+        logger.info("Bandwidth limits set to %s", limits)
+        return limits
+
+    @staticmethod
+    def validate(limits: Any) -> Dict[str, Any]:
+        if not isinstance(limits, dict):
+            raise ValueError("Bandwidth limits must be an object")
+
+        def validate_rates(entry: Dict[str, Any], where: str) -> Dict[str, Any]:
+            rate = entry.get('global')
+            if rate is not None and (not isinstance(rate, (int, float)) or isinstance(rate, bool) or rate <= 0):
+                raise ValueError(f"{where} global limit must be a positive number of bytes per second or null")
+            platforms = entry.get('platforms') or {}
+            if not isinstance(platforms, dict):
+                raise ValueError(f"{where} platforms must be an object")
+            for platform, platform_rate in platforms.items():
+                if platform_rate is not None and (not isinstance(platform_rate, (int, float))
+                                                  or isinstance(platform_rate, bool) or platform_rate <= 0):
+                    raise ValueError(f"{where} limit for {platform} must be a positive number of bytes per second "
+                                     f"or null")
+            return {'global': rate, 'platforms': dict(platforms)}
+
+        validated = validate_rates(limits, "The")
+        schedule: List[Dict[str, Any]] = []
+        for index, window in enumerate(limits.get('schedule') or []):
+            where = f"Schedule entry {index + 1}"
+            schedule.append({**validate_window(window, where), **validate_rates(window, where)})
+        validated['schedule'] = schedule
+        return validated
+
+    @classmethod
+    def to_dict(cls) -> Dict[str, Any]:
+        return {'limits': Config.BANDWIDTH_LIMITS, 'effective': cls.get_limits()}
+
+    @classmethod
+    def reset(cls) -> None:
+        """Forget the buckets, they're recreated from the config on next use."""
+        with cls._lock:
+            cls._global_bucket = TokenBucket()
+            cls._platform_buckets = {}
+            cls._refreshed_at = None
@@ -0,0 +1,73 @@
+import errno
+import logging
+import os
+import shutil
+from typing import Optional
+
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+DISK_FULL_MESSAGES = ("no space left on device", "disk full", "not enough space on the disk")
+
+
+class InsufficientDiskSpaceError(Exception):
+    """Raised instead of starting a download that wouldn't fit, or when the disk fills up during one."""
+
+
+class DiskSpaceGuard:
+    """
+    Admission control for downloads: before a track is downloaded its size is estimated from its duration and the
+    bitrates involved, and it's refused if that would leave less than Config.MIN_FREE_DISK_SPACE free. A full disk
+    then stops a sync straight away, instead of every remaining track failing with write errors.
+    """
+
+    @staticmethod
+    def estimate_track_bytes(track) -> int:
+        """
+        The most disk space a track's download takes. In MP3 mode the raw download and the MP3 briefly exist
+        together while transcoding. Tracks without a known duration are assumed to be Config.DEFAULT_TRACK_DURATION.
+        """
+        duration = getattr(track, 'duration', None) or Config.DEFAULT_TRACK_DURATION
+        bitrate_kbps = Config.DISK_SPACE_SOURCE_BITRATE_KBPS
+        if Config.AUDIO_FORMAT == 'mp3':
+            bitrate_kbps += Config.DISK_SPACE_MP3_BITRATE_KBPS
+        return int(duration * bitrate_kbps * 1000 / 8)
+
+    @staticmethod
+    def get_free_bytes(path: Optional[str] = None) -> int:
+        path = path or Config.DOWNLOAD_FOLDER
+        # The download folder may not exist yet, check the disk it would be on
+        while not os.path.exists(path) and os.path.dirname(path) != path:
+            path = os.path.dirname(path)
+        return shutil.disk_usage(path).free
+
+    @staticmethod
+    def has_space_to_resume() -> bool:
+        """Whether enough space has been freed to resume downloading, with a margin so it doesn't flap."""
+        return DiskSpaceGuard.get_free_bytes() >= Config.MIN_FREE_DISK_SPACE + Config.DISK_SPACE_RESUME_MARGIN
+
+    @staticmethod
+    def admit(track) -> None:
+        """
+        :raises InsufficientDiskSpaceError: If downloading the track would leave too little free space
+        """
+        free_bytes = DiskSpaceGuard.get_free_bytes()
+        needed_bytes = DiskSpaceGuard.estimate_track_bytes(track)
+        if free_bytes - needed_bytes < Config.MIN_FREE_DISK_SPACE:
+            raise InsufficientDiskSpaceError(
+                f"Not enough disk space to download '{track.name}': {free_bytes // 2 ** 20} MiB free, about "
+                f"{needed_bytes // 2 ** 20} MiB needed and {Config.MIN_FREE_DISK_SPACE // 2 ** 20} MiB kept free")
+
+    @staticmethod
+    def is_disk_full_error(error: BaseException) -> bool:
+        """Whether an error (e.g. an OSError, or yt-dlp or ffmpeg's message for one) was caused by a full disk."""
+        seen = set()
+        while error is not None and id(error) not in seen:
+            seen.add(id(error))
+            if isinstance(error, OSError) and error.errno == errno.ENOSPC:
+                return True
+            if any(message in str(error).lower() for message in DISK_FULL_MESSAGES):
+                return True
+            error = error.__cause__ or error.__context__
+        return False
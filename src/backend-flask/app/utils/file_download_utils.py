@@ -1,3 +1,4 @@
+import base64
 import io
 import logging
 import os
@@ -5,17 +6,37 @@ import re
 from PIL import Image as PILImage
 
 import requests
-from mutagen.id3 import APIC, ID3, TALB, TIT2, TPE1
-from mutagen.mp3 import MP3
+from mutagen import File as MutagenFile
+from mutagen.flac import Picture
+from mutagen.id3 import APIC, ID3, ID3NoHeaderError, TALB, TIT2, TPE1, TXXX, WOAS
+from mutagen.mp4 import MP4, MP4Cover
+from mutagen.oggopus import OggOpus
 
+from app.utils.album_art_cache import AlbumArtCache
+from app.utils.library_index import LibraryIndex
 from config import Config
 
 logger = logging.getLogger(__name__)
 
+COVER_URL_DESC = 'PYSYNC_COVER_URL'  # TXXX frame recording the URL the embedded cover art came from
+PLATFORM_ID_DESC = 'PYSYNC_PLATFORM_ID'  # TXXX frame recording the track's "platform:platform_id"
+ID3_PADDING = 32 * 1024  # Reserved when a tag is (re)written, so later tag updates fit in place
+ID3_MAX_PADDING = 1024 * 1024  # More free space than this is given back when a tag has to be rewritten anyway
+
+
 class FileDownloadUtils:
     @staticmethod
-    def is_track_already_downloaded(download_location) -> bool:
-        """Check if the track is already downloaded and update the database accordingly."""
+    def is_track_already_downloaded(download_location, library_index=None) -> bool:
+        """
+        Check if the track is already downloaded.
+
+        :param library_index: A LibraryIndex of the download folder to check against instead of stat-ing the file.
+            Defaults to the library watcher's live index when it is running.
+        """
+        if library_index is None:
+            library_index = LibraryIndex.get_live_index()
+        if library_index is not None:
+            return library_index.contains(download_location)
 
         absolute_path = FileDownloadUtils.get_absolute_path(download_location)
         if download_location and os.path.isfile(absolute_path):
@@ -25,48 +46,171 @@ class FileDownloadUtils:
     @staticmethod
     def embed_track_metadata(file_path, track):
         """
-        Adds metadata from the track data to the MP3 audio file, including cover art if available.
+        Adds metadata from the track data to the audio file, including cover art if available.
+        Supports MP3 (ID3), M4A/MP4 and Ogg Opus files, other formats are left untagged.
 
         :param track: Track data object with name, artist, album, etc.
-        :param file_path: Path to the MP3 audio file.
+        :param file_path: Path to the audio file.
         """
         logger.info(f"Embedding metadata for track '{track.name}' at '{file_path}'")
 
-        audio = MP3(file_path, ID3=ID3)
+        extension = os.path.splitext(file_path)[1].lower()
+        if extension == '.mp3':
+            FileDownloadUtils._embed_id3_metadata(file_path, track)
+        elif extension in ('.m4a', '.mp4', '.aac'):
+            FileDownloadUtils._embed_mp4_metadata(file_path, track)
+        elif extension in ('.opus', '.ogg'):
+            FileDownloadUtils._embed_opus_metadata(file_path, track)
+        else:
+            logger.warning("Can't embed metadata in '%s', unsupported format '%s'", file_path, extension)
 
-        track_name = track.name
-        track_artist = track.artist
-        # track_artists = ", ".join([artist["name"] for artist in track_data["artists"]])
-        # track_popularity = track_data["popularity"]
-        track_album = track.album
-        track_cover_imgs = track.album_art_url
+    @staticmethod
+    def _embed_id3_metadata(file_path, track):
+        """
+        Builds every frame and writes the tag in a single save. Only the tag is read, not the audio, and padding is
+        reserved so that later updates (e.g. re-tagging the library) are written in place without rewriting the file.
+        """
+        try:
+            audio = ID3(file_path)
+        except ID3NoHeaderError:
+            audio = ID3()
+
+        FileDownloadUtils.set_id3_frames(audio, track)
+        audio.save(file_path, padding=FileDownloadUtils._get_id3_padding)
 
-        # Basic metadata
-        audio['TIT2'] = TIT2(encoding=3, text=track_name)
-        audio['TPE1'] = TPE1(encoding=3, text=track_artist)
-        if track_album:  # soundcloud doesn't have album info
-            audio['TALB'] = TALB(encoding=3, text=track_album)
+    @staticmethod
+    def set_id3_frames(audio, track) -> None:
+        """Set the ID3 frames for the track's metadata: title, artist, album, cover art, source URL and platform id."""
+        audio.setall('TIT2', [TIT2(encoding=3, text=track.name)])
+        audio.setall('TPE1', [TPE1(encoding=3, text=track.artist)])
+        if track.album:  # soundcloud doesn't have album info
+            audio.setall('TALB', [TALB(encoding=3, text=track.album)])
 
         # audio['COMM'] = COMM(encoding=3, lang='eng', desc=f'Popularity = {track_popularity}',
         #                     text=f"{track_popularity}")  # todo: Needs fixing
 
-        audio.save()
-
-        audio = ID3(file_path)
+        if track.download_url:
+            audio.setall('WOAS', [WOAS(url=track.download_url)])
+        if track.platform_id:
+            audio.setall(f'TXXX:{PLATFORM_ID_DESC}', [
+                TXXX(encoding=3, desc=PLATFORM_ID_DESC, text=f"{track.platform}:{track.platform_id}")])
 
         # Adding cover art
-        if track_cover_imgs:
-            FileDownloadUtils._set_track_cover(audio, track_cover_imgs)
+        if track.album_art_url:
+            FileDownloadUtils._set_track_cover(audio, track.album_art_url)
+
+    @staticmethod
+    def get_tag_differences(file_path, track) -> list:
+        """
+        The tags of an audio file that differ from the track's metadata, reading only the file's tags.
+        For MP3s these are ID3 frame ids (as set by set_id3_frames), for other formats easy tag names.
+        """
+        if os.path.splitext(file_path)[1].lower() == '.mp3':
+            try:
+                audio = ID3(file_path)
+            except ID3NoHeaderError:
+                audio = ID3()
+            return FileDownloadUtils.get_id3_differences(audio, track)
+
+        audio = MutagenFile(file_path, easy=True)
+        if audio is None:
+            return []
+        desired = {'title': track.name, 'artist': track.artist, 'album': track.album}
+        return [key for key, value in desired.items()
+                if value and [str(text) for text in (audio.tags or {}).get(key, [])] != [value]]
+
+    @staticmethod
+    def get_id3_differences(audio, track) -> list:
+        """The ID3 frames set_id3_frames would change."""
+        desired_text = {'TIT2': track.name, 'TPE1': track.artist, 'TALB': track.album}
+        if track.platform_id:
+            desired_text[f'TXXX:{PLATFORM_ID_DESC}'] = f"{track.platform}:{track.platform_id}"
+
+        differences = [frame_id for frame_id, value in desired_text.items()
+                       if value and (frame_id not in audio or [str(text) for text in audio[frame_id].text] != [value])]
+        if track.download_url and ('WOAS' not in audio or audio['WOAS'].url != track.download_url):
+            differences.append('WOAS')
+        if track.album_art_url and not FileDownloadUtils._has_cover_from(audio, track.album_art_url):
+            differences.append('APIC')
+        return differences
+
+    @staticmethod
+    def _get_id3_padding(info) -> int:
+        """Keep the existing free space when the tag fits in it, otherwise reserve ID3_PADDING for later updates."""
+        if 0 <= info.padding <= ID3_MAX_PADDING:
+            return info.padding
+        return ID3_PADDING
+
+    @staticmethod
+    def _embed_mp4_metadata(file_path, track):
+        audio = MP4(file_path)
+        audio['\xa9nam'] = [track.name]
+        audio['\xa9ART'] = [track.artist]
+        if track.album:
+            audio['\xa9alb'] = [track.album]
+
+        img_data = FileDownloadUtils._get_cover_image(track.album_art_url) if track.album_art_url else None
+        if img_data:
+            audio['covr'] = [MP4Cover(img_data, imageformat=MP4Cover.FORMAT_JPEG)]
+        audio.save()
+
+    @staticmethod
+    def _embed_opus_metadata(file_path, track):
+        audio = OggOpus(file_path)
+        audio['title'] = [track.name]
+        audio['artist'] = [track.artist]
+        if track.album:
+            audio['album'] = [track.album]
 
+        img_data = FileDownloadUtils._get_cover_image(track.album_art_url) if track.album_art_url else None
+        if img_data:
+            # Ogg has no picture frame, the FLAC picture block is embedded base64 encoded instead
+            picture = Picture()
+            picture.type = 3  # Cover image
+            picture.mime = 'image/jpeg'
+            picture.desc = 'Cover'
+            picture.data = img_data
+            audio['metadata_block_picture'] = [base64.b64encode(picture.write()).decode('ascii')]
         audio.save()
 
     @staticmethod
     def _set_track_cover(audio, track_cover_imgs: str) -> None:
+        if FileDownloadUtils._has_cover_from(audio, track_cover_imgs):
+            logger.debug("Cover art from %s already embedded, skipping", track_cover_imgs)
+            return
+
+        img_data = FileDownloadUtils._get_cover_image(track_cover_imgs)
+        if not img_data:
+            return
+
+        audio.setall('APIC', [APIC(
+            encoding=3,
+            mime='image/jpeg',
+            type=3,  # Cover image
+            desc='Cover',
+            data=img_data
+        )])
+        audio.setall(f'TXXX:{COVER_URL_DESC}', [TXXX(encoding=3, desc=COVER_URL_DESC, text=track_cover_imgs)])
+
+    @staticmethod
+    def _has_cover_from(audio, track_cover_imgs: str) -> bool:
+        """Whether the ID3 tag's cover art was embedded from the given URL, so doesn't need fetching again."""
+        cover_urls = [str(text) for frame in audio.getall(f'TXXX:{COVER_URL_DESC}') for text in frame.text]
+        return track_cover_imgs in cover_urls and bool(audio.getall('APIC'))
+
+    @staticmethod
+    def _get_cover_image(track_cover_imgs: str):
+        """The cover art cropped to a square JPEG, from the album art cache if already fetched. None on failure."""
+        return AlbumArtCache.get_or_fetch(track_cover_imgs, FileDownloadUtils._fetch_cover_image)
+
+    @staticmethod
+    def _fetch_cover_image(track_cover_imgs: str):
+        """Download the cover art and crop it to a square JPEG. Returns the JPEG bytes, or None on failure."""
         response = requests.get(track_cover_imgs)
         logger.debug(f"Track image: %s, response: %s", track_cover_imgs, response.status_code)
 
         if response.status_code != 200:
-                return
+                return None
 
         try:
             img = PILImage.open(io.BytesIO(response.content))
@@ -86,19 +230,11 @@ class FileDownloadUtils:
             # --- Convert to JPEG ---
             with io.BytesIO() as output:
                 img.convert('RGB').save(output, format='JPEG', quality=95)
-                img_data = output.getvalue()
+                return output.getvalue()
 
         except Exception as e:
             logger.error(f"Failed to process track image: {e}")
-            return
-
-        audio['APIC'] = APIC(
-            encoding=3,
-            mime='image/jpeg',
-            type=3,  # Cover image
-            desc='Cover',
-            data=img_data
-        )
+            return None
 
     @staticmethod
     def sanitize_filename(s: str, max_length: int = 255) -> str:
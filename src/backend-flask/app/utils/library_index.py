@@ -0,0 +1,135 @@
+import logging
+import os
+import threading
+from collections import defaultdict
+from typing import Dict, Iterable, List, Optional, Set
+
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+AUDIO_EXTENSIONS = {'.mp3', '.m4a', '.aac', '.opus', '.ogg', '.flac', '.wav', '.aiff'}
+
+
+class LibraryIndex:
+    """
+    An in-memory index of the audio files in the download folder, built with a single os.scandir walk.
+
+    Paths are stored relative to the download folder (the same form as Track.download_location), so checking
+    whether thousands of tracks are on disk is a set lookup rather than a stat per track. This matters on
+    slow network mounts. Files are also indexed by basename and by lower-cased filename stem, so moved files and
+    orphans can be matched back to their tracks.
+
+    When the library watcher is running it registers a live index, kept up to date as files change, which
+    download checks then use instead of stat-ing files. The index is changed on the watcher's thread while download
+    threads read it, so it is guarded by a lock and readers get copies (get_paths) rather than the live sets.
+    """
+    _live_index: Optional['LibraryIndex'] = None
+
+    def __init__(self, root: str, paths: Iterable[str] = ()) -> None:
+        self.root = os.path.abspath(root)
+        self._lock = threading.Lock()
+        self.paths: Set[str] = set()
+        self._by_basename: Dict[str, List[str]] = defaultdict(list)
+        self._by_stem: Dict[str, List[str]] = defaultdict(list)
+        for path in paths:
+            self.add(path)
+
+    @classmethod
+    def build(cls, root: Optional[str] = None) -> 'LibraryIndex':
+        """Scan the folder (the download folder by default) recursively and index every audio file in it."""
+        index = cls(root or Config.DOWNLOAD_FOLDER)
+        if not os.path.isdir(index.root):
+            logger.warning("Library folder %s does not exist, index is empty", index.root)
+            return index
+
+        pending = [index.root]
+        while pending:
+            folder = pending.pop()
+            try:
+                with os.scandir(folder) as entries:
+                    for entry in entries:
+                        if entry.is_dir(follow_symlinks=False):
+                            pending.append(entry.path)
+                        elif os.path.splitext(entry.name)[1].lower() in AUDIO_EXTENSIONS:
+                            index.add(os.path.relpath(entry.path, index.root))
+            except OSError as e:
+                logger.warning("Could not scan folder %s: %s", folder, e)
+
+        logger.info("Indexed %d files in %s", len(index), index.root)
+        return index
+
+    @classmethod
+    def get_live_index(cls) -> Optional['LibraryIndex']:
+        """The index kept up to date by the library watcher, or None if the watcher isn't running."""
+        return cls._live_index
+
+    @classmethod
+    def set_live_index(cls, index: Optional['LibraryIndex']) -> None:
+        cls._live_index = index
+
+    def add(self, path: str) -> None:
+        relative_path = self.relative_path(path)
+        if not relative_path:
+            return
+        basename = os.path.basename(relative_path)
+        with self._lock:
+            if relative_path in self.paths:
+                return
+            self.paths.add(relative_path)
+            self._by_basename[basename.lower()].append(relative_path)
+            self._by_stem[os.path.splitext(basename)[0].lower()].append(relative_path)
+
+    def remove(self, path: str) -> None:
+        relative_path = self.relative_path(path)
+        basename = os.path.basename(relative_path or '')
+        with self._lock:
+            if relative_path not in self.paths:
+                return
+            self.paths.discard(relative_path)
+            self._by_basename[basename.lower()].remove(relative_path)
+            self._by_stem[os.path.splitext(basename)[0].lower()].remove(relative_path)
+
+    def get_paths(self) -> Set[str]:
+        """A copy of the indexed paths, safe to iterate while the index changes."""
+        with self._lock:
+            return set(self.paths)
+
+    def contains(self, download_location: Optional[str]) -> bool:
+        """
+        Whether a track's download location is in the index.
+        Locations outside the indexed folder can't be answered from the index and fall back to a stat.
+        """
+        if not download_location:
+            return False
+        relative_path = self.relative_path(download_location)
+        if relative_path is None:
+            return os.path.isfile(download_location)
+        with self._lock:
+            return relative_path in self.paths
+
+    def find_by_basename(self, filename: str) -> List[str]:
+        with self._lock:
+            return list(self._by_basename.get(filename.lower(), []))
+
+    def find_by_stem(self, stem: str) -> List[str]:
+        with self._lock:
+            return list(self._by_stem.get(stem.lower(), []))
+
+    def relative_path(self, path: str) -> Optional[str]:
+        """Normalise a path to be relative to the index root, or None if it lies outside it."""
+        if not path:
+            return None
+        if not os.path.isabs(path):
+            return os.path.normpath(path)
+        try:
+            relative_path = os.path.relpath(os.path.abspath(path), self.root)
+        except ValueError:  # Different drive on Windows
+            return None
+        if relative_path == os.pardir or relative_path.startswith(os.pardir + os.sep):
+            return None
+        return os.path.normpath(relative_path)
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self.paths)
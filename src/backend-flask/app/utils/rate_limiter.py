@@ -0,0 +1,200 @@
+import json
+import logging
+import os
+import re
+import tempfile
+import threading
+import time
+from typing import Any, Callable, Dict, Optional
+
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+ADDITIVE_INCREASE = 0.1  # Requests per second added after each successful request
+MULTIPLICATIVE_DECREASE = 0.5  # Rate multiplier when throttled
+LATENCY_DECREASE = 0.9  # Gentler multiplier when responses slow down, a sign of throttling to come
+LATENCY_FACTOR = 3  # A response this many times slower than average counts as slow
+LATENCY_SMOOTHING = 0.2  # Weight of the latest response in the average latency
+MIN_LATENCY_SAMPLES = 5
+SAVE_INTERVAL = 30  # Seconds between saving learnt rates, unless throttled
+
+THROTTLE_PATTERN = re.compile(r"\b429\b|too many requests|rate.?limit|not a bot|captcha|sign in to confirm",
+                              re.IGNORECASE)
+
+
+class RateLimitedError(Exception):
+    """Raised when a platform is still throttling requests after retrying."""
+
+
+class AdaptiveRateLimiter:
+    """
+    Paces the requests made to a platform, shared by the sync (platform services) and download code.
+
+    The rate adapts with AIMD: every successful request raises it by a small fixed amount, up to the platform's
+    max_rate, and a throttled request (HTTP 429 or a bot check) halves it, down to its min_rate, and pauses requests
+    (for the platform's Retry-After if given). Responses much slower than average also lower the rate slightly, as
+    they tend to come before throttling. So throughput climbs to what each platform tolerates and backs off as soon
+    as it objects.
+
+    Limiters are per platform, configured in Config.RATE_LIMITS, and the learnt rates are saved to
+    Config.RATE_LIMIT_STATE_PATH so a restart doesn't start from scratch.
+    """
+    _limiters: Dict[str, "AdaptiveRateLimiter"] = {}
+    _registry_lock = threading.Lock()
+    _save_lock = threading.Lock()  # Serialises writing the state file, so concurrent saves can't clobber each other
+    _last_saved = 0.0
+
+    def __init__(self, platform: str, initial_rate: float, min_rate: float, max_rate: float):
+        self.platform = platform
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.rate = min(max(initial_rate, min_rate), max_rate)
+        self.throttle_count = 0
+        self.average_latency: Optional[float] = None
+        self._latency_samples = 0
+        self._next_slot = 0.0
+        self._lock = threading.Lock()
+
+    @classmethod
+    def get(cls, platform: str) -> "AdaptiveRateLimiter":
+        """The shared limiter for a platform, created on first use with its saved rate."""
+        with cls._registry_lock:
+            limiter = cls._limiters.get(platform)
+            if limiter is None:
+                settings = Config.RATE_LIMITS.get(platform, Config.RATE_LIMITS['default'])
+                saved_rate = cls._load_state().get(platform, {}).get('rate')
+                limiter = cls(platform, saved_rate or settings['initial_rate'], settings['min_rate'],
+                              settings['max_rate'])
+                cls._limiters[platform] = limiter
+            return limiter
+
+    @classmethod
+    def get_all(cls) -> Dict[str, "AdaptiveRateLimiter"]:
+        for platform in Config.RATE_LIMITS:
+            if platform != 'default':
+                cls.get(platform)
+        with cls._registry_lock:
+            return dict(cls._limiters)
+
+    @classmethod
+    def reset(cls) -> None:
+        """Forget all limiters, they are recreated from the config and saved state on next use."""
+        with cls._registry_lock:
+            cls._limiters = {}
+
+    def wait(self) -> None:
+        """Block until the next request to the platform may be made."""
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next_slot)
+            self._next_slot = slot + 1 / self.rate
+        if slot > now:
+            time.sleep(slot - now)
+
+    def call(self, fn: Callable, *args, track_latency: bool = True, **kwargs) -> Any:
+        """
+        Make a request through the limiter: waits for its turn, then records the outcome. Errors that look like
+        throttling (see is_throttle_error) slow the platform down before being re-raised.
+
+        :param track_latency: Use the call's duration as a latency signal. Off for calls whose duration depends on
+            the amount of data, e.g. downloads.
+        """
+        self.wait()
+        start = time.monotonic()
+        try:
+            result = fn(*args, **kwargs)
+        except Exception as e:
+            if self.is_throttle_error(e):
+                self.record_throttled()
+            raise
+        self.record_success(time.monotonic() - start if track_latency else None)
+        return result
+
+    def record_success(self, latency: Optional[float] = None) -> None:
+        with self._lock:
+            if latency is not None and self._is_slow(latency):
+                self.rate = max(self.min_rate, self.rate * LATENCY_DECREASE)
+            else:
+                self.rate = min(self.max_rate, self.rate + ADDITIVE_INCREASE)
+            if latency is not None:
+                self._update_latency(latency)
+        self._save_state()
+
+    def record_throttled(self, retry_after: Optional[float] = None) -> None:
+        with self._lock:
+            self.rate = max(self.min_rate, self.rate * MULTIPLICATIVE_DECREASE)
+            self.throttle_count += 1
+            pause = retry_after if retry_after is not None else 1 / self.rate
+            self._next_slot = max(self._next_slot, time.monotonic() + pause)
+        logger.warning("Throttled by %s, slowing to %.2f requests/s and pausing %.1fs",
+                       self.platform, self.rate, pause)
+        self._save_state(force=True)
+
+    def _is_slow(self, latency: float) -> bool:
+        return (self._latency_samples >= MIN_LATENCY_SAMPLES
+                and latency > self.average_latency * LATENCY_FACTOR)
+
+    def _update_latency(self, latency: float) -> None:
+        if self.average_latency is None:
+            self.average_latency = latency
+        else:
+            self.average_latency += LATENCY_SMOOTHING * (latency - self.average_latency)
+        self._latency_samples += 1
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'platform': self.platform,
+            'rate': round(self.rate, 3),
+            'min_rate': self.min_rate,
+            'max_rate': self.max_rate,
+            'throttle_count': self.throttle_count,
+            'average_latency': round(self.average_latency, 3) if self.average_latency is not None else None,
+        }
+
+    @staticmethod
+    def is_throttle_error(error: Any) -> bool:
+        """Whether an error (e.g. from yt-dlp) means the platform is throttling us or asking for a bot check."""
+        return bool(THROTTLE_PATTERN.search(str(error)))
+
+    @staticmethod
+    def parse_retry_after(value: Optional[str]) -> Optional[float]:
+        """Seconds to wait from a Retry-After header, if given in seconds."""
+        try:
+            return max(0.0, float(value)) if value is not None else None
+        except ValueError:
+            return None
+
+    @classmethod
+    def _load_state(cls) -> Dict[str, Any]:
+        try:
+            with open(Config.RATE_LIMIT_STATE_PATH, 'r', encoding='UTF-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    @classmethod
+    def _save_state(cls, force: bool = False) -> None:
+        now = time.monotonic()
+        with cls._registry_lock:
+            if not force and now - cls._last_saved < SAVE_INTERVAL:
+                return
+            cls._last_saved = now
+
+        # Rates are read under the save lock too, so the last file written always has the latest rates
+        with cls._save_lock:
+            with cls._registry_lock:
+                state = {platform: {'rate': limiter.rate} for platform, limiter in cls._limiters.items()}
+            state_path = os.path.abspath(Config.RATE_LIMIT_STATE_PATH)
+            try:
+                fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(state_path),
+                                                 prefix=os.path.basename(state_path), suffix='.tmp')
+                try:
+                    with os.fdopen(fd, 'w', encoding='UTF-8') as f:
+                        json.dump(state, f)
+                    os.replace(temp_path, state_path)
+                except BaseException:
+                    os.remove(temp_path)
+                    raise
+            except OSError as e:
+                logger.warning("Failed to save rate limits: %s", e)
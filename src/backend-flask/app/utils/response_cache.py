@@ -0,0 +1,146 @@
+import logging
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, Tuple
+
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+CacheKey = Tuple[str, str]  # (namespace, e.g. "spotify_playlist", key, e.g. the URL)
+
+
+class _KeyLock:
+    """Serialises the fetches of one key, kept while any caller holds or waits on it."""
+
+    def __init__(self) -> None:
+        self.lock = threading.Lock()
+        self.users = 0
+
+
+class ResponseCache:
+    """
+    In memory cache of the platform services' upstream fetches (playlist pages, API responses), keyed by URL.
+
+    A sync fetches a playlist's metadata and then its tracks, which for most platforms come from the same upstream
+    page or response. Inside a scope() (e.g. one playlist's sync) every fetch is made at most once, however long the
+    sync takes. Outside of a scope, responses are reused for Config.RESPONSE_CACHE_TTL seconds, which covers adding a
+    playlist and a sync straight after. At most Config.RESPONSE_CACHE_MAX_ENTRIES are kept, least recently used
+    evicted first. Concurrent fetches of the same key wait for a single fetch, and failed fetches (raising or returning
+    None) aren't cached.
+
+    Cached responses are shared, so callers mustn't modify them.
+    """
+    _lock = threading.Lock()
+    _entries: "OrderedDict[CacheKey, Tuple[float, Any]]" = OrderedDict()  # Key -> (expiry, response)
+    _key_locks: Dict[CacheKey, _KeyLock] = {}
+    _stats: Dict[str, Dict[str, int]] = {}
+    _local = threading.local()
+
+    @classmethod
+    def get_or_fetch(cls, namespace: str, key: str, fetch: Callable[[], Any]) -> Any:
+        """
+        The cached response for a key, fetching and caching it on a miss.
+
+        :param namespace: What is fetched, so the same URL can be cached for different fetches
+        :param fetch: Makes the upstream fetch
+        """
+        cache_key = (namespace, key)
+        scope = getattr(cls._local, 'scope', None)
+        if scope is not None and cache_key in scope:
+            with cls._lock:
+                cls._count(namespace, 'hits')
+            return scope[cache_key]
+
+        with cls._lock:
+            key_lock = cls._key_locks.setdefault(cache_key, _KeyLock())
+            key_lock.users += 1
+
+        try:
+            with key_lock.lock:
+                found, response = cls._get(cache_key)
+                if not found:
+                    response = fetch()
+                    if response is not None:
+                        cls._put(cache_key, response)
+        finally:
+            with cls._lock:
+                # Only dropped once nobody is waiting on it, else a later caller could fetch alongside a waiter
+                key_lock.users -= 1
+                if not key_lock.users:
+                    del cls._key_locks[cache_key]
+        if scope is not None and response is not None:
+            scope[cache_key] = response
+        return response
+
+    @classmethod
+    @contextmanager
+    def scope(cls) -> Iterator[None]:
+        """Reuse every response fetched by this thread inside the block, whatever its age. Scopes can be nested."""
+        if getattr(cls._local, 'scope', None) is not None:
+            yield
+            return
+        cls._local.scope = {}
+        try:
+            yield
+        finally:
+            cls._local.scope = None
+
+    @classmethod
+    def _get(cls, cache_key: CacheKey) -> Tuple[bool, Any]:
+        """Whether the key is cached and hasn't expired, and its response. Counts the hit or miss."""
+        with cls._lock:
+            entry = cls._entries.get(cache_key)
+            if entry is not None and entry[0] <= time.monotonic():
+                del cls._entries[cache_key]
+                cls._count(cache_key[0], 'expired')
+                entry = None
+            if entry is None:
+                cls._count(cache_key[0], 'misses')
+                return False, None
+            cls._entries.move_to_end(cache_key)
+            cls._count(cache_key[0], 'hits')
+            return True, entry[1]
+
+    @classmethod
+    def _put(cls, cache_key: CacheKey, response: Any) -> None:
+        if Config.RESPONSE_CACHE_TTL <= 0:
+            return
+        with cls._lock:
+            cls._entries[cache_key] = (time.monotonic() + Config.RESPONSE_CACHE_TTL, response)
+            cls._entries.move_to_end(cache_key)
+            while len(cls._entries) > Config.RESPONSE_CACHE_MAX_ENTRIES:
+                evicted_key, _entry = cls._entries.popitem(last=False)
+                cls._count(evicted_key[0], 'evicted')
+
+    @classmethod
+    def _count(cls, namespace: str, stat: str) -> None:
+        """Count a hit, miss, expiry or eviction. The lock must be held."""
+        counts = cls._stats.setdefault(namespace, {'hits': 0, 'misses': 0, 'expired': 0, 'evicted': 0})
+        counts[stat] += 1
+
+    @classmethod
+    def clear(cls) -> None:
+        """Forget all cached responses and stats."""
+        with cls._lock:
+            cls._entries.clear()
+            cls._stats = {}
+
+    @classmethod
+    def stats(cls) -> Dict[str, Any]:
+        with cls._lock:
+            namespaces = {namespace: dict(counts) for namespace, counts in sorted(cls._stats.items())}
+            entries = len(cls._entries)
+        hits = sum(counts['hits'] for counts in namespaces.values())
+        misses = sum(counts['misses'] for counts in namespaces.values())
+        return {
+            'entries': entries,
+            'max_entries': Config.RESPONSE_CACHE_MAX_ENTRIES,
+            'ttl': Config.RESPONSE_CACHE_TTL,
+            'hits': hits,
+            'misses': misses,
+            'hit_rate': round(hits / (hits + misses), 3) if hits + misses else None,
+            'namespaces': namespaces,
+        }
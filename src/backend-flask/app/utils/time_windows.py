@@ -0,0 +1,38 @@
+import re
+from datetime import datetime
+from typing import Any, Dict
+
+TIME_PATTERN = re.compile(r"^([01]\d|2[0-3]):[0-5]\d$")
+
+
+def in_window(window: Dict[str, Any], now: datetime) -> bool:
+    """
+    Whether a time falls in a window of the day: {'start': 'HH:MM', 'end': 'HH:MM', 'days': [0 (Monday) to 6]}, on
+    all days if days isn't given. A window ending before it starts runs past midnight, into the next day.
+    """
+    days = window.get('days')
+    start, end, current = window['start'], window['end'], now.strftime("%H:%M")
+    if start <= end:
+        is_in_window = start <= current < end
+        day = now.weekday()
+    else:
+        # Wraps past midnight, the early hours belong to the previous day's window
+        is_in_window = current >= start or current < end
+        day = now.weekday() if current >= start else (now.weekday() - 1) % 7
+    return is_in_window and (days is None or day in days)
+
+
+def validate_window(window: Any, where: str) -> Dict[str, Any]:
+    """
+    :return: The window's start, end and days
+    :raises ValueError: If the window is invalid, the message starting with where
+    """
+    if not isinstance(window, dict):
+        raise ValueError(f"{where} must be an object")
+    if not all(isinstance(window.get(key), str) and TIME_PATTERN.match(window[key]) for key in ('start', 'end')):
+        raise ValueError(f"{where} needs a start and end time as HH:MM")
+    days = window.get('days')
+    if days is not None and (not isinstance(days, list)
+                             or not all(isinstance(day, int) and 0 <= day <= 6 for day in days)):
+        raise ValueError(f"{where} days must be a list of 0 (Monday) to 6")
+    return {'start': window['start'], 'end': window['end'], 'days': days}
@@ -0,0 +1,130 @@
+import logging
+import threading
+from contextlib import contextmanager
+from typing import Optional, Set
+
+from app.workers.job_manager import JobCancelledError
+
+logger = logging.getLogger(__name__)
+
+PAUSE_CHECK_INTERVAL = 0.5  # Seconds between checks for a cancellation while paused
+
+_local = threading.local()
+
+
+class DownloadCancelledError(JobCancelledError):
+    """Raised inside a download when its track or task has been cancelled (or preempted by more urgent work)."""
+
+    def __init__(self, message: str, track_only: bool = False, preempted: bool = False):
+        super().__init__(message)
+        self.track_only = track_only  # Only this track was cancelled, the rest of its playlist carries on
+        self.preempted = preempted  # Stopped to make way for other work, the download is picked up again later
+
+
+class DownloadControl:
+    """
+    Pause, resume and cancellation of downloads that are in progress, not just between tracks.
+
+    The download manager runs each task inside running(), which makes its control the current one for the worker
+    thread. Downloads check it at each track (checkpoint) and, through progress_hook, as yt-dlp reports progress, so
+    a cancel stops a long download within a moment. While paused those checks block, holding downloads where they are
+    until resumed.
+    """
+
+    def __init__(self):
+        self._resumed = threading.Event()
+        self._resumed.set()
+        self._cancelled_tracks: Set[int] = set()
+        self._stop: Optional[DownloadCancelledError] = None
+        self._lock = threading.Lock()
+
+    @property
+    def paused(self) -> bool:
+        return not self._resumed.is_set()
+
+    def pause(self) -> None:
+        logger.info("Pausing downloads")
+        self._resumed.clear()
+
+    def resume(self) -> None:
+        logger.info("Resuming downloads")
+        self._resumed.set()
+
+    def wait_until_resumed(self, timeout: Optional[float] = None) -> bool:
+        return self._resumed.wait(timeout)
+
+    def cancel_track(self, track_id: int) -> None:
+        """Cancel a track's download, whether it's in progress or still to come in the running task."""
+        with self._lock:
+            self._cancelled_tracks.add(track_id)
+
+    def stop_current(self, preempted: bool = False) -> None:
+        """Stop the task that is running, mid-download."""
+        reason = "preempted" if preempted else "cancelled"
+        with self._lock:
+            self._stop = DownloadCancelledError(f"Download {reason}", preempted=preempted)
+
+    @contextmanager
+    def running(self):
+        """Run a task under this control, in the calling thread."""
+        _local.control = self
+        try:
+            yield self
+        finally:
+            _local.control = None
+            with self._lock:
+                # Stops and track cancels only apply to the task they were made during
+                self._stop = None
+                self._cancelled_tracks.clear()
+
+    def _cancellation(self, track_id: Optional[int]) -> Optional[DownloadCancelledError]:
+        with self._lock:
+            if track_id is not None and track_id in self._cancelled_tracks:
+                self._cancelled_tracks.discard(track_id)
+                return DownloadCancelledError(f"Download of track {track_id} cancelled", track_only=True)
+            return self._stop
+
+    def check(self, track_id: Optional[int]) -> None:
+        """Raise DownloadCancelledError if the download has been cancelled, blocking while paused."""
+        while True:
+            error = self._cancellation(track_id)
+            if error is not None:
+                _local.cancellation = error
+                raise error
+            if self.wait_until_resumed(PAUSE_CHECK_INTERVAL):
+                return
+
+    @staticmethod
+    def current() -> Optional["DownloadControl"]:
+        return getattr(_local, 'control', None)
+
+    @staticmethod
+    @contextmanager
+    def track(track_id: int):
+        """Mark the track being downloaded by the calling thread, for progress_hook."""
+        _local.track_id = track_id
+        _local.cancellation = None
+        try:
+            yield
+        finally:
+            _local.track_id = None
+
+    @staticmethod
+    def checkpoint(track_id: Optional[int] = None) -> None:
+        """Check for a cancellation (or wait while paused), if running under a control."""
+        control = DownloadControl.current()
+        if control is not None:
+            control.check(track_id if track_id is not None else getattr(_local, 'track_id', None))
+
+    @staticmethod
+    def progress_hook(progress: dict) -> None:
+        """yt-dlp progress hook: raising here aborts the download that is in progress."""
+        DownloadControl.checkpoint()
+
+    @staticmethod
+    def raised_cancellation() -> Optional[DownloadCancelledError]:
+        """
+        The cancellation raised in the current track's download, if any. yt-dlp may wrap or report exceptions from
+        its hooks as its own errors, so this is how a download tells a cancellation from a failure.
+        """
+        return getattr(_local, 'cancellation', None)
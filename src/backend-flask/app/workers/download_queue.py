@@ -0,0 +1,161 @@
+import itertools
+import logging
+import threading
+import time
+from typing import Any, Dict, Hashable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Priority classes, lower runs first
+PRIORITY_INTERACTIVE = 0  # Something the user is waiting on right now, e.g. re-downloading a track
+PRIORITY_USER = 1  # Syncs started by the user
+PRIORITY_BACKGROUND = 2  # Scheduled syncs
+PRIORITIES = {
+    'interactive': PRIORITY_INTERACTIVE,
+    'user': PRIORITY_USER,
+    'background': PRIORITY_BACKGROUND,
+}
+
+AGING_INTERVAL = 600  # Seconds waited that raise a task by one priority class, so low priorities can't starve
+
+
+class QueueEntry:
+    def __init__(self, item: Any, priority: int, key: Optional[Hashable], enqueued_at: float, sequence: int,
+                 waited: float = 0):
+        self.item = item
+        self.priority = priority
+        self.key = key
+        self.enqueued_at = enqueued_at
+        self.sequence = sequence
+        self.waited = waited  # Seconds spent queued before enqueued_at, in earlier turns in the queue
+
+    def age(self, now: float) -> float:
+        """Seconds spent queued, not counting time spent running between turns."""
+        return self.waited + now - self.enqueued_at
+
+    def effective_priority(self, now: float, aging_interval: float) -> float:
+        effective_priority = self.priority - self.age(now) / aging_interval
+        if self.priority > PRIORITY_INTERACTIVE:
+            # Aging keeps lower classes from starving, but never puts them ahead of work the user is waiting on
+            effective_priority = max(effective_priority, PRIORITY_INTERACTIVE)
+        return effective_priority
+
+    def rank(self, now: float, aging_interval: float):
+        return self.effective_priority(now, aging_interval), self.sequence
+
+
+class DownloadQueue:
+    """
+    Thread safe priority queue for download work, with the same put/get/task_done/join interface as queue.Queue.
+
+    Items are taken in priority class order (interactive, user, background), oldest first within a class.
+    Waiting ages an item: every aging_interval seconds it has waited counts as one class higher, so a busy queue of
+    user syncs can't starve scheduled ones forever, though aging never lifts an item above interactive ones. Items can be given a key, re-adding a queued key doesn't queue it
+    twice but raises it to the higher of the two priorities.
+    """
+
+    def __init__(self, aging_interval: float = AGING_INTERVAL):
+        self.aging_interval = aging_interval
+        # Queues hold a handful of playlists and tracks, so a list scanned on get is plenty fast
+        self._entries: List[QueueEntry] = []
+        self._keys: Dict[Hashable, QueueEntry] = {}
+        self._sequence = itertools.count()
+        self._unfinished_tasks = 0
+        self._closed = False
+        self._mutex = threading.Lock()
+        self._not_empty = threading.Condition(self._mutex)
+        self._all_tasks_done = threading.Condition(self._mutex)
+
+    def put(self, item: Any, priority: int = PRIORITY_USER, key: Optional[Hashable] = None,
+            enqueued_at: Optional[float] = None, waited: float = 0) -> bool:
+        """
+        Queue an item.
+
+        :param key: Identifies the item, e.g. ('playlist', id), so it's only queued once
+        :param enqueued_at: When the item was queued (time.monotonic()), now by default
+        :param waited: Seconds the item had already waited, in earlier turns in the queue
+        :return: False if the key was already queued (its priority is raised if needed), otherwise True
+        """
+        with self._mutex:
+            existing = self._keys.get(key) if key is not None else None
+            if existing is not None:
+                existing.priority = min(existing.priority, priority)
+                return False
+
+            entry = QueueEntry(item, priority, key, enqueued_at or time.monotonic(), next(self._sequence), waited)
+            self._entries.append(entry)
+            if key is not None:
+                self._keys[key] = entry
+            self._unfinished_tasks += 1
+            self._not_empty.notify()
+            return True
+
+    def get(self, timeout: Optional[float] = None) -> Optional[QueueEntry]:
+        """
+        Take the highest (effective) priority entry, blocking until there is one.
+
+        :return: The entry, or None if the queue was closed (or the timeout passed)
+        """
+        with self._not_empty:
+            deadline = time.monotonic() + timeout if timeout is not None else None
+            while not self._closed and not self._entries:
+                remaining = deadline - time.monotonic() if deadline is not None else None
+                if remaining is not None and remaining <= 0:
+                    return None
+                self._not_empty.wait(remaining)
+            if self._closed:
+                return None
+
+            now = time.monotonic()
+            entry = min(self._entries, key=lambda queued: queued.rank(now, self.aging_interval))
+            self._entries.remove(entry)
+            if entry.key is not None:
+                self._keys.pop(entry.key, None)
+            entry.waited = entry.age(now)
+            return entry
+
+    def requeue(self, entry: QueueEntry) -> bool:
+        """
+        Queue a taken entry again (e.g. a preempted playlist), keeping its priority and the time it had waited, but
+        not counting the time it spent running as waiting.
+
+        :return: False if its key has been queued again meanwhile, otherwise True
+        """
+        return self.put(entry.item, entry.priority, entry.key, waited=entry.waited)
+
+    def peek_priority(self) -> Optional[float]:
+        """The effective priority of the entry that would be taken next, None if empty."""
+        with self._mutex:
+            now = time.monotonic()
+            return min((entry.effective_priority(now, self.aging_interval) for entry in self._entries), default=None)
+
+    def task_done(self) -> None:
+        with self._all_tasks_done:
+            self._unfinished_tasks -= 1
+            if self._unfinished_tasks <= 0:
+                self._unfinished_tasks = 0
+                self._all_tasks_done.notify_all()
+
+    def join(self) -> None:
+        """Block until every item put has been taken and marked done with task_done."""
+        with self._all_tasks_done:
+            while self._unfinished_tasks:
+                self._all_tasks_done.wait()
+
+    def close(self) -> None:
+        """Stop handing out items, waking any waiting get() with None."""
+        with self._mutex:
+            self._closed = True
+            self._not_empty.notify_all()
+
+    def snapshot(self) -> List[Dict[str, Any]]:
+        """The queued items in the order they'd run now, with their priorities."""
+        with self._mutex:
+            now = time.monotonic()
+            entries = sorted(self._entries, key=lambda entry: entry.rank(now, self.aging_interval))
+            return [{'item': entry.item, 'priority': entry.priority,
+                     'waited': round(entry.age(now), 1)} for entry in entries]
+
+    def qsize(self) -> int:
+        with self._mutex:
+            return len(self._entries)
@@ -1,24 +1,68 @@
 import logging
+import os
 import threading
-import queue
+from typing import Optional
 
 from flask import Flask
 
-from app.extensions import emit_error_message
+from app.extensions import db, emit_error_message, socketio
+from app.models import Track
 from app.repositories.playlist_repository import PlaylistRepository
 from app.services.download_services.spotify_download_service import SpotifyDownloadService
 from app.services.download_services.soundcloud_download_service import SoundcloudDownloadService
+from app.services.download_services.track_storage_service import TrackStorageService
 from app.services.download_services.youtube_download_service import YouTubeDownloadService
+from app.utils.db_utils import commit_with_retries
+from app.utils.disk_space import DiskSpaceGuard, InsufficientDiskSpaceError
+from app.utils.library_index import LibraryIndex
+from app.workers.download_control import DownloadControl
+from app.workers.download_queue import DownloadQueue, PRIORITIES, PRIORITY_INTERACTIVE, PRIORITY_USER, QueueEntry
+from app.workers.job_manager import Job
+from config import Config
 
 logger = logging.getLogger(__name__)
 
+TRACK_DOWNLOAD_JOB_TYPE = "track_download"
+
+DOWNLOAD_SERVICES = {
+    "spotify": SpotifyDownloadService,
+    "soundcloud": SoundcloudDownloadService,
+    "youtube": YouTubeDownloadService,
+}
+
 
 class DownloadManager:
+    """
+    Downloads queued playlists and single tracks one at a time in a background worker thread.
+
+    The queue is a DownloadQueue, so work runs in priority order (interactive, user, background) with aging. Adding
+    work of a higher priority class than the playlist being downloaded preempts it: the playlist stops and is queued
+    again (keeping the time it had waited), already downloaded tracks are skipped and the partial one continued when it resumes.
+
+    Single track downloads (e.g. re-downloading a track) are tracked as jobs in the app's JobManager, so they can be
+    polled and cancelled like other jobs, and their completion is emitted via WebSocket ("job_finished").
+
+    Cancelling, preempting and pausing reach into the download in progress through a DownloadControl, rather than
+    waiting for the current track to finish.
+
+    Running out of disk space (see DiskSpaceGuard) pauses downloading, with the stopped playlist queued again, until
+    a monitor thread sees enough space has been freed.
+    """
+
     def __init__(self, app: Flask):
         logger.info("Initialising Download Manager")
-        self.download_queue = queue.Queue()
+        self.download_queue = DownloadQueue(
+            app.config.get("DOWNLOAD_QUEUE_AGING_INTERVAL", Config.DOWNLOAD_QUEUE_AGING_INTERVAL))
         self.cancellation_flags: dict[threading.Event] = {}
+        self._queued_track_jobs: dict[int, Job] = {}
+        self._replacing_tracks: set[int] = set()  # Queued tracks whose current file is removed once their job starts
+        self.control = DownloadControl()
         self.app = app
+        self._current: Optional[QueueEntry] = None
+        self._requeue_current = False  # Queue the running task again once it stops (preempted, or out of disk space)
+        self._lock = threading.Lock()
+        self._disk_space_monitor: Optional[threading.Thread] = None
+        self._stopping = threading.Event()
 
         # Start the background worker thread (daemon=True so it ends when the app stops)
         self.worker_thread = threading.Thread(target=self._download_worker, daemon=True)
@@ -30,67 +74,274 @@ class DownloadManager:
         """ Background worker that processes the download queue. """
         logger.info("Download Worker Started")
         while True:
-            playlist_id, quick_sync = self.download_queue.get()  # blocks until a task is available
+            self.control.wait_until_resumed()  # Paused work stays queued, so it still runs in priority order
+            entry = self.download_queue.get()  # blocks until a task is available
 
             # Check for shutdown signal
-            if playlist_id is None:
-                self.download_queue.task_done()
+            if entry is None:
                 logger.info("Shutdown signal received. Exiting download worker.")
                 break
 
-            with self.app.app_context():
-                playlist = PlaylistRepository.get_playlist_by_id(playlist_id)
-                if not playlist:
-                    self.download_queue.task_done()
-                    continue
-
-                logger.info(f"Downloading playlist {playlist}")
-
-                try:
-                    if playlist.platform == "spotify":
-                        SpotifyDownloadService.download_playlist(playlist, quick_sync, self.cancellation_flags)
-                    elif playlist.platform == "soundcloud":
-                        SoundcloudDownloadService.download_playlist(playlist, quick_sync, self.cancellation_flags)
-                    elif playlist.platform == "youtube":
-                        YouTubeDownloadService.download_playlist(playlist, quick_sync, self.cancellation_flags)
-                    else:
-                        error_msg = f"Unsupported platform: {playlist.platform}"
-                        logger.error(error_msg)
-                        emit_error_message(playlist.id, error_msg)
-                        PlaylistRepository.set_download_status(playlist, 'ready')
-                except Exception as e:
-                    logger.error(f"Error downloading playlist {playlist.id}: {e}")
-                    emit_error_message(playlist.id, f"Error downloading playlist: {str(e)}")
+            requeue = False
+            try:
+                with self.control.running():
+                    with self._lock:
+                        self._current = entry
+                        self._requeue_current = False
+                    try:
+                        if entry.item[0] == "track":
+                            self._run_track_job(entry.item[1])
+                        else:
+                            _, playlist_id, quick_sync = entry.item
+                            self._download_playlist(playlist_id, quick_sync)
+                    finally:
+                        # Cleared while still running, so a stop can't be left behind for the next task
+                        with self._lock:
+                            self._current = None
+                            requeue = self._requeue_current
+            finally:
+                if requeue:
+                    self._requeue(entry)
+                self.download_queue.task_done()
+
+    def _download_playlist(self, playlist_id, quick_sync):
+        with self.app.app_context():
+            playlist = PlaylistRepository.get_playlist_by_id(playlist_id)
+            if not playlist:
+                return
+
+            logger.info(f"Downloading playlist {playlist}")
+
+            try:
+                if playlist.platform == "spotify":
+                    SpotifyDownloadService.download_playlist(playlist, quick_sync, self.cancellation_flags)
+                elif playlist.platform == "soundcloud":
+                    SoundcloudDownloadService.download_playlist(playlist, quick_sync, self.cancellation_flags)
+                elif playlist.platform == "youtube":
+                    YouTubeDownloadService.download_playlist(playlist, quick_sync, self.cancellation_flags)
+                else:
+                    error_msg = f"Unsupported platform: {playlist.platform}"
+                    logger.error(error_msg)
+                    emit_error_message(playlist.id, error_msg)
                     PlaylistRepository.set_download_status(playlist, 'ready')
-                finally:
-                    if playlist.id in self.cancellation_flags:
-                        self.cancellation_flags[playlist.id].clear()
+            except InsufficientDiskSpaceError as e:
+                with self._lock:
+                    self._requeue_current = True  # Carries on where it stopped once there's space
+                self._pause_for_disk_space(e)
+            except Exception as e:
+                logger.error(f"Error downloading playlist {playlist.id}: {e}")
+                emit_error_message(playlist.id, f"Error downloading playlist: {str(e)}")
+                PlaylistRepository.set_download_status(playlist, 'ready')
+            finally:
+                if playlist.id in self.cancellation_flags:
+                    self.cancellation_flags[playlist.id].clear()
+
+    def _pause_for_disk_space(self, error: InsufficientDiskSpaceError):
+        """ Pause downloading until enough disk space is free again, checked by a monitor thread. """
+        with self._lock:
+            if self._disk_space_monitor is not None and self._disk_space_monitor.is_alive():
+                return
+            logger.warning("Pausing downloads, %s", error)
+            self.control.pause()
+            self._disk_space_monitor = threading.Thread(target=self._wait_for_disk_space, daemon=True)
+            self._disk_space_monitor.start()
+        emit_error_message("", f"Downloads paused until disk space is freed. {error}")
+        socketio.emit("download_queue", self.get_status())
 
-            self.download_queue.task_done()
+    def _wait_for_disk_space(self):
+        while not self._stopping.wait(Config.DISK_SPACE_CHECK_INTERVAL):
+            if not self.control.paused:
+                return  # Resumed by hand
+            try:
+                if DiskSpaceGuard.has_space_to_resume():
+                    logger.info("Disk space freed, resuming downloads")
+                    self.control.resume()
+                    socketio.emit("download_queue", self.get_status())
+                    return
+            except OSError as e:
+                logger.warning("Failed to check free disk space: %s", e)
 
-    def add_to_queue(self, playlist_id, quick_sync=False):
-        self.download_queue.put((playlist_id, quick_sync))
+    def _requeue(self, entry: QueueEntry):
+        """ Queue a stopped playlist again, keeping its priority and the time it had waited. """
+        playlist_id = entry.item[1]
+        logger.info("Download of playlist %s stopped early, re-queueing", playlist_id)
+        self.download_queue.requeue(entry)
+        with self.app.app_context():
+            playlist = PlaylistRepository.get_playlist_by_id(playlist_id)
+            if playlist:
+                PlaylistRepository.set_download_status(playlist, 'queued')
 
+    def add_to_queue(self, playlist_id, quick_sync=False, priority=PRIORITY_USER):
+        """
+        Queue a playlist for download.
+
+        :param priority: Priority class, PRIORITY_INTERACTIVE, PRIORITY_USER (default) or PRIORITY_BACKGROUND
+        """
         # Set cancellation flag
         if playlist_id not in self.cancellation_flags:
             self.cancellation_flags[playlist_id] = threading.Event()
         else:
             self.cancellation_flags[playlist_id].clear()
 
-    def add_playlists_to_queue(self, playlist_ids):
+        self.download_queue.put(("playlist", playlist_id, quick_sync), priority,
+                                key=("playlist", playlist_id, quick_sync))
+        self._preempt_if_lower_priority(priority)
+
+    def _preempt_if_lower_priority(self, priority):
+        """ Stop the playlist being downloaded after its current track if the new work has a higher priority. """
+        with self._lock:
+            current = self._current
+            # Track downloads are short, so they aren't preempted
+            if current is None or current.item[0] != "playlist" or self._requeue_current or priority >= current.priority:
+                return
+            self._requeue_current = True
+            self.control.stop_current(preempted=True)
+        playlist_id = current.item[1]
+        logger.info("Preempting download of playlist %s for higher priority work", playlist_id)
+        if playlist_id in self.cancellation_flags:
+            self.cancellation_flags[playlist_id].set()
+
+    def add_track_to_queue(self, track_id: int, priority=PRIORITY_INTERACTIVE, replace_existing=False) -> Job:
+        """
+        Queue a single track for download, by default ahead of playlist syncs.
+
+        :param replace_existing: Remove the track's current file once the download starts, to download it again. The
+            file is kept if the job is cancelled before then.
+        :return: The track's download job, the already queued job if the track is queued
+        """
+        with self._lock:
+            job = self._queued_track_jobs.get(track_id)
+            if job is None or job.cancel_event.is_set():
+                job = self.app.job_manager.create_job(TRACK_DOWNLOAD_JOB_TYPE)
+                job.progress = {'track_id': track_id}
+                self._queued_track_jobs[track_id] = job
+            if replace_existing:
+                self._replacing_tracks.add(track_id)
+        self.download_queue.put(("track", track_id), priority, key=("track", track_id))
+        self._preempt_if_lower_priority(priority)
+        return job
+
+    def _run_track_job(self, track_id: int):
+        with self._lock:
+            job = self._queued_track_jobs.pop(track_id)
+            replace_existing = track_id in self._replacing_tracks
+            self._replacing_tracks.discard(track_id)
+        self.app.job_manager.run_job(job, self._download_track, track_id, replace_existing)
+
+    def _download_track(self, job: Job, track_id: int, replace_existing: bool = False) -> dict:
+        """ Job that downloads a single track, returning the updated track. """
+        job.check_cancelled()
+        track = db.session.get(Track, track_id)
+        if not track:
+            raise ValueError(f"Track {track_id} not found")
+
+        download_service = DOWNLOAD_SERVICES.get(track.platform.lower())
+        if download_service is None:
+            raise ValueError(f"Unsupported platform: {track.platform}")
+
+        if replace_existing:
+            self._remove_existing_download(track)
+
+        logger.info("Downloading track '%s'", track.name)
+        try:
+            download_service.download_track(track)
+        except InsufficientDiskSpaceError as e:
+            self._pause_for_disk_space(e)
+            raise
+        db.session.refresh(track)
+        return track.to_dict()
+
+    @staticmethod
+    def _remove_existing_download(track: Track):
+        """
+        Remove the track's file and clear its download location, so it's downloaded again. A file other tracks are
+        stored at too is kept for them, only this track's location is cleared.
+        """
+        absolute_path = track.absolute_download_path
+        logger.info("Clearing previous download for track %s, location %s", track.id, absolute_path)
+        if TrackStorageService.is_file_shared(track):
+            logger.info("Keeping file shared with other tracks, location %s", absolute_path)
+        elif absolute_path and os.path.exists(absolute_path):
+            logger.info("Removing file, location %s", absolute_path)
+            os.remove(absolute_path)
+            library_index = LibraryIndex.get_live_index()
+            if library_index is not None:
+                library_index.remove(absolute_path)
+        track.download_location = None
+        commit_with_retries(db.session)
+
+    def add_playlists_to_queue(self, playlist_ids, priority=PRIORITY_USER):
         for playlist_id in playlist_ids:
-            self.add_to_queue(playlist_id)
+            self.add_to_queue(playlist_id, priority=priority)
 
     def cancel_download(self, playlist_id):
         logger.info(f"Playlist canceled: {playlist_id}")
+        with self._lock:
+            # A cancelled playlist mustn't be re-queued by a preemption
+            if self._current is not None and self._current.item[:2] == ("playlist", playlist_id):
+                self._requeue_current = False
+                self.control.stop_current()
         if playlist_id in self.cancellation_flags:
             self.cancellation_flags[playlist_id].set()
             logger.info(f"cancellation_flags: {self.cancellation_flags[playlist_id]}")
 
+    def cancel_track(self, track_id: int) -> bool:
+        """
+        Cancel a track's download: a queued track download, or the track being downloaded (or still to come) in the
+        running task. Its partial download is removed.
+
+        :return: Whether there was a download of the track to cancel
+        """
+        with self._lock:
+            job = self._queued_track_jobs.get(track_id)
+            running = self._current is not None
+            if job is None and running:
+                self.control.cancel_track(track_id)
+        if job is not None:
+            logger.info("Cancelling queued download of track %s", track_id)
+            self.app.job_manager.cancel_job(job.id)
+            return True
+        if running:
+            logger.info("Cancelling download of track %s", track_id)
+        return running
+
+    def pause(self):
+        """ Pause downloading: the download in progress holds where it is and queued work waits. """
+        self.control.pause()
+
+    def resume(self):
+        self.control.resume()
+
+    def is_playlist_pending(self, playlist_id: int) -> bool:
+        """ Whether the playlist is queued or being downloaded. """
+        with self._lock:
+            current = self._current
+        if current is not None and current.item[:2] == ("playlist", playlist_id):
+            return True
+        return any(entry['item'][:2] == ("playlist", playlist_id) for entry in self.download_queue.snapshot())
+
+    def get_status(self) -> dict:
+        with self._lock:
+            current = self._current
+        priority_names = {value: name for name, value in PRIORITIES.items()}
+
+        def describe(item, priority):
+            return {'type': item[0], 'id': item[1], 'priority': priority_names.get(priority, priority)}
+
+        monitor = self._disk_space_monitor
+        return {
+            'paused': self.control.paused,
+            'waiting_for_disk_space': self.control.paused and monitor is not None and monitor.is_alive(),
+            'current': describe(current.item, current.priority) if current else None,
+            'queued': [describe(entry['item'], entry['priority']) for entry in self.download_queue.snapshot()],
+        }
+
     def shutdown(self):
         logger.info("Shutting down DownloadManager...")
-        # Queue shutdown signal
-        self.download_queue.put(None)
-        # Wait for the worker thread to finish its current task and exit
+        # Stop handing out queued work and stop the current download (its partial file is kept to resume)
+        self.download_queue.close()
+        self._stopping.set()
+        self.control.stop_current(preempted=True)
+        self.control.resume()
         self.worker_thread.join()
         logger.info("Download Manager shutdown")
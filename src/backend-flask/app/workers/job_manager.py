@@ -0,0 +1,151 @@
+import logging
+import threading
+import uuid
+from collections import OrderedDict
+from datetime import datetime
+from typing import Any, Callable, Dict, Optional
+
+from flask import Flask
+
+from app.extensions import db, socketio
+
+logger = logging.getLogger(__name__)
+
+MAX_FINISHED_JOBS = 50  # Finished jobs kept around so their results can still be fetched
+
+
+class JobCancelledError(Exception):
+    """Raised inside a job when it has been asked to cancel."""
+
+
+class JobAlreadyRunningError(Exception):
+    """Raised when starting an exclusive job while another of the same type is running."""
+
+
+class Job:
+    def __init__(self, job_type: str) -> None:
+        self.id = uuid.uuid4().hex
+        self.type = job_type
+        self.status = "queued"  # "queued", "running", "completed", "failed", "cancelled"
+        self.progress: Dict[str, Any] = {}
+        self.result: Any = None
+        self.error: Optional[str] = None
+        self.created_at = datetime.utcnow()
+        self.finished_at: Optional[datetime] = None
+        self.cancel_event = threading.Event()
+
+    @property
+    def is_finished(self) -> bool:
+        return self.status in ("completed", "failed", "cancelled")
+
+    def report_progress(self, **progress) -> None:
+        """
+        Update the job's progress and emit it via WebSocket.
+        Also the point where a job notices it has been cancelled, so long running work should call it often.
+        """
+        self.check_cancelled()
+        self.progress.update(progress)
+        socketio.emit("job_progress", self.to_dict())
+
+    def check_cancelled(self) -> None:
+        if self.cancel_event.is_set():
+            raise JobCancelledError(f"Job {self.id} cancelled")
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'id': self.id,
+            'type': self.type,
+            'status': self.status,
+            'progress': self.progress,
+            'result': self.result,
+            'error': self.error,
+            'created_at': self.created_at.isoformat(),
+            'finished_at': self.finished_at.isoformat() if self.finished_at else None,
+        }
+
+
+class JobManager:
+    """
+    Runs long running work (e.g. exports) in background threads so requests can return straight away.
+    Jobs report progress via WebSocket ("job_progress" and "job_finished" events) and can be cancelled.
+    """
+
+    def __init__(self, app: Flask):
+        logger.info("Initialising Job Manager")
+        self.app = app
+        self.jobs: "OrderedDict[str, Job]" = OrderedDict()
+        self._jobs_lock = threading.Lock()
+        self._exclusive_locks: Dict[str, threading.Lock] = {}
+
+    def start_job(self, job_type: str, target: Callable[..., Any], *args, exclusive: bool = False, **kwargs) -> Job:
+        """
+        Start a job in a background thread. The target is called with the job as its first argument,
+        inside an app context.
+
+        :param exclusive: Only allow one job of this type to run at a time
+        :raises JobAlreadyRunningError: If exclusive and a job of this type is already running
+        """
+        exclusive_lock = None
+        if exclusive:
+            with self._jobs_lock:
+                exclusive_lock = self._exclusive_locks.setdefault(job_type, threading.Lock())
+            if not exclusive_lock.acquire(blocking=False):
+                raise JobAlreadyRunningError(f"A {job_type} job is already running")
+
+        job = self.create_job(job_type)
+        thread = threading.Thread(target=self._run_job, args=(job, target, exclusive_lock, args, kwargs), daemon=True)
+        thread.start()
+        logger.info("Started %s job %s", job_type, job.id)
+        return job
+
+    def create_job(self, job_type: str) -> Job:
+        """
+        Register a job without starting it, for work that is run elsewhere (e.g. queued by the download manager)
+        but should still be tracked and cancellable here. Run it with run_job.
+        """
+        job = Job(job_type)
+        with self._jobs_lock:
+            self.jobs[job.id] = job
+            self._prune_finished_jobs()
+        return job
+
+    def run_job(self, job: Job, target: Callable[..., Any], *args, **kwargs) -> None:
+        """ Run a job created with create_job in the calling thread. """
+        self._run_job(job, target, None, args, kwargs)
+
+    def _run_job(self, job: Job, target: Callable[..., Any], exclusive_lock: Optional[threading.Lock],
+                 args: tuple, kwargs: dict) -> None:
+        with self.app.app_context():
+            try:
+                job.status = "running"
+                job.result = target(job, *args, **kwargs)
+                job.status = "completed"
+                logger.info("%s job %s completed", job.type, job.id)
+            except JobCancelledError:
+                job.status = "cancelled"
+                logger.info("%s job %s cancelled", job.type, job.id)
+            except Exception as e:
+                job.status = "failed"
+                job.error = str(e)
+                logger.error("%s job %s failed: %s", job.type, job.id, e, exc_info=True)
+            finally:
+                job.finished_at = datetime.utcnow()
+                db.session.remove()
+                if exclusive_lock:
+                    exclusive_lock.release()
+                socketio.emit("job_finished", job.to_dict())
+
+    def get_job(self, job_id: str) -> Optional[Job]:
+        return self.jobs.get(job_id)
+
+    def cancel_job(self, job_id: str) -> Optional[Job]:
+        job = self.get_job(job_id)
+        if job and not job.is_finished:
+            logger.info("Cancelling %s job %s", job.type, job.id)
+            job.cancel_event.set()
+        return job
+
+    def _prune_finished_jobs(self) -> None:
+        finished_ids = [job_id for job_id, job in self.jobs.items() if job.is_finished]
+        for job_id in finished_ids[:max(0, len(finished_ids) - MAX_FINISHED_JOBS)]:
+            del self.jobs[job_id]
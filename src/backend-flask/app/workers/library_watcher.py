@@ -0,0 +1,258 @@
+import ctypes
+import ctypes.util
+import logging
+import os
+import select
+import struct
+import sys
+import threading
+import time
+from typing import Dict, List, Optional, Set, Tuple
+
+from flask import Flask
+
+from app.extensions import db, socketio
+from app.repositories.playlist_repository import PlaylistRepository
+from app.services.library_reconciliation_service import LibraryReconciliationService
+from app.utils.library_index import AUDIO_EXTENSIONS, LibraryIndex
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+BATCH_SETTLE_TIME = 1.0  # Seconds without new events before a batch of changes is applied
+MAX_BATCH_DELAY = 5.0  # Apply a batch after this long even if events keep arriving
+
+# A change is ("created" | "deleted", path relative to the watched folder)
+Change = Tuple[str, str]
+
+
+class PollingBackend:
+    """Detects changes by rescanning the folder on an interval and diffing it against the index. Works everywhere."""
+
+    def __init__(self, index: LibraryIndex, interval: float) -> None:
+        self.index = index
+        self.interval = interval
+        self._next_scan = time.monotonic() + interval
+
+    def read_changes(self, timeout: float) -> List[Change]:
+        wait = self._next_scan - time.monotonic()
+        if wait > 0:
+            time.sleep(min(wait, timeout))
+            if time.monotonic() < self._next_scan:
+                return []
+
+        self._next_scan = time.monotonic() + self.interval
+        return diff_against_index(self.index)
+
+    def close(self) -> None:
+        pass
+
+
+class InotifyBackend:
+    """
+    Linux inotify via ctypes, so no extra dependency is needed. Every folder in the tree gets a watch, new folders are
+    watched as they appear. Files are reported once they are closed after writing, not while still being written.
+    """
+    IN_CLOSE_WRITE = 0x00000008
+    IN_MOVED_FROM = 0x00000040
+    IN_MOVED_TO = 0x00000080
+    IN_CREATE = 0x00000100
+    IN_DELETE = 0x00000200
+    IN_DELETE_SELF = 0x00000400
+    IN_Q_OVERFLOW = 0x00004000
+    IN_IGNORED = 0x00008000
+    IN_ISDIR = 0x40000000
+    IN_NONBLOCK = 0o4000
+    IN_CLOEXEC = 0o2000000
+    WATCH_MASK = IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE | IN_DELETE_SELF
+
+    EVENT_HEADER = struct.Struct("iIII")
+
+    def __init__(self, index: LibraryIndex) -> None:
+        self.index = index
+        self._libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+        self._fd = self._libc.inotify_init1(self.IN_NONBLOCK | self.IN_CLOEXEC)
+        if self._fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        self._watches: Dict[int, str] = {}  # Watch descriptor -> absolute folder path
+        self._watch_tree(index.root)
+
+    @staticmethod
+    def is_available() -> bool:
+        return sys.platform.startswith("linux") and ctypes.util.find_library("c") is not None
+
+    def read_changes(self, timeout: float) -> List[Change]:
+        readable, _, _ = select.select([self._fd], [], [], timeout)
+        if not readable:
+            return []
+
+        try:
+            data = os.read(self._fd, 64 * 1024)
+        except BlockingIOError:
+            return []
+
+        changes: List[Change] = []
+        offset = 0
+        while offset < len(data):
+            wd, mask, _cookie, name_length = self.EVENT_HEADER.unpack_from(data, offset)
+            offset += self.EVENT_HEADER.size
+            name = data[offset:offset + name_length].rstrip(b"\0").decode(errors="surrogateescape")
+            offset += name_length
+
+            if mask & self.IN_Q_OVERFLOW:
+                # Events were dropped, fall back to a full rescan
+                logger.warning("Library watcher event queue overflowed, rescanning")
+                return diff_against_index(self.index)
+            if mask & self.IN_IGNORED:
+                self._watches.pop(wd, None)
+                continue
+
+            folder = self._watches.get(wd)
+            if folder is None or not name:
+                continue
+            path = os.path.join(folder, name)
+
+            if mask & self.IN_ISDIR:
+                if mask & (self.IN_CREATE | self.IN_MOVED_TO):
+                    # Files may have landed in the new folder before its watch was added
+                    self._watch_tree(path)
+                    changes.extend(("created", self.index.relative_path(file_path)) for file_path in scan_files(path))
+                elif mask & (self.IN_DELETE | self.IN_MOVED_FROM):
+                    self._unwatch_tree(path)
+                    relative_folder = self.index.relative_path(path) + os.sep
+                    changes.extend(("deleted", indexed) for indexed in self.index.get_paths()
+                                   if indexed.startswith(relative_folder))
+            elif is_audio_file(name):
+                if mask & (self.IN_CLOSE_WRITE | self.IN_MOVED_TO):
+                    changes.append(("created", self.index.relative_path(path)))
+                elif mask & (self.IN_DELETE | self.IN_MOVED_FROM):
+                    changes.append(("deleted", self.index.relative_path(path)))
+        return changes
+
+    def _watch_tree(self, root: str) -> None:
+        for folder, _dirs, _files in os.walk(root):
+            wd = self._libc.inotify_add_watch(self._fd, os.fsencode(folder), self.WATCH_MASK)
+            if wd < 0:
+                logger.warning("Could not watch folder %s (errno %s)", folder, ctypes.get_errno())
+                continue
+            self._watches[wd] = folder
+
+    def _unwatch_tree(self, root: str) -> None:
+        """Drop the watches of a folder that moved away, so its events aren't reported under the old path."""
+        prefix = root + os.sep
+        for wd, folder in list(self._watches.items()):
+            if folder == root or folder.startswith(prefix):
+                self._libc.inotify_rm_watch(self._fd, wd)
+                del self._watches[wd]
+
+    def close(self) -> None:
+        os.close(self._fd)
+
+
+def is_audio_file(filename: str) -> bool:
+    return os.path.splitext(filename)[1].lower() in AUDIO_EXTENSIONS
+
+
+def scan_files(root: str) -> List[str]:
+    return [os.path.join(folder, filename) for folder, _dirs, filenames in os.walk(root)
+            for filename in filenames if is_audio_file(filename)]
+
+
+def diff_against_index(index: LibraryIndex) -> List[Change]:
+    """Rescan the index's folder and return how it differs from the index."""
+    current = LibraryIndex.build(index.root).get_paths()
+    indexed = index.get_paths()
+    return [("created", path) for path in current - indexed] + \
+        [("deleted", path) for path in indexed - current]
+
+
+class LibraryWatcher:
+    """
+    Optional background watcher (Config.LIBRARY_WATCHER_ENABLED) keeping the download state in sync with the
+    download folder as files are added, moved or deleted outside the app.
+
+    It keeps a live LibraryIndex, registered so download checks use it instead of stat-ing files, and batches
+    changes into bulk updates of the tracks' download locations. Playlists whose downloaded track counts change are
+    sent to the frontend with a "library_updated" WebSocket event. Uses inotify on Linux and polling elsewhere.
+    """
+
+    def __init__(self, app: Flask, root: Optional[str] = None, poll_interval: Optional[float] = None) -> None:
+        self.app = app
+        self.root = root or Config.DOWNLOAD_FOLDER
+        self.poll_interval = poll_interval or Config.LIBRARY_WATCHER_POLL_INTERVAL
+        self.index: Optional[LibraryIndex] = None
+        self.backend = None
+        self._stop_event = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        logger.info("Starting library watcher on %s", self.root)
+        self.index = LibraryIndex.build(self.root)
+        self.backend = self._create_backend()
+        LibraryIndex.set_live_index(self.index)
+
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop_event.set()
+        if self._thread:
+            self._thread.join(timeout=5)
+        LibraryIndex.set_live_index(None)
+        if self.backend:
+            self.backend.close()
+
+    def _create_backend(self):
+        if InotifyBackend.is_available():
+            try:
+                return InotifyBackend(self.index)
+            except OSError as e:
+                logger.warning("inotify unavailable, falling back to polling: %s", e)
+        return PollingBackend(self.index, self.poll_interval)
+
+    def _run(self) -> None:
+        pending: Dict[str, str] = {}  # Relative path -> latest change
+        batch_started = 0.0
+
+        while not self._stop_event.is_set():
+            try:
+                changes = self.backend.read_changes(timeout=BATCH_SETTLE_TIME)
+            except Exception as e:
+                logger.error("Library watcher failed to read changes: %s", e, exc_info=True)
+                self._stop_event.wait(self.poll_interval)
+                continue
+
+            for change, path in changes:
+                if path:
+                    pending[path] = change
+            if changes and not batch_started:
+                batch_started = time.monotonic()
+
+            settled = not changes or time.monotonic() - batch_started >= MAX_BATCH_DELAY
+            if pending and settled:
+                self._apply_batch(pending)
+                pending = {}
+                batch_started = 0.0
+
+    def _apply_batch(self, pending: Dict[str, str]) -> None:
+        created: Set[str] = {path for path, change in pending.items() if change == "created"}
+        deleted: Set[str] = {path for path, change in pending.items() if change == "deleted"}
+        for path in deleted:
+            self.index.remove(path)
+        for path in created:
+            self.index.add(path)
+        logger.info("Library watcher: %d files added, %d removed", len(created), len(deleted))
+
+        with self.app.app_context():
+            try:
+                result = LibraryReconciliationService.apply_file_changes(self.index, created, deleted)
+                counts = PlaylistRepository.get_downloaded_track_counts(result['playlist_ids'])
+                if counts:
+                    socketio.emit("library_updated", {
+                        'playlists': [{'id': playlist_id, 'downloaded_track_count': count}
+                                      for playlist_id, count in counts.items()],
+                    })
+            except Exception as e:
+                logger.error("Library watcher failed to apply changes: %s", e, exc_info=True)
+            finally:
+                db.session.remove()
@@ -0,0 +1,206 @@
+import logging
+import random
+import threading
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Set
+
+from flask import Flask
+
+from app.extensions import db, socketio
+from app.models import Playlist
+from app.repositories.playlist_repository import PlaylistRepository
+from app.services.playlist_manager_service import PlaylistManagerService
+from app.utils.db_utils import commit_with_retries
+from app.utils.time_windows import in_window, validate_window
+from app.workers.download_queue import PRIORITY_BACKGROUND
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+
+class SyncScheduler:
+    """
+    Background scheduler that syncs playlists automatically, every sync interval (minutes) set on the playlist or the
+    nearest folder above it. Due playlists are synced and queued for download at background priority, so anything
+    asked for by hand goes first.
+
+    To spread the work out rather than syncing everything at once, each sync is due its interval later plus a random
+    jitter, syncs only start inside the configured windows of the day (Config.SYNC_SCHEDULE) and at most
+    max_concurrent of the scheduler's playlists are syncing, queued or downloading at a time. Due times are stored on
+    the playlists (next_sync_at), so they carry over restarts.
+    """
+
+    def __init__(self, app: Flask, check_interval: Optional[float] = None) -> None:
+        self.app = app
+        self.check_interval = check_interval or Config.SYNC_SCHEDULER_CHECK_INTERVAL
+        self._in_flight: Set[int] = set()  # Started by the scheduler, until their download has finished
+        self._sync_threads: Dict[int, threading.Thread] = {}
+        self._lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        logger.info("Starting sync scheduler")
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop_event.set()
+        if self._thread:
+            self._thread.join(timeout=5)
+
+    def _run(self) -> None:
+        while not self._stop_event.wait(self.check_interval):
+            try:
+                self.tick()
+            except Exception as e:
+                logger.error("Sync scheduler failed to start due syncs: %s", e, exc_info=True)
+
+    @staticmethod
+    def is_open(now: Optional[datetime] = None) -> bool:
+        """Whether syncs can start at the (local) time, inside one of the windows or at any time if there are none."""
+        windows = Config.SYNC_SCHEDULE.get('windows') or []
+        now = now or datetime.now()
+        return not windows or any(in_window(window, now) for window in windows)
+
+    @staticmethod
+    def get_interval(playlist: Playlist) -> Optional[timedelta]:
+        """The playlist's sync interval, else that of the nearest folder above it with one."""
+        minutes = playlist.sync_interval
+        folder = playlist.folder
+        while not minutes and folder is not None:
+            minutes = folder.sync_interval
+            folder = folder.parent
+        return timedelta(minutes=minutes) if minutes else None
+
+    @staticmethod
+    def _jitter(interval: timedelta) -> timedelta:
+        return interval * random.uniform(0, Config.SYNC_SCHEDULE.get('jitter', 0))
+
+    def tick(self, now: Optional[datetime] = None) -> List[int]:
+        """
+        Start syncing the playlists that are due, oldest due first, as far as max_concurrent allows.
+
+        :param now: The current UTC time
+        :return: The IDs of the playlists started
+        """
+        now = now or datetime.utcnow()
+        download_manager = self.app.download_manager
+        with self.app.app_context():
+            try:
+                with self._lock:
+                    self._in_flight = {playlist_id for playlist_id in self._in_flight
+                                       if playlist_id in self._sync_threads
+                                       or download_manager.is_playlist_pending(playlist_id)}
+                    capacity = Config.SYNC_SCHEDULE.get('max_concurrent', 1) - len(self._in_flight)
+
+                due = []
+                for playlist in PlaylistRepository.get_all_active_playlists():
+                    interval = self.get_interval(playlist)
+                    if interval is None:
+                        playlist.next_sync_at = None
+                        continue
+                    max_wait = interval * (1 + Config.SYNC_SCHEDULE.get('jitter', 0))
+                    if playlist.next_sync_at is None or playlist.next_sync_at - now > max_wait:
+                        # Newly scheduled, or its interval has been shortened
+                        last_due = playlist.last_synced + interval if playlist.last_synced else now
+                        playlist.next_sync_at = max(last_due, now) + self._jitter(interval)
+                    if playlist.next_sync_at <= now and playlist.id not in self._in_flight \
+                            and not download_manager.is_playlist_pending(playlist.id):
+                        due.append((playlist, interval))
+
+                due.sort(key=lambda playlist_interval: playlist_interval[0].next_sync_at)
+                started = due[:max(capacity, 0)] if self.is_open() else []
+                for playlist, interval in started:
+                    playlist.next_sync_at = now + interval + self._jitter(interval)
+                    playlist.download_status = "queued"
+                commit_with_retries(db.session)
+                started_ids = [playlist.id for playlist, _interval in started]
+            finally:
+                db.session.remove()
+
+        for playlist_id in started_ids:
+            logger.info("Starting scheduled sync of playlist %s", playlist_id)
+            socketio.emit("download_status", {"id": playlist_id, "status": "queued"})
+            thread = threading.Thread(target=self._sync, args=(playlist_id,), daemon=True)
+            with self._lock:
+                self._in_flight.add(playlist_id)
+                self._sync_threads[playlist_id] = thread
+            thread.start()
+        return started_ids
+
+    def _sync(self, playlist_id: int) -> None:
+        with self.app.app_context():
+            try:
+                playlist = PlaylistRepository.get_playlist_by_id(playlist_id)
+                if playlist is not None:
+                    PlaylistManagerService.sync_playlists([playlist])
+                    self.app.download_manager.add_to_queue(playlist_id, quick_sync=True, priority=PRIORITY_BACKGROUND)
+            except Exception as e:
+                logger.error("Scheduled sync of playlist %s failed: %s", playlist_id, e, exc_info=True)
+                playlist = PlaylistRepository.get_playlist_by_id(playlist_id)
+                if playlist is not None:
+                    PlaylistRepository.set_download_status(playlist, 'ready')
+            finally:
+                with self._lock:
+                    self._sync_threads.pop(playlist_id, None)
+                db.session.remove()
+
+    def wait_for_syncs(self, timeout: Optional[float] = None) -> None:
+        """Wait for the syncs in progress to have queued their playlists."""
+        with self._lock:
+            threads = list(self._sync_threads.values())
+        for thread in threads:
+            thread.join(timeout)
+
+    @staticmethod
+    def set_settings(settings: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Validate and save new scheduler settings, used from the next check.
+
+        :raises ValueError: If the settings are invalid
+        """
+        settings = SyncScheduler.validate(settings)
+        Config.save_settings({'SYNC_SCHEDULE': settings})
+        logger.info("Sync schedule set to %s", settings)
+        return settings
+
+    @staticmethod
+    def validate_interval(sync_interval: Any) -> Optional[int]:
+        """
+        Validate a playlist's or folder's sync interval, in minutes, None to not set one.
+
+        :raises ValueError: If the interval isn't a whole number of at least Config.SYNC_INTERVAL_MIN minutes
+        """
+        if sync_interval is None:
+            return None
+        if not isinstance(sync_interval, int) or isinstance(sync_interval, bool) \
+                or sync_interval < Config.SYNC_INTERVAL_MIN:
+            raise ValueError(f"Sync interval must be a whole number of minutes, at least {Config.SYNC_INTERVAL_MIN}")
+        return sync_interval
+
+    @staticmethod
+    def validate(settings: Any) -> Dict[str, Any]:
+        if not isinstance(settings, dict):
+            raise ValueError("Sync schedule must be an object")
+        max_concurrent = settings.get('max_concurrent', Config.SYNC_SCHEDULE.get('max_concurrent'))
+        if not isinstance(max_concurrent, int) or isinstance(max_concurrent, bool) or max_concurrent < 1:
+            raise ValueError("max_concurrent must be a positive whole number")
+        jitter = settings.get('jitter', Config.SYNC_SCHEDULE.get('jitter'))
+        if not isinstance(jitter, (int, float)) or isinstance(jitter, bool) or not 0 <= jitter <= 1:
+            raise ValueError("jitter must be a fraction of the interval, from 0 to 1")
+        windows = [validate_window(window, f"Window {index + 1}")
+                   for index, window in enumerate(settings.get('windows') or [])]
+        return {'windows': windows, 'max_concurrent': max_concurrent, 'jitter': jitter}
+
+    def to_dict(self) -> Dict[str, Any]:
+        with self._lock:
+            in_flight = sorted(self._in_flight)
+        scheduled = Playlist.query.filter(Playlist.next_sync_at.isnot(None)).order_by(Playlist.next_sync_at).all()
+        return {
+            'settings': Config.SYNC_SCHEDULE,
+            'open': self.is_open(),
+            'in_flight': in_flight,
+            'scheduled': [{'id': playlist.id, 'name': playlist.name,
+                           'next_sync_at': playlist.next_sync_at.isoformat()} for playlist in scheduled],
+        }
@@ -0,0 +1,83 @@
+import logging
+import os
+import subprocess
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+MP3_BITRATE = '192k'
+
+
+class TranscodeError(Exception):
+    """Raised when ffmpeg fails to transcode a downloaded file."""
+
+
+class TranscodePool:
+    """
+    Transcodes downloaded audio off the download thread, so downloading the next track overlaps with encoding the
+    last ones.
+
+    Each worker runs ffmpeg as its own process, so encodes use every core without Python's GIL getting in the way,
+    while the follow up work (hashing, tagging, database updates) stays in this process with the app. The pool has
+    its own bounded queue: submitting blocks once max_pending transcodes are waiting, which slows the downloader
+    down rather than filling the disk with raw downloads.
+    """
+
+    def __init__(self, workers: Optional[int] = None, max_pending: Optional[int] = None):
+        self.workers = workers or os.cpu_count() or 1
+        self.max_pending = max_pending or self.workers * 2
+        logger.info("Initialising Transcode Pool with %s workers", self.workers)
+        self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="transcode")
+        self._slots = threading.BoundedSemaphore(self.max_pending)
+
+    def submit(self, fn: Callable, *args, **kwargs) -> Future:
+        """
+        Queue work for the pool, blocking while the queue is full.
+
+        :return: Future for the result of fn
+        """
+        self._slots.acquire()
+        try:
+            future = self._executor.submit(fn, *args, **kwargs)
+        except Exception:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda _future: self._slots.release())
+        return future
+
+    def shutdown(self, wait: bool = True) -> None:
+        logger.info("Shutting down Transcode Pool")
+        self._executor.shutdown(wait=wait)
+
+    @staticmethod
+    def transcode_to_mp3(ffmpeg_location: str, source_path: str, target_path: str) -> str:
+        """
+        Encode a downloaded file to MP3 with ffmpeg, removing the source once done. The output is written under a
+        temporary name first, so a failed encode never leaves a partial MP3 that looks downloaded.
+
+        :return: The MP3's path
+        """
+        temp_path = f"{target_path}.part"
+        command: List[str] = [
+            ffmpeg_location, '-y', '-hide_banner', '-loglevel', 'error',
+            '-i', source_path,
+            '-vn', '-codec:a', 'libmp3lame', '-b:a', MP3_BITRATE,
+            '-f', 'mp3', temp_path,
+        ]
+        logger.info("Transcoding '%s' to MP3", os.path.basename(source_path))
+        try:
+            result = subprocess.run(command, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+        except OSError as e:
+            raise TranscodeError(f"Could not run ffmpeg: {e}") from e
+
+        if result.returncode != 0:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            error = result.stderr.decode('UTF-8', errors='replace').strip()
+            raise TranscodeError(f"ffmpeg failed to transcode '{os.path.basename(source_path)}': {error}")
+
+        os.replace(temp_path, target_path)
+        os.remove(source_path)
+        return target_path
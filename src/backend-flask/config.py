@@ -1,6 +1,8 @@
 import logging
 import os
 import sys
+from datetime import timedelta
+
 import yaml
 from sqlalchemy import NullPool
 
@@ -19,7 +21,59 @@ class Config:
     DOWNLOAD_FOLDER = os.path.join(BASE_PATH, 'music_downloads')
     EXPORT_FOLDER = os.path.join(BASE_PATH, 'rekordbox_library_exports')
     EXPORT_FILENAME = 'rekordbox.xml'
+    EXPORT_MANIFEST_FILENAME = 'export_manifest.json'  # Records the last export, used for incremental exports
+    REKORDBOX_EXPORT_FILENAME = 'rekordbox_dj_playlists.xml'  # Native Rekordbox (DJ_PLAYLISTS) format export
     FFMPEG_FOLDER = os.path.join(get_base_path(), '../ffmpeg')
+    ALBUM_ART_CACHE_FOLDER = os.path.join(BASE_PATH, 'album_art_cache')
+    ALBUM_ART_CACHE_MAX_BYTES = 200 * 1024 * 1024
+
+    # How downloads are organised in DOWNLOAD_FOLDER: 'flat', 'artist_initial', 'hash_prefix' or 'playlist'
+    DOWNLOAD_LAYOUT = 'flat'
+    # 'mp3' transcodes downloads to MP3, 'native' keeps the source's audio (m4a/opus) without re-encoding
+    AUDIO_FORMAT = 'mp3'
+    TRANSCODE_WORKERS = None  # Concurrent MP3 transcodes (ffmpeg processes), defaults to the number of CPUs
+    # Disk space admission control (see DiskSpaceGuard): downloads pause while they'd leave less than
+    # MIN_FREE_DISK_SPACE free, and resume once MIN_FREE_DISK_SPACE + DISK_SPACE_RESUME_MARGIN is free again
+    MIN_FREE_DISK_SPACE = 1024 ** 3
+    DISK_SPACE_RESUME_MARGIN = 512 * 1024 ** 2
+    DISK_SPACE_CHECK_INTERVAL = 30  # Seconds between free space checks while paused
+    DISK_SPACE_SOURCE_BITRATE_KBPS = 256  # Upper estimate of downloaded audio's bitrate, for sizing downloads
+    DISK_SPACE_MP3_BITRATE_KBPS = 192  # Bitrate of transcoded MP3s
+    DEFAULT_TRACK_DURATION = 600  # Seconds assumed for tracks whose duration isn't known
+    PARTIAL_DOWNLOAD_MAX_AGE = timedelta(days=7)  # Interrupted downloads older than this are removed on startup
+    DOWNLOAD_QUEUE_AGING_INTERVAL = 600  # Seconds queued that raise a download by one priority class
+    RETAG_WORKERS = 8  # Files checked and re-tagged concurrently by the library re-tag job
+    SPOTIFY_PAGE_WORKERS = 8  # Pages of a Spotify playlist fetched concurrently, paced by the rate limiter
+
+    # Adaptive rate limits per platform, in requests per second (see AdaptiveRateLimiter). Learnt rates are saved to
+    # RATE_LIMIT_STATE_PATH and used as the starting rate next time.
+    RATE_LIMITS = {
+        'youtube': {'initial_rate': 5, 'min_rate': 0.05, 'max_rate': 20},  # Downloads and searches
+        'soundcloud': {'initial_rate': 10, 'min_rate': 0.2, 'max_rate': 20},  # API requests and downloads
+        'spotify': {'initial_rate': 10, 'min_rate': 0.5, 'max_rate': 30},
+        'default': {'initial_rate': 5, 'min_rate': 0.1, 'max_rate': 20},
+    }
+    RATE_LIMIT_STATE_PATH = os.path.join(BASE_PATH, 'rate_limits.json')
+    # Platform responses (playlist pages, API responses) are reused for this many seconds (see ResponseCache)
+    RESPONSE_CACHE_TTL = 60
+    RESPONSE_CACHE_MAX_ENTRIES = 128
+
+    # Bandwidth budget for downloads in bytes per second, None for unlimited (see BandwidthLimiter). A schedule entry
+    # replaces the limits during its time of day, e.g. {'start': '09:00', 'end': '18:00', 'days': [0, 1, 2, 3, 4],
+    # 'global': 2000000, 'platforms': {'youtube': 1000000}}. Days are 0 (Monday) to 6, all days if not given.
+    BANDWIDTH_LIMITS = {'global': None, 'platforms': {}, 'schedule': []}
+
+    # Automatic syncs of playlists given a sync interval, their own or their folder's (see SyncScheduler). Syncs only
+    # start inside the windows, if any are given ({'start': '01:00', 'end': '06:00', 'days': [...]}), at most
+    # max_concurrent at a time, and each is due its interval later plus up to jitter (a fraction of the interval).
+    SYNC_SCHEDULE = {'windows': [], 'max_concurrent': 2, 'jitter': 0.1}
+    SYNC_SCHEDULER_ENABLED = True
+    SYNC_SCHEDULER_CHECK_INTERVAL = 60  # Seconds between checks for playlists due a sync
+    SYNC_INTERVAL_MIN = 15  # Shortest sync interval (minutes) that can be set on a playlist or folder
+
+    # Library watcher, keeps track download locations in sync with changes made to the download folder outside the app
+    LIBRARY_WATCHER_ENABLED = False
+    LIBRARY_WATCHER_POLL_INTERVAL = 10  # Seconds between rescans when inotify is unavailable
 
     # Database
     SQLALCHEMY_DATABASE_URI = f"sqlite:///{os.path.join(BASE_PATH, 'database.db')}"
@@ -64,6 +118,11 @@ class Config:
     SPOTIFY_CLIENT_ID = settings.get('SPOTIFY_CLIENT_ID')
     SPOTIFY_CLIENT_SECRET = settings.get('SPOTIFY_CLIENT_SECRET')
     SOUNDCLOUD_CLIENT_ID = settings.get('SOUNDCLOUD_CLIENT_ID')
+    LIBRARY_WATCHER_ENABLED = bool(settings.get('LIBRARY_WATCHER_ENABLED', LIBRARY_WATCHER_ENABLED))
+    DOWNLOAD_LAYOUT = settings.get('DOWNLOAD_LAYOUT', DOWNLOAD_LAYOUT)
+    AUDIO_FORMAT = settings.get('AUDIO_FORMAT', AUDIO_FORMAT)
+    BANDWIDTH_LIMITS = settings.get('BANDWIDTH_LIMITS', BANDWIDTH_LIMITS)
+    SYNC_SCHEDULE = settings.get('SYNC_SCHEDULE', SYNC_SCHEDULE)
 
     @classmethod
     def load_settings(cls):
@@ -72,6 +131,23 @@ class Config:
         cls.SPOTIFY_CLIENT_ID = settings.get('SPOTIFY_CLIENT_ID')
         cls.SPOTIFY_CLIENT_SECRET = settings.get('SPOTIFY_CLIENT_SECRET')
         cls.SOUNDCLOUD_CLIENT_ID = settings.get('SOUNDCLOUD_CLIENT_ID')
+        cls.LIBRARY_WATCHER_ENABLED = bool(settings.get('LIBRARY_WATCHER_ENABLED', cls.LIBRARY_WATCHER_ENABLED))
+        cls.DOWNLOAD_LAYOUT = settings.get('DOWNLOAD_LAYOUT', cls.DOWNLOAD_LAYOUT)
+        cls.AUDIO_FORMAT = settings.get('AUDIO_FORMAT', cls.AUDIO_FORMAT)
+        cls.BANDWIDTH_LIMITS = settings.get('BANDWIDTH_LIMITS', cls.BANDWIDTH_LIMITS)
+        cls.SYNC_SCHEDULE = settings.get('SYNC_SCHEDULE', cls.SYNC_SCHEDULE)
+
+    @classmethod
+    def save_settings(cls, updates):
+        """Merge the given settings into the settings file, keeping any others, and reload them."""
+        settings = {}
+        if os.path.exists(cls.SETTINGS_PATH):
+            with open(cls.SETTINGS_PATH, 'r') as f:
+                settings = yaml.safe_load(f) or {}
+        settings.update(updates)
+        with open(cls.SETTINGS_PATH, 'w') as f:
+            yaml.safe_dump(settings, f, default_flow_style=False)
+        cls.load_settings()
 
 
 #Config.load_settings()
@@ -85,3 +161,6 @@ class TestConfig(Config):
     SPOTIFY_CLIENT_ID = 'dummy_client_id'
     SPOTIFY_CLIENT_SECRET = 'dummy_client_secret'
     SOUNDCLOUD_CLIENT_ID = "dummy_soundcloud_client_id"
+    LIBRARY_WATCHER_ENABLED = False
+    DOWNLOAD_LAYOUT = 'flat'
+    AUDIO_FORMAT = 'mp3'
@@ -7,7 +7,7 @@ from app import create_app
 from app.services.platform_services.spotify_api_service import SpotifyApiService
 from app.services.platform_services.soundcloud_service import SoundcloudService
 from app.services.platform_services.youtube_service import YouTubeService
-from config import TestConfig
+from config import Config, TestConfig
 from app.extensions import db
 from tests.mocks.mock_spotify_client import MockSpotifyClient
 from tests.mocks.mock_soundcloud_service import MockSoundcloudService
@@ -78,7 +78,7 @@ def mock_soundcloud_client(monkeypatch):
 def mock_ytdlp(monkeypatch):
     # Patch the YoutubeDL used in download services so that all calls use DummyYoutubeDL.
     monkeypatch.setattr("app.services.download_services.spotify_download_service.YoutubeDL", MockYoutubeDL)
-    monkeypatch.setattr("app.services.download_services.youtube_download_service.YoutubeDL", MockYoutubeDL)
+    monkeypatch.setattr("app.services.download_services.base_download_service.YoutubeDL", MockYoutubeDL)
 
 @pytest.fixture(autouse=True)
 def mock_youtube_service(monkeypatch, request):
@@ -94,3 +94,50 @@ def mock_youtube_service(monkeypatch, request):
     monkeypatch.setattr(YouTubeService, "get_playlist_tracks", MockYouTubeService.get_playlist_tracks)
     monkeypatch.setattr(YouTubeService, "_extract_playlist_id", MockYouTubeService._extract_playlist_id)
     yield
+
+
+@pytest.fixture(autouse=True)
+def album_art_cache_folder(tmp_path_factory, monkeypatch):
+    """Keep cached album art out of the real cache folder"""
+    folder = tmp_path_factory.mktemp("album_art_cache")
+    monkeypatch.setattr(Config, "ALBUM_ART_CACHE_FOLDER", str(folder))
+    return folder
+
+
+@pytest.fixture(autouse=True)
+def rate_limits(tmp_path_factory, monkeypatch):
+    """Don't pace requests in tests, or save learnt rates to the real state file"""
+    from app.utils.rate_limiter import AdaptiveRateLimiter
+    monkeypatch.setattr(Config, "RATE_LIMIT_STATE_PATH", str(tmp_path_factory.mktemp("rate_limits") / "rate_limits.json"))
+    monkeypatch.setattr(Config, "RATE_LIMITS", {
+        platform: {'initial_rate': 1000, 'min_rate': 0.1, 'max_rate': 1000}
+        for platform in ('youtube', 'soundcloud', 'spotify', 'default')})
+    AdaptiveRateLimiter.reset()
+    yield
+    AdaptiveRateLimiter.reset()
+
+
+@pytest.fixture(autouse=True)
+def disk_space(monkeypatch):
+    """Don't refuse downloads in tests because of the machine's free disk space"""
+    monkeypatch.setattr(Config, "MIN_FREE_DISK_SPACE", 0)
+    monkeypatch.setattr(Config, "DISK_SPACE_RESUME_MARGIN", 0)
+
+
+@pytest.fixture(autouse=True)
+def bandwidth_limits(monkeypatch):
+    """Start every test with unlimited bandwidth"""
+    from app.utils.bandwidth_limiter import BandwidthLimiter
+    monkeypatch.setattr(Config, "BANDWIDTH_LIMITS", {'global': None, 'platforms': {}, 'schedule': []})
+    BandwidthLimiter.reset()
+    yield
+    BandwidthLimiter.reset()
+
+
+@pytest.fixture(autouse=True)
+def response_cache():
+    """Don't share cached platform responses between tests"""
+    from app.utils.response_cache import ResponseCache
+    ResponseCache.clear()
+    yield
+    ResponseCache.clear()
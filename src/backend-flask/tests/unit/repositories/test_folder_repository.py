@@ -0,0 +1,85 @@
+import pytest
+from sqlalchemy import event
+
+from app.extensions import db
+from app.models import Folder, Playlist, PlaylistTrack, Track
+from app.repositories.folder_repository import FolderRepository
+
+
+@pytest.mark.usefixtures("init_database")
+class TestFolderRepository:
+    """
+    Tests for the FolderRepository class.
+
+    Tests Include:
+    - Loading the folder tree in custom order
+    - Playlists in custom order across nested folders
+    - Tree loading uses a fixed number of queries regardless of folder depth
+    """
+
+    @staticmethod
+    def _create_nested_folders(depth):
+        """ Creates a chain of nested folders, each holding one playlist, plus a root level playlist. """
+        parent_id = None
+        for level in range(depth):
+            folder = Folder(name=f"Folder {level}", parent_id=parent_id, custom_order=1, disabled=False)
+            db.session.add(folder)
+            db.session.flush()
+            db.session.add(Playlist(name=f"Playlist {level}", platform="spotify", external_id=f"pl_{level}",
+                                    folder_id=folder.id, custom_order=0, disabled=False))
+            parent_id = folder.id
+
+        db.session.add(Playlist(name="Root Playlist", platform="spotify", external_id="root",
+                                custom_order=0, disabled=False))
+        db.session.commit()
+
+    def test_load_folder_tree_orders_children(self):
+        self._create_nested_folders(depth=2)
+
+        tree = FolderRepository.load_folder_tree()
+
+        root_children = [(item_type, item.name) for item_type, item in tree.get_children()]
+        assert root_children == [('playlist', "Root Playlist"), ('folder', "Folder 0")]
+
+        folder_0 = Folder.query.filter_by(name="Folder 0").first()
+        folder_0_children = [(item_type, item.name) for item_type, item in tree.get_children(folder_0.id)]
+        assert folder_0_children == [('playlist', "Playlist 0"), ('folder', "Folder 1")]
+
+    def test_get_playlists_in_custom_order(self):
+        self._create_nested_folders(depth=3)
+        Playlist.query.filter_by(name="Playlist 1").first().disabled = True
+        db.session.commit()
+
+        all_names = [p.name for p in FolderRepository.get_playlists_in_custom_order(enabled_only=False)]
+        assert all_names == ["Root Playlist", "Playlist 0", "Playlist 1", "Playlist 2"]
+
+        enabled_names = [p.name for p in FolderRepository.get_playlists_in_custom_order()]
+        assert enabled_names == ["Root Playlist", "Playlist 0", "Playlist 2"]
+
+    def test_load_folder_tree_query_count_is_independent_of_depth(self):
+        self._create_nested_folders(depth=6)
+        track = Track(platform_id="t1", platform="spotify", name="Track", artist="Artist")
+        db.session.add(track)
+        db.session.flush()
+        for playlist in Playlist.query.all():
+            db.session.add(PlaylistTrack(playlist_id=playlist.id, track_id=track.id, track_order=0))
+        db.session.commit()
+        db.session.expire_all()
+
+        statements = []
+
+        def count_statement(conn, cursor, statement, parameters, context, executemany):
+            statements.append(statement)
+
+        event.listen(db.engine, "before_cursor_execute", count_statement)
+        try:
+            tree = FolderRepository.load_folder_tree(with_tracks=True)
+            playlists = list(tree.iter_playlists())
+            track_names = [pt.track.name for playlist in playlists for pt in playlist.tracks]
+        finally:
+            event.remove(db.engine, "before_cursor_execute", count_statement)
+
+        assert len(playlists) == 7
+        assert track_names == ["Track"] * 7
+        # Folders, playlists, playlist tracks, tracks
+        assert len(statements) == 4
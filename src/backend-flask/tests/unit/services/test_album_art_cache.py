@@ -0,0 +1,69 @@
+import os
+
+from mutagen.id3 import ID3
+
+from app.utils.album_art_cache import AlbumArtCache
+from app.utils.file_download_utils import FileDownloadUtils
+from config import Config
+
+
+class TestAlbumArtCache:
+    """
+    Tests for the AlbumArtCache and its use when embedding cover art.
+
+    Tests Include:
+    - Art shared by several tracks is only fetched once
+    - Failed fetches aren't cached
+    - The least recently used art is evicted once the cache is full
+    - Cover art already embedded from the same URL isn't fetched again
+    """
+
+    def test_art_is_fetched_once(self):
+        fetched = []
+
+        def fetch(url):
+            fetched.append(url)
+            return b"jpeg for " + url.encode()
+
+        first = AlbumArtCache.get_or_fetch("http://art/album", fetch)
+        second = AlbumArtCache.get_or_fetch("http://art/album", fetch)
+
+        assert first == second == b"jpeg for http://art/album"
+        assert fetched == ["http://art/album"]
+
+    def test_failed_fetch_is_not_cached(self):
+        assert AlbumArtCache.get_or_fetch("http://art/missing", lambda url: None) is None
+        assert AlbumArtCache.get("http://art/missing") is None
+
+    def test_least_recently_used_art_is_evicted(self, monkeypatch, album_art_cache_folder):
+        monkeypatch.setattr(Config, "ALBUM_ART_CACHE_MAX_BYTES", 250)
+        AlbumArtCache.put("http://art/a", b"a" * 100)
+        AlbumArtCache.put("http://art/b", b"b" * 100)
+        # Make "a" the most recently used, regardless of the filesystem's timestamp resolution
+        os.utime(AlbumArtCache._get_path("http://art/b"), (1, 1))
+        os.utime(AlbumArtCache._get_path("http://art/a"), (2, 2))
+
+        AlbumArtCache.put("http://art/c", b"c" * 100)
+
+        assert AlbumArtCache.get("http://art/a") == b"a" * 100
+        assert AlbumArtCache.get("http://art/b") is None
+        assert AlbumArtCache.get("http://art/c") == b"c" * 100
+        assert len(os.listdir(album_art_cache_folder)) == 2
+
+    def test_embedded_cover_is_not_fetched_again(self, monkeypatch):
+        fetched = []
+        monkeypatch.setattr(FileDownloadUtils, "_fetch_cover_image",
+                            staticmethod(lambda url: fetched.append(url) or b"jpeg"))
+        audio = ID3()
+
+        FileDownloadUtils._set_track_cover(audio, "http://art/album")
+        AlbumArtCache.clear()
+        FileDownloadUtils._set_track_cover(audio, "http://art/album")
+
+        assert fetched == ["http://art/album"]
+        assert audio.getall('APIC')[0].data == b"jpeg"
+
+        FileDownloadUtils._set_track_cover(audio, "http://art/new-album")
+
+        assert fetched == ["http://art/album", "http://art/new-album"]
+        assert len(audio.getall('APIC')) == 1
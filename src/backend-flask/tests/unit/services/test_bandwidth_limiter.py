@@ -0,0 +1,105 @@
+import json
+import os
+import subprocess
+import sys
+from datetime import datetime
+
+import pytest
+
+from app.utils import bandwidth_limiter
+from app.utils.bandwidth_limiter import BandwidthLimiter, TokenBucket
+from config import Config
+
+WORKDAY_SCHEDULE = {
+    'global': None,
+    'platforms': {},
+    'schedule': [
+        {'start': '09:00', 'end': '18:00', 'days': [0, 1, 2, 3, 4], 'global': 2000, 'platforms': {'youtube': 1000}},
+        {'start': '22:00', 'end': '02:00', 'days': [4], 'global': 5000, 'platforms': {}},
+    ],
+}
+
+
+class TestBandwidthLimiter:
+    """
+    Tests for the BandwidthLimiter and TokenBucket classes.
+
+    Tests Include:
+    - Buckets allow a burst then make downloads wait to pay back their debt
+    - Schedule windows replace the limits at their times of day, including windows past midnight
+    - Downloads' progress hooks share the global and platform budgets
+    - Limits are validated, saved and applied through the API
+    """
+
+    @pytest.fixture
+    def sleeps(self, monkeypatch):
+        sleeps = []
+        monkeypatch.setattr(bandwidth_limiter.time, "sleep", lambda seconds: sleeps.append(seconds))
+        return sleeps
+
+    def test_token_bucket_debt(self):
+        bucket = TokenBucket(rate=1000)
+        assert bucket.consume(500) == 0  # Starts with a second's worth of burst
+
+        assert bucket.consume(2000) == pytest.approx(1.5, abs=0.05)
+        assert TokenBucket().consume(10 ** 9) == 0
+
+    def test_schedule_windows(self, monkeypatch):
+        monkeypatch.setattr(Config, "BANDWIDTH_LIMITS", WORKDAY_SCHEDULE)
+
+        monday_noon = BandwidthLimiter.get_limits(datetime(2024, 1, 1, 12, 0))
+        assert monday_noon == {'global': 2000, 'platforms': {'youtube': 1000}, 'schedule': 0}
+        assert BandwidthLimiter.get_limits(datetime(2024, 1, 6, 12, 0))['global'] is None  # Saturday
+        assert BandwidthLimiter.get_limits(datetime(2024, 1, 1, 18, 0))['global'] is None
+        # Friday night's window carries on into Saturday morning
+        assert BandwidthLimiter.get_limits(datetime(2024, 1, 6, 1, 0))['global'] == 5000
+        assert BandwidthLimiter.get_limits(datetime(2024, 1, 5, 1, 0))['global'] is None
+
+    def test_progress_hooks_share_budget(self, monkeypatch, sleeps):
+        monkeypatch.setattr(Config, "BANDWIDTH_LIMITS", {'global': 1000, 'platforms': {'soundcloud': 500}})
+        youtube_hook = BandwidthLimiter.progress_hook('youtube')
+        soundcloud_hook = BandwidthLimiter.progress_hook('soundcloud')
+
+        youtube_hook({'status': 'downloading', 'tmpfilename': 'a.part', 'downloaded_bytes': 0})
+        youtube_hook({'status': 'downloading', 'tmpfilename': 'a.part', 'downloaded_bytes': 1000})
+        soundcloud_hook({'status': 'downloading', 'tmpfilename': 'b.part', 'downloaded_bytes': 0})
+        soundcloud_hook({'status': 'downloading', 'tmpfilename': 'b.part', 'downloaded_bytes': 1000})
+
+        # The first download used the burst, the second pays for both against the global limit
+        assert len(sleeps) == 1 and sleeps[0] == pytest.approx(1.0, abs=0.05)
+        assert BandwidthLimiter.get_ratelimit('soundcloud') == 500
+        assert BandwidthLimiter.get_ratelimit('youtube') == 1000
+
+    def test_set_limits_route(self, client, tmp_path, monkeypatch):
+        monkeypatch.setattr(Config, "SETTINGS_PATH", str(tmp_path / "settings.yml"))
+        # Saving reloads every setting from the file, put the test ones back afterwards
+        for key in ("SPOTIFY_CLIENT_ID", "SPOTIFY_CLIENT_SECRET", "SOUNDCLOUD_CLIENT_ID", "BANDWIDTH_LIMITS"):
+            monkeypatch.setattr(Config, key, getattr(Config, key))
+
+        response = client.put('/api/bandwidth', json={'global': 100000, 'platforms': {'youtube': 50000}})
+
+        assert response.status_code == 200
+        assert response.get_json()['effective'] == {'global': 100000, 'platforms': {'youtube': 50000},
+                                                     'schedule': None}
+        assert Config.BANDWIDTH_LIMITS['global'] == 100000
+        assert client.get('/api/bandwidth').get_json()['limits']['platforms'] == {'youtube': 50000}
+
+        response = client.put('/api/bandwidth', json={'schedule': [{'start': '9am', 'end': '18:00'}]})
+        assert response.status_code == 400
+
+    def test_limits_are_loaded_on_startup(self, client, tmp_path, monkeypatch):
+        monkeypatch.setattr(Config, "SETTINGS_PATH", str(tmp_path / "settings.yml"))
+        for key in ("SPOTIFY_CLIENT_ID", "SPOTIFY_CLIENT_SECRET", "SOUNDCLOUD_CLIENT_ID", "BANDWIDTH_LIMITS"):
+            monkeypatch.setattr(Config, key, getattr(Config, key))
+        assert client.put('/api/bandwidth', json={'global': 100000}).status_code == 200
+
+        # A new process reads the settings file two folders above its working directory
+        working_directory = tmp_path / "app" / "backend"
+        working_directory.mkdir(parents=True)
+        backend_folder = os.path.dirname(os.path.abspath(sys.modules[Config.__module__].__file__))
+        script = "import json; from config import Config; print(json.dumps(Config.BANDWIDTH_LIMITS))"
+        output = subprocess.run(
+            [sys.executable, "-c", script],
+            cwd=working_directory, env={**os.environ, 'PYTHONPATH': backend_folder}, capture_output=True, check=True)
+
+        assert json.loads(output.stdout)['global'] == 100000
@@ -0,0 +1,91 @@
+import os
+
+import pytest
+
+from app.extensions import db
+from app.models import Playlist, PlaylistTrack, Track
+from app.services.download_services import download_layout_service
+from app.services.download_services.download_layout_service import DownloadLayoutService
+from config import Config
+
+
+@pytest.mark.usefixtures("init_database")
+class TestDownloadLayoutService:
+    """
+    Tests for the DownloadLayoutService class.
+
+    Tests Include:
+    - Subfolders for each layout
+    - Relayout moves files (including files shared by tracks) and updates their relative locations
+    - Relayout resumes after the last completed batch
+    """
+
+    @pytest.fixture(autouse=True)
+    def download_folder(self, tmp_path, monkeypatch):
+        monkeypatch.setattr(Config, "DOWNLOAD_FOLDER", str(tmp_path))
+        return tmp_path
+
+    @staticmethod
+    def _add_downloaded_track(download_folder, platform_id, artist, filename):
+        (download_folder / filename).write_bytes(b"audio")
+        track = Track(platform_id=platform_id, platform="spotify", name=platform_id, artist=artist,
+                      download_location=filename)
+        db.session.add(track)
+        db.session.commit()
+        return track
+
+    def test_get_subfolder(self, download_folder):
+        track = self._add_downloaded_track(download_folder, "1", "radiohead", "Creep.mp3")
+        playlist = Playlist(name="Chill/Vibes", platform="spotify", external_id="pl")
+        db.session.add(playlist)
+        db.session.flush()
+        db.session.add(PlaylistTrack(playlist_id=playlist.id, track_id=track.id, track_order=0))
+        db.session.commit()
+
+        assert DownloadLayoutService.get_subfolder(track, "Creep", "flat") == ""
+        assert DownloadLayoutService.get_subfolder(track, "Creep", "artist_initial") == "R"
+        assert len(DownloadLayoutService.get_subfolder(track, "Creep", "hash_prefix")) == 2
+        assert DownloadLayoutService.get_subfolder(track, "Creep", "playlist") == "ChillVibes"
+
+        track.artist = "2Pac"
+        assert DownloadLayoutService.get_subfolder(track, "Creep", "artist_initial") == "#"
+
+    def test_relayout_moves_files(self, download_folder):
+        first = self._add_downloaded_track(download_folder, "1", "Alpha", "a.mp3")
+        shared = Track(platform_id="2", platform="youtube", name="2", artist="Beta", download_location="a.mp3")
+        db.session.add(shared)
+        db.session.commit()
+
+        report = DownloadLayoutService.relayout("artist_initial")
+
+        assert report['moved'] == 1
+        assert (download_folder / "A" / "a.mp3").exists()
+        assert not (download_folder / "a.mp3").exists()
+        db.session.expire_all()
+        assert db.session.get(Track, first.id).download_location == os.path.join("A", "a.mp3")
+        assert db.session.get(Track, shared.id).download_location == os.path.join("A", "a.mp3")
+
+        # Back to flat, and the now empty artist folder is removed
+        DownloadLayoutService.relayout("flat")
+        assert sorted(os.listdir(download_folder)) == ["a.mp3"]
+
+    def test_relayout_resumes_after_last_batch(self, download_folder, monkeypatch):
+        tracks = [self._add_downloaded_track(download_folder, str(i), "Artist", f"{i}.mp3") for i in range(3)]
+
+        def stop_after_first_batch(processed, total):
+            raise KeyboardInterrupt
+
+        with pytest.raises(KeyboardInterrupt):
+            DownloadLayoutService.relayout("artist_initial", batch_size=2, progress_callback=stop_after_first_batch)
+        assert sorted(os.listdir(download_folder / "A")) == ["0.mp3", "1.mp3"]
+
+        moved_tracks = []
+        original_relayout_track = DownloadLayoutService._relayout_track
+        monkeypatch.setattr(DownloadLayoutService, "_relayout_track", staticmethod(
+            lambda track, layout, moved_paths: moved_tracks.append(track.id) or
+            original_relayout_track(track, layout, moved_paths)))
+
+        report = DownloadLayoutService.relayout("artist_initial", batch_size=2)
+        assert moved_tracks == [tracks[2].id]
+        assert report['moved'] == 1
+        assert not os.path.exists(os.path.join(download_folder, download_layout_service.RELAYOUT_STATE_FILENAME))
@@ -0,0 +1,100 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from app.extensions import db
+from app.models import Playlist, PlaylistTrack, Track
+from app.services.download_services.download_retry_service import DownloadRetryService
+from app.services.download_services.youtube_download_service import YouTubeDownloadService
+
+
+@pytest.mark.usefixtures("init_database")
+class TestDownloadRetryService:
+    """
+    Tests for the DownloadRetryService class and its use when downloading.
+
+    Tests Include:
+    - Download errors are classified by cause
+    - Failures back off exponentially and are recorded in the track's history
+    - Removed tracks are dead-lettered straight away, and skipped by syncs
+    - Dead-lettered tracks can be retried manually
+    """
+
+    @staticmethod
+    def _add_track(platform_id="1", name="Track"):
+        track = Track(platform_id=platform_id, platform="youtube", name=name, artist="Artist",
+                      download_url=f"http://video/{platform_id}")
+        db.session.add(track)
+        db.session.commit()
+        return track
+
+    @pytest.mark.parametrize("message, category", [
+        ("ERROR: [youtube] abc: Video unavailable. This video has been removed by the uploader", 'removed'),
+        ("ERROR: [youtube] abc: This video is no longer available due to a copyright claim by Label", 'removed'),
+        ("ERROR: [soundcloud] track: Unable to download JSON metadata: HTTP Error 404: Not Found", 'removed'),
+        ("ERROR: unable to download video data: HTTP Error 404: Not Found", 'transient'),
+        ("ERROR: fragment 3 not found, unable to continue (HTTP Error 404)", 'transient'),
+        ("ERROR: [youtube] abc: Copyright Mix 2024 - Connection reset by peer", 'transient'),
+        ("ERROR: [youtube] abc: The uploader has not made this video available in your country", 'geo_blocked'),
+        ("ERROR: unable to download video data: HTTP Error 429: Too Many Requests", 'rate_limited'),
+        ("ERROR: [youtube] abc: Sign in to confirm you're not a bot", 'rate_limited'),
+        ("ERROR: unable to download video data: <urlopen error [Errno 110] Connection timed out>", 'transient'),
+    ])
+    def test_classify_error(self, message, category):
+        assert DownloadRetryService.classify_error(Exception(message)) == category
+
+    def test_failures_back_off_exponentially(self):
+        track = self._add_track()
+        now = datetime(2024, 1, 1, 12, 0)
+
+        DownloadRetryService.record_failure(track, Exception("Connection reset by peer"), now)
+        assert track.next_retry_at == now + timedelta(minutes=5)
+        DownloadRetryService.record_failure(track, Exception("Connection reset by peer"), now)
+        assert track.next_retry_at == now + timedelta(minutes=10)
+        db.session.commit()
+
+        assert track.download_attempts == 2
+        assert not DownloadRetryService.is_due(track, now + timedelta(minutes=9))
+        assert DownloadRetryService.is_due(track, now + timedelta(minutes=10))
+        assert [attempt.error_category for attempt in DownloadRetryService.get_attempts(track.id)] == \
+            ['transient', 'transient']
+
+    def test_removed_track_is_dead_lettered_and_skipped(self, monkeypatch):
+        removed = self._add_track("1", "Removed")
+        available = self._add_track("2", "Available")
+        playlist = Playlist(name="Playlist", platform="youtube", external_id="p1")
+        playlist.tracks = [PlaylistTrack(track=removed, track_order=0), PlaylistTrack(track=available, track_order=1)]
+        db.session.add(playlist)
+        db.session.commit()
+
+        attempted = []
+
+        def download_track_with_ytdlp(track):
+            attempted.append(track.name)
+            if track.name == "Removed":
+                raise Exception("ERROR: [youtube] abc: Video unavailable")
+
+        monkeypatch.setattr(YouTubeDownloadService, "download_track_with_ytdlp", staticmethod(download_track_with_ytdlp))
+
+        YouTubeDownloadService.download_playlist(playlist, False, {})
+        assert removed.dead_lettered and removed.error_category == 'removed'
+        assert not available.dead_lettered
+
+        attempted.clear()
+        YouTubeDownloadService.download_playlist(playlist, False, {})
+        assert attempted == ["Available"]
+        assert DownloadRetryService.get_dead_lettered_tracks() == [removed]
+
+    def test_dead_lettered_tracks_can_be_retried(self, client):
+        track = self._add_track()
+        DownloadRetryService.record_failure(track, Exception("Video unavailable"))
+        db.session.commit()
+
+        response = client.post('/api/tracks/dead-letter/retry', json={})
+
+        assert response.status_code == 200
+        assert response.get_json() == {'reset': 1}
+        db.session.refresh(track)
+        assert not track.dead_lettered and track.download_attempts == 0
+        assert DownloadRetryService.is_due(track)
+        assert len(client.get(f'/api/tracks/{track.id}/download-attempts').get_json()) == 1
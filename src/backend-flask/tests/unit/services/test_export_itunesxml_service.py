@@ -0,0 +1,165 @@
+import os
+import xml.etree.ElementTree as ET
+
+import pytest
+
+from app.extensions import db
+from app.models import Folder, Playlist, Track, PlaylistTrack
+from app.services.export_services import export_itunesxml_service
+from app.services.export_services.export_itunesxml_service import ExportItunesXMLService
+
+
+class FakeMP3(dict):
+    """ Stands in for mutagen's File so exports can be tested without real audio files. """
+    reads = []
+
+    def __init__(self, file_location, easy=False):
+        super().__init__()
+        FakeMP3.reads.append(file_location)
+        self['title'] = [os.path.basename(file_location)]
+        self['artist'] = ["Artist"]
+
+
+def _parse_plist(export_path):
+    """ Returns the Tracks dict and Playlists array elements of an exported plist. """
+    with open(export_path, encoding="UTF-8") as f:
+        content = "\n".join(line for line in f.read().splitlines() if not line.startswith("<!DOCTYPE"))
+    main_dict = ET.fromstring(content.encode("UTF-8")).find('dict')
+    children = list(main_dict)
+    tracks_dict = children[children.index(next(c for c in children if c.text == "Tracks")) + 1]
+    playlists_array = children[children.index(next(c for c in children if c.text == "Playlists")) + 1]
+    return tracks_dict, playlists_array
+
+
+def _playlist_track_ids(playlists_array, playlist_name):
+    for playlist_dict in playlists_array:
+        children = list(playlist_dict)
+        name = children[children.index(next(c for c in children if c.text == "Name")) + 1].text
+        if name == playlist_name:
+            items = children[children.index(next(c for c in children if c.text == "Playlist Items")) + 1]
+            return [int(item.find('integer').text) for item in items]
+    return None
+
+
+@pytest.mark.usefixtures("init_database")
+class TestExportItunesXMLService:
+    """
+    Tests for the ExportItunesXMLService class.
+
+    Tests Include:
+    - Tracks shared between playlists are only exported (and read) once
+    - Track persistent IDs are stable between exports
+    - Unchanged libraries are not rewritten and changes are reported
+    - Reordering folders or playlists alone counts as a change
+    """
+
+    @pytest.fixture(autouse=True)
+    def fake_mp3(self, monkeypatch):
+        FakeMP3.reads = []
+        monkeypatch.setattr(export_itunesxml_service, "MutagenFile", FakeMP3)
+
+    @staticmethod
+    def _create_library():
+        tracks = [
+            Track(platform_id=f"track_{i}", platform="spotify", name=f"Track {i}", artist="Artist",
+                  download_location=f"Track {i}.mp3")
+            for i in range(3)
+        ]
+        playlists = [
+            Playlist(name=f"Playlist {i}", platform="spotify", external_id=f"pl_{i}", custom_order=i, disabled=False)
+            for i in range(2)
+        ]
+        db.session.add_all(tracks + playlists)
+        db.session.commit()
+
+        # Track 1 is in both playlists
+        memberships = [(playlists[0], tracks[0]), (playlists[0], tracks[1]),
+                       (playlists[1], tracks[1]), (playlists[1], tracks[2])]
+        for order, (playlist, track) in enumerate(memberships):
+            db.session.add(PlaylistTrack(playlist_id=playlist.id, track_id=track.id, track_order=order))
+        db.session.commit()
+        return tracks
+
+    def test_shared_tracks_are_exported_once(self, tmp_path):
+        tracks = self._create_library()
+
+        export_path = ExportItunesXMLService.generate_rekordbox_xml_from_db(str(tmp_path), "library.xml")
+
+        tracks_dict, playlists_array = _parse_plist(export_path)
+        track_keys = [int(el.text) for el in tracks_dict if el.tag == 'key']
+        assert sorted(track_keys) == sorted(track.id for track in tracks)
+        assert len(FakeMP3.reads) == 3
+
+        assert _playlist_track_ids(playlists_array, "Playlist 0") == [tracks[0].id, tracks[1].id]
+        assert _playlist_track_ids(playlists_array, "Playlist 1") == [tracks[1].id, tracks[2].id]
+
+    def test_persistent_ids_are_stable_between_exports(self, tmp_path):
+        self._create_library()
+
+        first_export = ExportItunesXMLService.generate_rekordbox_xml_from_db(str(tmp_path), "first.xml")
+        second_export = ExportItunesXMLService.generate_rekordbox_xml_from_db(str(tmp_path), "second.xml")
+
+        def persistent_ids(export_path):
+            tracks_dict, _ = _parse_plist(export_path)
+            ids = []
+            for track_dict in tracks_dict.findall('dict'):
+                children = list(track_dict)
+                key = next(c for c in children if c.text == "Persistent ID")
+                ids.append(children[children.index(key) + 1].text)
+            return ids
+
+        assert persistent_ids(first_export) == persistent_ids(second_export)
+        assert all(len(pid) == 16 for pid in persistent_ids(first_export))
+
+    def test_unchanged_library_is_not_rewritten(self, tmp_path):
+        tracks = self._create_library()
+        for track in tracks:
+            (tmp_path / track.download_location).write_bytes(b"audio")
+            track.download_location = str(tmp_path / track.download_location)
+        db.session.commit()
+
+        _, first_report = ExportItunesXMLService.generate_rekordbox_xml_with_report(str(tmp_path), "library.xml")
+        assert first_report['written'] is True
+        assert first_report['playlists_added'] == ["Playlist 0", "Playlist 1"]
+        assert first_report['tracks_read'] == 3
+
+        _, second_report = ExportItunesXMLService.generate_rekordbox_xml_with_report(str(tmp_path), "library.xml")
+        assert second_report['written'] is False
+        assert second_report['has_changes'] is False
+        assert second_report['tracks_read'] == 0
+
+    def test_changed_playlist_is_reported(self, tmp_path):
+        tracks = self._create_library()
+        for track in tracks:
+            (tmp_path / track.download_location).write_bytes(b"audio")
+            track.download_location = str(tmp_path / track.download_location)
+        db.session.commit()
+        ExportItunesXMLService.generate_rekordbox_xml_with_report(str(tmp_path), "library.xml")
+
+        playlist = Playlist.query.filter_by(name="Playlist 0").first()
+        PlaylistTrack.query.filter_by(playlist_id=playlist.id, track_id=tracks[0].id).delete()
+        db.session.commit()
+
+        _, report = ExportItunesXMLService.generate_rekordbox_xml_with_report(str(tmp_path), "library.xml")
+        assert report['written'] is True
+        assert report['playlists_changed'] == ["Playlist 0"]
+        assert report['playlists_unchanged'] == 1
+        assert report['tracks_removed'] == 1
+        assert report['tracks_read'] == 0
+
+    def test_reordering_is_a_change(self, tmp_path):
+        self._create_library()
+        folders = [Folder(name=f"Folder {i}", custom_order=2 + i, disabled=False) for i in range(2)]
+        db.session.add_all(folders)
+        db.session.commit()
+        ExportItunesXMLService.generate_rekordbox_xml_with_report(str(tmp_path), "library.xml")
+
+        folders[0].custom_order, folders[1].custom_order = folders[1].custom_order, folders[0].custom_order
+        db.session.commit()
+
+        export_path, report = ExportItunesXMLService.generate_rekordbox_xml_with_report(str(tmp_path), "library.xml")
+        assert report['has_changes'] is True and report['written'] is True
+        _, playlists_array = _parse_plist(export_path)
+        names = [child.text for playlist in playlists_array.findall('dict') for child in playlist
+                 if child.tag == 'string' and child.text.startswith("Folder ")]
+        assert names == ["Folder 1", "Folder 0"]
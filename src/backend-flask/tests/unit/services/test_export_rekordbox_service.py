@@ -0,0 +1,81 @@
+import xml.etree.ElementTree as ET
+
+import pytest
+
+from app.extensions import db
+from app.models import Folder, Playlist, Track, PlaylistTrack
+from app.services.export_services.export_rekorbox_service import RekordboxExportService
+
+
+@pytest.mark.usefixtures("init_database")
+class TestRekordboxExportService:
+    """
+    Tests for the RekordboxExportService class (native DJ_PLAYLISTS export).
+
+    Tests Include:
+    - Collection contains each downloaded track once
+    - Folder hierarchy and custom order are kept in the playlist nodes
+    - Track locations are formatted as Rekordbox file URIs
+    """
+
+    @staticmethod
+    def _create_library():
+        tracks = [
+            Track(platform_id=f"track_{i}", platform="spotify", name=f"Track & {i}", artist="Artist",
+                  download_location=f"/music/Track {i}.mp3")
+            for i in range(3)
+        ]
+        tracks.append(Track(platform_id="not_downloaded", platform="spotify", name="Missing", artist="Artist"))
+        folder = Folder(name="Folder", custom_order=1, disabled=False)
+        db.session.add_all(tracks + [folder])
+        db.session.flush()
+
+        playlists = [
+            Playlist(name="Root Playlist", platform="spotify", external_id="pl_0", custom_order=0, disabled=False),
+            Playlist(name="Nested Playlist", platform="spotify", external_id="pl_1", custom_order=0,
+                     folder_id=folder.id, disabled=False),
+            Playlist(name="Disabled Playlist", platform="spotify", external_id="pl_2", custom_order=1,
+                     folder_id=folder.id, disabled=True),
+        ]
+        db.session.add_all(playlists)
+        db.session.flush()
+
+        memberships = [(playlists[0], tracks[0]), (playlists[0], tracks[1]), (playlists[0], tracks[3]),
+                       (playlists[1], tracks[1]), (playlists[1], tracks[2]), (playlists[2], tracks[2])]
+        for order, (playlist, track) in enumerate(memberships):
+            db.session.add(PlaylistTrack(playlist_id=playlist.id, track_id=track.id, track_order=order))
+        db.session.commit()
+        return tracks
+
+    def test_export_collection_and_playlists(self, tmp_path):
+        tracks = self._create_library()
+        progress = []
+
+        export_path, summary = RekordboxExportService.generate_rekordbox_xml_from_db(
+            str(tmp_path), "rekordbox.xml", progress_callback=lambda **kwargs: progress.append(kwargs))
+
+        root = ET.parse(export_path).getroot()
+        collection = root.find('COLLECTION')
+        assert collection.get('Entries') == "3"
+        assert [t.get('TrackID') for t in collection] == [str(tracks[i].id) for i in range(3)]
+        assert collection[0].get('Name') == "Track & 0"
+        assert collection[0].get('Location') == "file://localhost/music/Track%200.mp3"
+
+        root_node = root.find('PLAYLISTS/NODE')
+        assert root_node.get('Count') == "2"
+        root_playlist, folder_node = list(root_node)
+        assert root_playlist.get('Name') == "Root Playlist"
+        assert [t.get('Key') for t in root_playlist] == [str(tracks[0].id), str(tracks[1].id)]
+
+        assert folder_node.get('Type') == "0"
+        assert folder_node.get('Count') == "1"
+        nested_playlist = folder_node[0]
+        assert nested_playlist.get('Name') == "Nested Playlist"
+        assert nested_playlist.get('Entries') == "2"
+
+        assert summary == {'playlists': 2, 'tracks': 3}
+        assert progress[-1] == {'playlists_processed': 2, 'playlists_total': 2, 'tracks_processed': 3}
+
+    def test_windows_track_location(self):
+        location = RekordboxExportService.get_track_location("C:\\Music\\My Track.mp3")
+        assert location == "file://localhost/C:/Music/My%20Track.mp3"
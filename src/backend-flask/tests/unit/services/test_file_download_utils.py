@@ -0,0 +1,60 @@
+import pytest
+from mutagen.id3 import ID3
+
+from app.models import Track
+from app.services.download_services.track_storage_service import TrackStorageService
+from app.utils.file_download_utils import FileDownloadUtils, PLATFORM_ID_DESC
+
+
+class TestEmbedTrackMetadata:
+    """
+    Tests for embedding track metadata in MP3 files.
+
+    Tests Include:
+    - All frames, including source URL and platform id, are written in one save
+    - Re-tagging fits in the reserved padding, leaving the file size and audio untouched
+    """
+
+    @pytest.fixture
+    def mp3_file(self, tmp_path, monkeypatch):
+        monkeypatch.setattr(FileDownloadUtils, "_fetch_cover_image", staticmethod(lambda url: b"jpeg"))
+        file_path = tmp_path / "Track.mp3"
+        file_path.write_bytes(b"\xff\xfb" + b"audio frames" * 1000)
+        return str(file_path)
+
+    @staticmethod
+    def _track(**kwargs):
+        values = dict(platform="spotify", platform_id="abc123", name="Title", artist="Artist", album="Album",
+                      download_url="https://www.youtube.com/watch?v=xyz", album_art_url="http://art/album")
+        values.update(kwargs)
+        return Track(**values)
+
+    def test_all_frames_written_in_one_save(self, mp3_file, monkeypatch):
+        saves = []
+        original_save = ID3.save
+        monkeypatch.setattr(ID3, "save", lambda self, *args, **kwargs: saves.append(args) or
+                            original_save(self, *args, **kwargs))
+
+        FileDownloadUtils.embed_track_metadata(mp3_file, self._track())
+
+        assert len(saves) == 1
+        tags = ID3(mp3_file)
+        assert tags['TIT2'].text == ["Title"]
+        assert tags['TPE1'].text == ["Artist"]
+        assert tags['TALB'].text == ["Album"]
+        assert tags['WOAS'].url == "https://www.youtube.com/watch?v=xyz"
+        assert tags[f'TXXX:{PLATFORM_ID_DESC}'].text == ["spotify:abc123"]
+        assert tags.getall('APIC')[0].data == b"jpeg"
+
+    def test_retag_is_written_in_place(self, mp3_file):
+        audio_hash = TrackStorageService.hash_audio_content(mp3_file)
+        FileDownloadUtils.embed_track_metadata(mp3_file, self._track())
+        with open(mp3_file, 'rb') as f:
+            tagged_size = len(f.read())
+
+        FileDownloadUtils.embed_track_metadata(mp3_file, self._track(name="A Much Longer Corrected Title"))
+
+        with open(mp3_file, 'rb') as f:
+            assert len(f.read()) == tagged_size
+        assert ID3(mp3_file)['TIT2'].text == ["A Much Longer Corrected Title"]
+        assert TrackStorageService.hash_audio_content(mp3_file) == audio_hash
@@ -0,0 +1,77 @@
+import pytest
+
+from app.extensions import db
+from app.models import Track
+from app.services.library_reconciliation_service import LibraryReconciliationService
+from app.utils.library_index import LibraryIndex
+
+
+@pytest.mark.usefixtures("init_database")
+class TestLibraryReconciliationService:
+    """
+    Tests for the LibraryReconciliationService class.
+
+    Tests Include:
+    - Present, moved, missing and orphaned files are all reconciled in one pass
+    - Dry runs report changes without updating the database
+    """
+
+    @staticmethod
+    def _create_library(tmp_path):
+        (tmp_path / "present.mp3").write_bytes(b"audio")
+        (tmp_path / "moved").mkdir()
+        (tmp_path / "moved" / "moved.mp3").write_bytes(b"audio")
+        (tmp_path / "Orphan Song - Orphan Artist.mp3").write_bytes(b"audio")
+        (tmp_path / "unknown.mp3").write_bytes(b"audio")
+        (tmp_path / "cover.jpg").write_bytes(b"image")
+
+        tracks = {
+            'present': Track(platform_id="1", platform="spotify", name="Present", artist="A",
+                             download_location="present.mp3"),
+            'moved': Track(platform_id="2", platform="spotify", name="Moved", artist="A",
+                           download_location="moved.mp3"),
+            'missing': Track(platform_id="3", platform="spotify", name="Missing", artist="A",
+                             download_location="missing.mp3"),
+            'orphan': Track(platform_id="4", platform="youtube", name="Orphan Song", artist="Orphan Artist"),
+        }
+        db.session.add_all(tracks.values())
+        db.session.commit()
+        return tracks
+
+    def test_reconcile_fixes_locations(self, tmp_path):
+        tracks = self._create_library(tmp_path)
+
+        report = LibraryReconciliationService.reconcile(library_index=LibraryIndex.build(str(tmp_path)))
+
+        assert report['files_scanned'] == 4
+        assert report['tracks_ok'] == 1
+        assert [change['track_id'] for change in report['relocated']] == [tracks['moved'].id]
+        assert [change['track_id'] for change in report['missing']] == [tracks['missing'].id]
+        assert [change['track_id'] for change in report['adopted']] == [tracks['orphan'].id]
+        assert report['orphans'] == ["unknown.mp3"]
+
+        db.session.expire_all()
+        assert db.session.get(Track, tracks['present'].id).download_location == "present.mp3"
+        assert db.session.get(Track, tracks['moved'].id).download_location.replace("\\", "/") == "moved/moved.mp3"
+        assert db.session.get(Track, tracks['missing'].id).download_location is None
+        assert db.session.get(Track, tracks['orphan'].id).download_location == "Orphan Song - Orphan Artist.mp3"
+
+    def test_dry_run_does_not_update(self, tmp_path):
+        tracks = self._create_library(tmp_path)
+
+        report = LibraryReconciliationService.reconcile(dry_run=True,
+                                                        library_index=LibraryIndex.build(str(tmp_path)))
+
+        assert report['dry_run'] is True
+        assert len(report['missing']) == 1
+        db.session.expire_all()
+        assert db.session.get(Track, tracks['missing'].id).download_location == "missing.mp3"
+        assert db.session.get(Track, tracks['orphan'].id).download_location is None
+
+    def test_index_checks_locations_without_stat(self, tmp_path):
+        index = LibraryIndex(str(tmp_path), ["a/track.mp3"])
+
+        assert index.contains("a/track.mp3")
+        assert index.contains(str(tmp_path / "a" / "track.mp3"))
+        assert not index.contains("track.mp3")
+        assert index.find_by_stem("TRACK") == [index.relative_path("a/track.mp3")]
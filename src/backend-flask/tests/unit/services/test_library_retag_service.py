@@ -0,0 +1,71 @@
+import pytest
+from mutagen.id3 import ID3
+
+from app.extensions import db
+from app.models import Track
+from app.services.library_retag_service import LibraryRetagService
+from app.utils.file_download_utils import FileDownloadUtils
+from config import Config
+
+
+@pytest.mark.usefixtures("init_database")
+class TestLibraryRetagService:
+    """
+    Tests for the LibraryRetagService class.
+
+    Tests Include:
+    - Only files whose tags differ from the database are rewritten
+    - Dry runs report the differing tags without writing files
+    """
+
+    @pytest.fixture
+    def library(self, tmp_path, monkeypatch):
+        monkeypatch.setattr(Config, "DOWNLOAD_FOLDER", str(tmp_path))
+        tracks = {
+            'tagged': Track(platform_id="1", platform="soundcloud", name="Tagged", artist="Right Artist",
+                            download_location="tagged.mp3"),
+            'wrong': Track(platform_id="2", platform="soundcloud", name="Wrong", artist="Wrong Artist",
+                           download_location="wrong.mp3"),
+            'missing': Track(platform_id="3", platform="soundcloud", name="Missing", artist="A",
+                             download_location="missing.mp3"),
+        }
+        for track in tracks.values():
+            if track.download_location != "missing.mp3":
+                file_path = tmp_path / track.download_location
+                file_path.write_bytes(b"\xff\xfb" + b"audio" * 100)
+                FileDownloadUtils.embed_track_metadata(str(file_path), track)
+        db.session.add_all(tracks.values())
+        db.session.commit()
+
+        # The artist was stored wrong when downloaded and has since been fixed
+        tracks['wrong'].artist = "Right Artist"
+        db.session.commit()
+        return tmp_path, tracks
+
+    def test_retag_rewrites_only_differences(self, library, monkeypatch):
+        tmp_path, tracks = library
+        written = []
+        embed_track_metadata = FileDownloadUtils.embed_track_metadata
+        monkeypatch.setattr(FileDownloadUtils, "embed_track_metadata", staticmethod(
+            lambda file_path, track: written.append(file_path) or embed_track_metadata(file_path, track)))
+        progress = []
+
+        report = LibraryRetagService.retag(progress_callback=lambda **kwargs: progress.append(kwargs))
+
+        assert report['retagged'] == 1 and report['up_to_date'] == 1 and report['missing'] == 1
+        assert report['changes'][0]['track_id'] == tracks['wrong'].id
+        assert report['changes'][0]['tags'] == ['TPE1']
+        assert written == [str(tmp_path / "wrong.mp3")]
+        assert ID3(str(tmp_path / "wrong.mp3"))['TPE1'].text == ["Right Artist"]
+        assert progress[-1] == {'processed': 3, 'total': 3}
+
+        assert LibraryRetagService.retag()['up_to_date'] == 2
+
+    def test_dry_run_does_not_write(self, library):
+        tmp_path, tracks = library
+
+        report = LibraryRetagService.retag(dry_run=True)
+
+        assert report['dry_run'] is True
+        assert report['changes'][0]['tags'] == ['TPE1']
+        assert ID3(str(tmp_path / "wrong.mp3"))['TPE1'].text == ["Wrong Artist"]
@@ -0,0 +1,158 @@
+import os
+from datetime import datetime, timedelta
+
+import pytest
+
+from app.extensions import db
+from app.models import PartialDownload, Track
+from app.services.download_services import base_download_service
+from app.services.download_services.partial_download_service import PartialDownloadService
+from app.services.download_services.youtube_download_service import YouTubeDownloadService
+from app.utils.file_download_utils import FileDownloadUtils
+from app.workers.transcode_pool import TranscodeError, TranscodePool
+from config import Config
+
+
+class FakeYoutubeDL:
+    """ Downloads to the output template, crashing part way through when asked, standing in for yt-dlp. """
+    crash = False
+    extension = "mp3"
+    downloads = []
+
+    def __init__(self, opts):
+        self.opts = opts
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        pass
+
+    def extract_info(self, url, download=False):
+        file_path = self.opts['outtmpl'].replace("%(ext)s", FakeYoutubeDL.extension)
+        resumed = os.path.exists(file_path + ".part")
+        FakeYoutubeDL.downloads.append((self.opts['outtmpl'], resumed))
+        with open(file_path + ".part", 'ab') as f:
+            f.write(b"audio" * 100)
+        if FakeYoutubeDL.crash:
+            raise Exception("ERROR: unable to download video data: Connection reset by peer")
+        os.replace(file_path + ".part", file_path)
+        return {'requested_downloads': [{'filepath': file_path}]}
+
+
+@pytest.mark.usefixtures("init_database")
+class TestPartialDownloadService:
+    """
+    Tests for the PartialDownloadService class and resuming downloads.
+
+    Tests Include:
+    - Interrupted downloads resume at the path they were writing to
+    - A raw download left by an interrupted transcode is transcoded and stored, not downloaded again
+    - Partial downloads from a different source are discarded
+    - Only a download's own files are removed, not other tracks' files sharing the start of its name
+    - Startup cleanup removes stale and orphaned partial files, keeping resumable ones
+    """
+
+    @pytest.fixture(autouse=True)
+    def download_folder(self, tmp_path, monkeypatch):
+        FakeYoutubeDL.crash = False
+        FakeYoutubeDL.extension = "mp3"
+        FakeYoutubeDL.downloads = []
+        monkeypatch.setattr(Config, "DOWNLOAD_FOLDER", str(tmp_path))
+        monkeypatch.setattr(base_download_service, "YoutubeDL", FakeYoutubeDL)
+        monkeypatch.setattr(FileDownloadUtils, "embed_track_metadata", staticmethod(lambda file_path, track: None))
+        return tmp_path
+
+    @staticmethod
+    def _add_track(platform_id="abc", name="Mix"):
+        track = Track(platform_id=platform_id, platform="youtube", name=name, artist="DJ",
+                      download_url=f"http://video/{platform_id}")
+        db.session.add(track)
+        db.session.commit()
+        return track
+
+    def test_interrupted_download_resumes(self, download_folder, monkeypatch):
+        track = self._add_track()
+        FakeYoutubeDL.crash = True
+        with pytest.raises(Exception, match="Connection reset"):
+            YouTubeDownloadService.download_track(track)
+        assert PartialDownloadService.get(track) is not None
+
+        # The resumed download keeps its path, even though the layout has changed since
+        FakeYoutubeDL.crash = False
+        monkeypatch.setattr(Config, "DOWNLOAD_LAYOUT", "artist_initial")
+        YouTubeDownloadService.download_track(track)
+
+        (first_path, _), (resumed_path, resumed) = FakeYoutubeDL.downloads
+        assert resumed_path == first_path and resumed
+        assert track.download_location == "Mix - DJ.mp3"
+        assert PartialDownloadService.get(track) is None
+
+    def test_interrupted_transcode_resumes(self, download_folder, monkeypatch):
+        track = self._add_track()
+        FakeYoutubeDL.extension = "m4a"
+        tagged = []
+        monkeypatch.setattr(Config, "AUDIO_FORMAT", "mp3")
+        monkeypatch.setattr(FileDownloadUtils, "embed_track_metadata",
+                            staticmethod(lambda file_path, track: tagged.append(file_path)))
+
+        def crashed_transcode(ffmpeg_location, source_path, target_path):
+            raise TranscodeError("ffmpeg was killed")
+
+        monkeypatch.setattr(TranscodePool, "transcode_to_mp3", staticmethod(crashed_transcode))
+        with pytest.raises(TranscodeError):
+            YouTubeDownloadService.download_track(track)
+        assert os.listdir(download_folder) == ["Mix - DJ.m4a"]
+        assert PartialDownloadService.get(track) is not None
+
+        def transcode(ffmpeg_location, source_path, target_path):
+            os.replace(source_path, target_path)
+            return target_path
+
+        monkeypatch.setattr(TranscodePool, "transcode_to_mp3", staticmethod(transcode))
+        YouTubeDownloadService.download_track(track)
+
+        assert len(FakeYoutubeDL.downloads) == 1
+        assert track.download_location == "Mix - DJ.mp3"
+        assert tagged == [track.absolute_download_path]
+        assert os.listdir(download_folder) == ["Mix - DJ.mp3"]
+        assert PartialDownloadService.get(track) is None
+
+    def test_changed_source_discards_partial(self, download_folder):
+        track = self._add_track()
+        FakeYoutubeDL.crash = True
+        with pytest.raises(Exception):
+            YouTubeDownloadService.download_track(track)
+
+        assert PartialDownloadService.get_resume_stem(track, "http://video/other") is None
+
+        assert os.listdir(download_folder) == []
+        assert PartialDownloadService.get(track) is None
+
+    def test_remove_files_keeps_other_tracks_files(self, download_folder):
+        own = ["Intro.webm", "Intro.webm.part", "Intro.webm.ytdl", "Intro.m4a.part-Frag2", "Intro.mp3.part"]
+        others = ["Intro. Live.mp3", "Intro.Remix.m4a", "Intro (Edit).mp3"]
+        for name in own + others:
+            (download_folder / name).write_bytes(b"audio")
+
+        assert sorted(os.path.basename(path) for path in
+                      PartialDownloadService.find_files(str(download_folder / "Intro"))) == sorted(own)
+        PartialDownloadService.remove_files(str(download_folder / "Intro"))
+
+        assert sorted(os.listdir(download_folder)) == sorted(others)
+
+    def test_clean_stale_partials(self, download_folder):
+        recent, stale, finished = self._add_track("1", "Recent"), self._add_track("2", "Stale"), self._add_track("3")
+        started = {recent: datetime.utcnow(), stale: datetime.utcnow() - timedelta(days=30), finished: datetime.utcnow()}
+        for track, started_at in started.items():
+            db.session.add(PartialDownload(track_id=track.id, file_stem=f"{track.name}", source_url=track.download_url,
+                                           started_at=started_at))
+        db.session.commit()
+        for name in ("Recent.webm.part", "Stale.webm.part", "Orphan.webm.part", "Orphan.webm.ytdl", "Done.mp3"):
+            (download_folder / name).write_bytes(b"audio")
+
+        counts = PartialDownloadService.clean_stale_partials(max_age=timedelta(days=7))
+
+        assert counts == {'kept': 1, 'removed': 1, 'orphaned_files_removed': 2}
+        assert sorted(os.listdir(download_folder)) == ["Done.mp3", "Recent.webm.part"]
+        assert [partial.track_id for partial in PartialDownload.query.all()] == [recent.id]
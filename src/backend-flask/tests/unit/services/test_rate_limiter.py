@@ -0,0 +1,98 @@
+import json
+import os
+import threading
+import time
+
+import pytest
+
+from app.utils import rate_limiter
+from app.utils.rate_limiter import AdaptiveRateLimiter
+from config import Config
+
+
+class TestAdaptiveRateLimiter:
+    """
+    Tests for the AdaptiveRateLimiter class.
+
+    Tests Include:
+    - Successes raise the rate additively, throttling halves it, within the platform's limits
+    - Throttle errors (429s, bot checks) from calls slow down and pause the platform
+    - Learnt rates are saved and used when the limiter is recreated, concurrent saves don't clobber each other
+    - The current limits are exposed by the API
+    """
+
+    def test_aimd_rate_changes(self):
+        limiter = AdaptiveRateLimiter("test", initial_rate=1.0, min_rate=0.3, max_rate=1.15)
+
+        limiter.record_success()
+        assert limiter.rate == pytest.approx(1.1)
+        limiter.record_success()
+        assert limiter.rate == pytest.approx(1.15)
+
+        limiter.record_throttled(retry_after=0)
+        assert limiter.rate == pytest.approx(0.575)
+        limiter.record_throttled(retry_after=0)
+        assert limiter.rate == pytest.approx(0.3)
+
+    def test_slow_responses_lower_the_rate(self):
+        limiter = AdaptiveRateLimiter("test", initial_rate=5, min_rate=0.1, max_rate=5)
+        for _ in range(5):
+            limiter.record_success(latency=0.1)
+
+        limiter.record_success(latency=1.0)
+
+        assert limiter.rate == pytest.approx(4.5)
+
+    def test_throttle_error_slows_and_pauses(self):
+        limiter = AdaptiveRateLimiter("test", initial_rate=4, min_rate=0.1, max_rate=10)
+
+        def bot_check():
+            raise Exception("ERROR: [youtube] abc: Sign in to confirm you're not a bot")
+
+        with pytest.raises(Exception, match="not a bot"):
+            limiter.call(bot_check)
+
+        assert limiter.rate == 2
+        assert limiter.throttle_count == 1
+        assert limiter._next_slot > time.monotonic()
+
+        with pytest.raises(ValueError):
+            limiter.call(lambda: (_ for _ in ()).throw(ValueError("Video unavailable")))
+        assert limiter.throttle_count == 1
+
+    def test_learnt_rates_are_saved(self):
+        limiter = AdaptiveRateLimiter.get("soundcloud")
+        limiter.record_throttled(retry_after=0)
+
+        AdaptiveRateLimiter.reset()
+
+        assert AdaptiveRateLimiter.get("soundcloud").rate == 500
+
+    def test_concurrent_saves(self, monkeypatch):
+        warnings = []
+        monkeypatch.setattr(rate_limiter.logger, "warning", lambda *args: warnings.append(args))
+        limiters = [AdaptiveRateLimiter.get(platform) for platform in ("youtube", "soundcloud", "spotify")]
+
+        threads = [threading.Thread(target=limiter.record_throttled, kwargs={'retry_after': 0})
+                   for limiter in limiters for _ in range(10)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join(timeout=5)
+
+        assert [args for args in warnings if "Failed to save" in args[0]] == []
+        with open(Config.RATE_LIMIT_STATE_PATH, 'r', encoding='UTF-8') as f:
+            state = json.load(f)
+        assert state == {limiter.platform: {'rate': limiter.rate} for limiter in limiters}
+        assert os.listdir(os.path.dirname(Config.RATE_LIMIT_STATE_PATH)) == ["rate_limits.json"]
+
+    def test_rate_limits_route(self, client):
+        AdaptiveRateLimiter.get("youtube").record_throttled(retry_after=0)
+
+        response = client.get('/api/rate-limits')
+
+        assert response.status_code == 200
+        limits = {limit['platform']: limit for limit in response.get_json()}
+        assert set(limits) == {"youtube", "soundcloud", "spotify"}
+        assert limits["youtube"]['rate'] == 500
+        assert limits["youtube"]['throttle_count'] == 1
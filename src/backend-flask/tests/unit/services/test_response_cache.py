@@ -0,0 +1,132 @@
+import threading
+import time
+
+import pytest
+
+from app.extensions import db
+from app.models import Playlist
+from app.services.platform_services import soundcloud_service
+from app.services.playlist_manager_service import PlaylistManagerService
+from app.utils import response_cache
+from app.utils.response_cache import ResponseCache
+from config import Config
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self):
+        return self.now
+
+
+@pytest.mark.usefixtures("init_database")
+class TestResponseCache:
+    """
+    Tests for the ResponseCache class.
+
+    Tests Include:
+    - Responses are reused until their TTL expires, failed fetches aren't cached
+    - Inside a scope responses are reused whatever their age, and the least recently used are evicted
+    - Concurrent fetches of a key wait for a single fetch, even one retrying a failed fetch
+    - Syncing a playlist fetches its upstream page once, for both its data and its tracks
+    """
+
+    @pytest.fixture
+    def clock(self, monkeypatch):
+        clock = Clock()
+        monkeypatch.setattr(response_cache, "time", clock)
+        return clock
+
+    def test_ttl(self, clock, monkeypatch):
+        monkeypatch.setattr(Config, "RESPONSE_CACHE_TTL", 60)
+        fetches = []
+
+        def fetch():
+            fetches.append(clock.now)
+            return {'fetch': len(fetches)}
+
+        assert ResponseCache.get_or_fetch("playlist", "url", fetch) == {'fetch': 1}
+        clock.now += 59
+        assert ResponseCache.get_or_fetch("playlist", "url", fetch) == {'fetch': 1}
+        clock.now += 1
+        assert ResponseCache.get_or_fetch("playlist", "url", fetch) == {'fetch': 2}
+        assert ResponseCache.get_or_fetch("playlist", "missing", lambda: None) is None
+        assert ResponseCache.get_or_fetch("playlist", "missing", lambda: "found") == "found"
+
+        stats = ResponseCache.stats()
+        assert (stats['hits'], stats['misses'], stats['entries']) == (1, 4, 2)
+        assert stats['namespaces']['playlist']['expired'] == 1
+
+    def test_scope_and_eviction(self, clock, monkeypatch):
+        monkeypatch.setattr(Config, "RESPONSE_CACHE_TTL", 0)
+        with ResponseCache.scope():
+            assert ResponseCache.get_or_fetch("playlist", "url", lambda: "first") == "first"
+            clock.now += 3600
+            assert ResponseCache.get_or_fetch("playlist", "url", lambda: "second") == "first"
+        assert ResponseCache.get_or_fetch("playlist", "url", lambda: "third") == "third"
+
+        monkeypatch.setattr(Config, "RESPONSE_CACHE_TTL", 60)
+        monkeypatch.setattr(Config, "RESPONSE_CACHE_MAX_ENTRIES", 2)
+        for key in ("a", "b", "a", "c"):
+            ResponseCache.get_or_fetch("playlist", key, lambda: key)
+        assert ResponseCache.get_or_fetch("playlist", "b", lambda: "refetched") == "refetched"
+        assert ResponseCache.stats()['namespaces']['playlist']['evicted'] == 2  # b, then c
+
+    def test_concurrent_fetches_wait_for_one(self, monkeypatch):
+        monkeypatch.setattr(Config, "RESPONSE_CACHE_TTL", 60)
+        started = threading.Semaphore(0)
+        release = [threading.Event(), threading.Event()]
+        fetches = []
+        results = []
+
+        def fetch():
+            attempt = len(fetches)
+            fetches.append(attempt)
+            started.release()
+            assert release[attempt].wait(timeout=5)
+            return None if attempt == 0 else "playlist"  # The first fetch fails, so isn't cached
+
+        def wait_for_callers(count):
+            deadline = time.monotonic() + 5
+            while ResponseCache._key_locks[("playlist", "url")].users != count:
+                assert time.monotonic() < deadline
+                time.sleep(0.01)
+
+        callers = [threading.Thread(target=lambda: results.append(ResponseCache.get_or_fetch("playlist", "url", fetch)))
+                   for _ in range(3)]
+        callers[0].start()
+        assert started.acquire(timeout=5)
+        callers[1].start()
+        wait_for_callers(2)
+        release[0].set()
+        # The second caller fetches again, a caller arriving now waits for it rather than fetching alongside it
+        assert started.acquire(timeout=5)
+        callers[2].start()
+        wait_for_callers(2)
+        release[1].set()
+        for caller in callers:
+            caller.join(timeout=5)
+
+        assert fetches == [0, 1]
+        assert sorted(results, key=str) == [None, "playlist", "playlist"]
+        assert ResponseCache._key_locks == {}
+
+    def test_sync_fetches_playlist_once(self, client, monkeypatch):
+        playlist = Playlist(name="Old Playlist", platform="soundcloud", external_id="1890498842",
+                            url="https://soundcloud.com/schmoot-point/sets/omwhp")
+        db.session.add(playlist)
+        db.session.commit()
+        mock_service = soundcloud_service.SoundcloudService
+        pages = []
+        fetch_page = mock_service._make_html_get_request
+        monkeypatch.setattr(mock_service, "_make_html_get_request",
+                            staticmethod(lambda url, headers, query_params=None: pages.append(url) or
+                                         fetch_page(url, headers, query_params)))
+
+        PlaylistManagerService.sync_playlists([playlist])
+
+        assert pages == [playlist.url]
+        assert playlist.track_count == 14
+        assert client.get('/api/response-cache').get_json()['namespaces']['soundcloud_playlist'] == \
+            {'hits': 1, 'misses': 1, 'expired': 0, 'evicted': 0}
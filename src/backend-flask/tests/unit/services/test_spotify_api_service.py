@@ -0,0 +1,90 @@
+import threading
+from datetime import datetime
+
+import pytest
+
+from app.extensions import db
+from app.models import Playlist
+from app.services.platform_services.spotify_api_service import SpotifyApiService
+
+PLAYLIST_URL = "https://open.spotify.com/playlist/paged"
+
+
+class PagedSpotifyClient:
+    """ Serves a playlist of numbered tracks a page at a time, recording the pages asked for. """
+
+    def __init__(self, total):
+        self.total = total
+        self.requests = []
+        self._lock = threading.Lock()
+
+    def _page(self, limit, offset):
+        with self._lock:
+            self.requests.append((limit, offset))
+        items = [{'added_at': f"2024-01-{1 + i // 100:02d}T00:00:00Z",
+                  'track': {'id': f"track{i}", 'name': f"Song {i}", 'artists': [{'name': "Artist"}]}}
+                 for i in range(offset, min(offset + limit, self.total))]
+        return {'items': items, 'total': self.total}
+
+    def playlist_items(self, playlist_id, limit=100, offset=0):
+        return self._page(limit, offset)
+
+    def current_user_saved_tracks(self, limit=20, offset=0):
+        return self._page(limit, offset)
+
+
+@pytest.mark.usefixtures("init_database")
+class TestSpotifyApiService:
+    """
+    Tests for paging through playlists with the SpotifyApiService class.
+
+    Tests Include:
+    - The pages after the first are fetched at the largest page size and reassembled in order
+    - Pages after a track or date limit are reached aren't fetched
+    - Liked tracks are paged the same way, reusing the first page fetched for the playlist data
+    """
+
+    @staticmethod
+    def _add_playlist(url=PLAYLIST_URL, track_limit=None, date_limit=None):
+        playlist = Playlist(name="Paged", platform="spotify", external_id=url.split("/")[-1], url=url,
+                            track_limit=track_limit, date_limit=date_limit)
+        db.session.add(playlist)
+        db.session.commit()
+
+    @pytest.fixture
+    def spotify_client(self, monkeypatch):
+        client = PagedSpotifyClient(total=1050)
+        monkeypatch.setattr(SpotifyApiService, "get_client", staticmethod(lambda: client))
+        monkeypatch.setattr(SpotifyApiService, "get_auth_client", staticmethod(lambda redirect_uri=None: client))
+        return client
+
+    def test_pages_are_reassembled_in_order(self, spotify_client):
+        self._add_playlist()
+
+        tracks = SpotifyApiService.get_playlist_tracks(PLAYLIST_URL)
+
+        assert [track['platform_id'] for track in tracks] == [f"track{i}" for i in range(1050)]
+        assert sorted(spotify_client.requests) == [(100, offset) for offset in range(0, 1100, 100)]
+
+    def test_limits_stop_fetching(self, spotify_client):
+        self._add_playlist(track_limit=150)
+        assert len(SpotifyApiService.get_playlist_tracks(PLAYLIST_URL)) == 150
+        # The first page, then the first batch of pages
+        assert len(spotify_client.requests) == 9
+
+        spotify_client.requests = []
+        Playlist.query.first().track_limit = None
+        Playlist.query.first().date_limit = datetime(2024, 1, 2)
+        db.session.commit()
+        # The first track, added before the limit, ends the playlist
+        assert SpotifyApiService.get_playlist_tracks(PLAYLIST_URL) == []
+        assert spotify_client.requests == [(100, 0)]
+
+    def test_saved_tracks(self, spotify_client):
+        self._add_playlist(url="https://open.spotify.com/collection/tracks")
+
+        assert SpotifyApiService.get_playlist_data("https://open.spotify.com/collection/tracks")['track_count'] == 1050
+        tracks = SpotifyApiService.get_playlist_tracks("https://open.spotify.com/collection/tracks")
+
+        assert [track['platform_id'] for track in tracks] == [f"track{i}" for i in range(1050)]
+        assert sorted(spotify_client.requests) == [(50, offset) for offset in range(0, 1050, 50)]
@@ -0,0 +1,148 @@
+import os
+
+import pytest
+
+from app.extensions import db
+from app.models import Track
+from app.services.download_services import base_download_service
+from app.services.download_services.track_storage_service import TrackStorageService
+from app.services.download_services.youtube_download_service import YouTubeDownloadService
+from app.utils.file_download_utils import FileDownloadUtils
+from app.workers.transcode_pool import TranscodePool
+from config import Config
+
+AUDIO_BY_URL = {
+    "http://audio/a": b"audio a" * 100,
+    "http://audio/a-reupload": b"audio a" * 100,
+    "http://audio/b": b"audio b" * 100,
+    "http://audio/raw.webm": b"audio c" * 100,
+}
+
+
+class FakeYoutubeDL:
+    """ Writes the audio for a URL to the output template, standing in for yt-dlp. """
+    downloads = []
+
+    def __init__(self, opts):
+        self.opts = opts
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        pass
+
+    def extract_info(self, url, download=False):
+        FakeYoutubeDL.downloads.append(url)
+        # Native mode remuxes to m4a, sources for MP3 mode are already MP3 so need no transcode
+        extension = "m4a" if self.opts['postprocessors'] else "mp3"
+        if url.endswith(".webm"):
+            extension = "webm"
+        file_path = self.opts['outtmpl'].replace("%(ext)s", extension)
+        with open(file_path, 'wb') as f:
+            f.write(AUDIO_BY_URL[url])
+        return {'requested_downloads': [{'filepath': file_path}]}
+
+
+@pytest.mark.usefixtures("init_database")
+class TestTrackStorageService:
+    """
+    Tests for the TrackStorageService class and the shared download path.
+
+    Tests Include:
+    - Audio hashes ignore ID3 tags
+    - Filename collisions between different tracks get a deterministic suffix
+    - Identical audio and identical sources are stored and downloaded once
+    - Native mode keeps the downloaded format
+    - Raw downloads in MP3 mode are transcoded by the transcode pool before being stored
+    """
+
+    @pytest.fixture(autouse=True)
+    def download_folder(self, tmp_path, monkeypatch):
+        FakeYoutubeDL.downloads = []
+        monkeypatch.setattr(Config, "DOWNLOAD_FOLDER", str(tmp_path))
+        monkeypatch.setattr(base_download_service, "YoutubeDL", FakeYoutubeDL)
+        monkeypatch.setattr(FileDownloadUtils, "embed_track_metadata", staticmethod(lambda file_path, track: None))
+        return tmp_path
+
+    @staticmethod
+    def _add_track(platform_id, name, download_url):
+        track = Track(platform_id=platform_id, platform="youtube", name=name, artist="Artist",
+                      download_url=download_url)
+        db.session.add(track)
+        db.session.commit()
+        return track
+
+    def test_hash_ignores_id3_tags(self, download_folder):
+        untagged = download_folder / "untagged.mp3"
+        untagged.write_bytes(b"audio frames")
+        tag_body = b"\x00" * 20
+        tagged = download_folder / "tagged.mp3"
+        tagged.write_bytes(b"ID3\x04\x00\x00\x00\x00\x00\x14" + tag_body + b"audio frames" + b"TAG" + b"\x00" * 125)
+
+        assert TrackStorageService.hash_audio_content(str(untagged)) == \
+            TrackStorageService.hash_audio_content(str(tagged))
+
+    def test_name_collision_gets_deterministic_suffix(self, download_folder):
+        first = self._add_track("1", "Same Title", "http://audio/a")
+        second = self._add_track("2", "Same Title", "http://audio/b")
+
+        YouTubeDownloadService.download_track(first)
+        YouTubeDownloadService.download_track(second)
+
+        assert first.download_location == "Same Title - Artist.mp3"
+        suffix = TrackStorageService.get_collision_suffix(second)
+        assert second.download_location == f"Same Title - Artist - {suffix}.mp3"
+        assert TrackStorageService.resolve_file_stem(second, "Same Title - Artist") + ".mp3" == \
+            second.absolute_download_path
+        assert first.content_hash != second.content_hash
+
+    def test_identical_audio_is_stored_once(self, download_folder):
+        first = self._add_track("1", "Original", "http://audio/a")
+        second = self._add_track("2", "Reupload", "http://audio/a-reupload")
+
+        YouTubeDownloadService.download_track(first)
+        YouTubeDownloadService.download_track(second)
+
+        assert second.download_location == first.download_location
+        assert second.content_hash == first.content_hash
+        assert sorted(path.name for path in download_folder.iterdir()) == ["Original - Artist.mp3"]
+
+    def test_same_source_is_not_downloaded_again(self, download_folder):
+        first = self._add_track("1", "First", "http://audio/a")
+        second = self._add_track("2", "Second", "http://audio/a")
+
+        YouTubeDownloadService.download_track(first)
+        YouTubeDownloadService.download_track(second)
+
+        assert FakeYoutubeDL.downloads == ["http://audio/a"]
+        assert second.download_location == first.download_location
+
+    def test_native_format_keeps_downloaded_file(self, download_folder, monkeypatch):
+        monkeypatch.setattr(Config, "AUDIO_FORMAT", "native")
+        track = self._add_track("1", "Native", "http://audio/a")
+
+        YouTubeDownloadService.download_track(track)
+
+        assert track.download_location == "Native - Artist.m4a"
+        assert TrackStorageService.find_existing_file(str(download_folder / "Native - Artist")) == \
+            track.absolute_download_path
+
+    def test_raw_download_is_transcoded_before_storing(self, download_folder, monkeypatch):
+        tagged = []
+
+        def fake_transcode(ffmpeg_location, source_path, target_path):
+            os.replace(source_path, target_path)
+            return target_path
+
+        monkeypatch.setattr(TranscodePool, "transcode_to_mp3", staticmethod(fake_transcode))
+        monkeypatch.setattr(FileDownloadUtils, "embed_track_metadata",
+                            staticmethod(lambda file_path, track: tagged.append(file_path)))
+        track = self._add_track("1", "Raw", "http://audio/raw.webm")
+
+        YouTubeDownloadService.download_track(track)
+
+        assert track.download_location == "Raw - Artist.mp3"
+        assert track.content_hash == TrackStorageService.hash_audio_content(track.absolute_download_path)
+        assert tagged == [track.absolute_download_path]
+        assert sorted(path.name for path in download_folder.iterdir()) == ["Raw - Artist.mp3"]
@@ -0,0 +1,106 @@
+import errno
+import threading
+
+import pytest
+
+from app.extensions import db
+from app.models import Playlist, PlaylistTrack, Track
+from app.repositories.playlist_repository import PlaylistRepository
+from app.services.download_services.youtube_download_service import YouTubeDownloadService
+from app.utils.disk_space import DiskSpaceGuard, InsufficientDiskSpaceError
+from app.workers.download_worker import DownloadManager
+from config import Config
+
+MIB = 1024 ** 2
+
+
+class DummyPlaylist:
+    def __init__(self, id, platform="youtube"):
+        self.id = id
+        self.platform = platform
+
+
+@pytest.mark.usefixtures("init_database")
+class TestDiskSpace:
+    """
+    Tests for the DiskSpaceGuard class and pausing downloads when the disk is full.
+
+    Tests Include:
+    - Track sizes are estimated from their duration
+    - A sync stops before downloading when there isn't enough space, without recording failures
+    - Disk full errors are recognised through wrapped errors
+    - The download manager pauses when out of space and resumes the playlist once space is freed
+    """
+
+    @pytest.fixture
+    def free_bytes(self, monkeypatch):
+        free = {'bytes': 10 * 1024 * MIB}
+        monkeypatch.setattr(DiskSpaceGuard, "get_free_bytes", staticmethod(lambda path=None: free['bytes']))
+        monkeypatch.setattr(Config, "MIN_FREE_DISK_SPACE", 100 * MIB)
+        return free
+
+    def test_estimate_track_bytes(self, monkeypatch):
+        monkeypatch.setattr(Config, "AUDIO_FORMAT", "native")
+        assert DiskSpaceGuard.estimate_track_bytes(Track(duration=100)) == 100 * 256 * 1000 / 8
+
+        monkeypatch.setattr(Config, "AUDIO_FORMAT", "mp3")
+        assert DiskSpaceGuard.estimate_track_bytes(Track(duration=100)) == 100 * (256 + 192) * 1000 / 8
+        assert DiskSpaceGuard.estimate_track_bytes(Track()) == Config.DEFAULT_TRACK_DURATION * 448 * 1000 / 8
+
+    def test_sync_stops_when_disk_is_full(self, free_bytes, monkeypatch):
+        playlist = Playlist(name="Playlist", platform="youtube", external_id="p1")
+        for i in range(3):
+            track = Track(platform_id=str(i), platform="youtube", name=f"Mix {i}", artist="DJ", duration=3600,
+                          download_url=f"http://video/{i}")
+            playlist.tracks.append(PlaylistTrack(track=track, track_order=i))
+        db.session.add(playlist)
+        db.session.commit()
+        free_bytes['bytes'] = 200 * MIB  # Less than an hour long mix needs on top of the minimum
+        attempted = []
+        monkeypatch.setattr(YouTubeDownloadService, "download_track_with_ytdlp",
+                            staticmethod(lambda track: attempted.append(track.name)))
+
+        with pytest.raises(InsufficientDiskSpaceError):
+            YouTubeDownloadService.download_playlist(playlist, False, {})
+
+        assert attempted == []
+        assert all(not pt.track.download_attempts and not pt.track.notes_errors for pt in playlist.tracks)
+
+    def test_disk_full_error_is_recognised(self):
+        try:
+            try:
+                raise OSError(errno.ENOSPC, "No space left on device")
+            except OSError as e:
+                raise Exception("ERROR: unable to write data") from e
+        except Exception as e:
+            assert DiskSpaceGuard.is_disk_full_error(e)
+        assert DiskSpaceGuard.is_disk_full_error(Exception("ffmpeg: Error writing trailer: No space left on device"))
+        assert not DiskSpaceGuard.is_disk_full_error(Exception("HTTP Error 403: Forbidden"))
+
+    def test_manager_pauses_until_space_is_freed(self, app, free_bytes, monkeypatch):
+        downloads = []
+        resumed = threading.Event()
+
+        def fake_download_playlist(playlist, quick_sync, cancellation_flags):
+            downloads.append(playlist.id)
+            if len(downloads) == 1:
+                raise InsufficientDiskSpaceError("Not enough disk space")
+            resumed.set()
+
+        monkeypatch.setattr(Config, "DISK_SPACE_CHECK_INTERVAL", 0.05)
+        monkeypatch.setattr(PlaylistRepository, "get_playlist_by_id", lambda playlist_id: DummyPlaylist(playlist_id))
+        monkeypatch.setattr(PlaylistRepository, "set_download_status", lambda playlist, status: None)
+        monkeypatch.setattr(YouTubeDownloadService, "download_playlist", fake_download_playlist)
+        free_bytes['bytes'] = 50 * MIB
+
+        manager = DownloadManager(app)
+        manager.add_to_queue("playlist")
+        assert not resumed.wait(timeout=0.3)
+        assert manager.get_status()['waiting_for_disk_space']
+        assert manager.get_status()['queued'] == [{'type': 'playlist', 'id': 'playlist', 'priority': 'user'}]
+
+        free_bytes['bytes'] = 10 * 1024 * MIB
+
+        assert resumed.wait(timeout=5)
+        assert downloads == ["playlist", "playlist"]
+        manager.shutdown()
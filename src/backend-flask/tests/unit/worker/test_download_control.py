@@ -0,0 +1,118 @@
+import os
+import threading
+
+import pytest
+
+from app.extensions import db
+from app.models import Track
+from app.services.download_services import base_download_service
+from app.services.download_services.youtube_download_service import YouTubeDownloadService
+from app.workers.download_control import DownloadCancelledError, DownloadControl
+from config import Config
+
+
+class FakeYoutubeDL:
+    """ Starts writing a download and reports progress, standing in for yt-dlp. """
+    before_progress = None
+
+    def __init__(self, opts):
+        self.opts = opts
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        pass
+
+    def extract_info(self, url, download=False):
+        part_path = self.opts['outtmpl'].replace("%(ext)s", "webm.part")
+        with open(part_path, 'wb') as f:
+            f.write(b"partial audio")
+        FakeYoutubeDL.before_progress()
+        try:
+            for hook in self.opts['progress_hooks']:
+                hook({'status': 'downloading', 'filename': part_path})
+        except Exception as e:
+            # yt-dlp reports errors raised during a download as its own
+            raise Exception(f"ERROR: {e}") from e
+        raise AssertionError("Download should have been cancelled")
+
+
+@pytest.mark.usefixtures("init_database")
+class TestDownloadControl:
+    """
+    Tests for the DownloadControl class and cancelling downloads in progress.
+
+    Tests Include:
+    - Checks raise once the running task is stopped, and do nothing outside a task
+    - Checks block while paused until resumed
+    - Cancelling a track mid-download removes its partial file without counting as a failure
+    - Preempted downloads keep their partial file
+    """
+
+    @pytest.fixture(autouse=True)
+    def download_folder(self, tmp_path, monkeypatch):
+        monkeypatch.setattr(Config, "DOWNLOAD_FOLDER", str(tmp_path))
+        monkeypatch.setattr(base_download_service, "YoutubeDL", FakeYoutubeDL)
+        return tmp_path
+
+    @staticmethod
+    def _add_track():
+        track = Track(platform_id="abc", platform="youtube", name="Mix", artist="DJ", download_url="http://video/abc")
+        db.session.add(track)
+        db.session.commit()
+        return track
+
+    def test_stop_raises_in_running_task_only(self):
+        control = DownloadControl()
+        DownloadControl.progress_hook({'status': 'downloading'})
+
+        with control.running():
+            control.stop_current()
+            with pytest.raises(DownloadCancelledError):
+                DownloadControl.progress_hook({'status': 'downloading'})
+
+        with control.running():
+            DownloadControl.progress_hook({'status': 'downloading'})
+
+    def test_pause_blocks_until_resumed(self):
+        control = DownloadControl()
+        control.pause()
+        checked = threading.Event()
+
+        def check():
+            control.check(None)
+            checked.set()
+
+        thread = threading.Thread(target=check, daemon=True)
+        thread.start()
+        assert not checked.wait(timeout=0.2)
+
+        control.resume()
+
+        assert checked.wait(timeout=5)
+
+    def test_cancelled_track_removes_partial_file(self, download_folder):
+        track = self._add_track()
+        control = DownloadControl()
+        FakeYoutubeDL.before_progress = lambda: control.cancel_track(track.id)
+
+        with control.running():
+            with pytest.raises(DownloadCancelledError) as error:
+                YouTubeDownloadService.download_track(track)
+
+        assert error.value.track_only
+        assert os.listdir(download_folder) == []
+        assert not track.download_attempts and not track.download_location
+
+    def test_preempted_download_keeps_partial_file(self, download_folder):
+        track = self._add_track()
+        control = DownloadControl()
+        FakeYoutubeDL.before_progress = lambda: control.stop_current(preempted=True)
+
+        with control.running():
+            with pytest.raises(DownloadCancelledError) as error:
+                YouTubeDownloadService.download_track(track)
+
+        assert error.value.preempted
+        assert os.listdir(download_folder) == ["Mix - DJ.webm.part"]
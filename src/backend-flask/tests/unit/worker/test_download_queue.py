@@ -0,0 +1,108 @@
+import threading
+import time
+from types import SimpleNamespace
+
+from app.repositories.playlist_repository import PlaylistRepository
+from app.services.download_services.youtube_download_service import YouTubeDownloadService
+from app.workers import download_queue
+from app.workers.download_queue import DownloadQueue, PRIORITY_BACKGROUND, PRIORITY_INTERACTIVE, PRIORITY_USER
+from app.workers.download_worker import DownloadManager
+
+
+class DummyPlaylist:
+    def __init__(self, id, platform="youtube"):
+        self.id = id
+        self.platform = platform
+
+
+class TestDownloadQueue:
+    """
+    Tests for the DownloadQueue class and priority scheduling in the DownloadManager.
+
+    Tests Include:
+    - Items are taken by priority class, oldest first within a class
+    - Waiting items age into higher priorities
+    - A preempted item doesn't age while running, and never ages ahead of interactive items
+    - Re-adding a queued key raises its priority instead of queueing it twice
+    - Closing the queue stops the download worker
+    - Higher priority work preempts the running playlist, which is re-queued
+    """
+
+    def test_priority_order(self):
+        queue = DownloadQueue()
+        queue.put("background", PRIORITY_BACKGROUND)
+        queue.put("user 1", PRIORITY_USER)
+        queue.put("interactive", PRIORITY_INTERACTIVE)
+        queue.put("user 2", PRIORITY_USER)
+
+        assert [queue.get().item for _ in range(4)] == ["interactive", "user 1", "user 2", "background"]
+
+    def test_waiting_items_age(self):
+        queue = DownloadQueue(aging_interval=60)
+        queue.put("old background", PRIORITY_BACKGROUND, enqueued_at=time.monotonic() - 150)
+        queue.put("new user", PRIORITY_USER)
+
+        assert queue.get().item == "old background"
+
+    def test_preempted_item_requeued_behind_interactive(self, monkeypatch):
+        clock = SimpleNamespace(now=10000.0)
+        monkeypatch.setattr(download_queue, "time", SimpleNamespace(monotonic=lambda: clock.now))
+        queue = DownloadQueue(aging_interval=600)
+        queue.put("playlist", PRIORITY_BACKGROUND, key="playlist")
+        clock.now += 60
+        entry = queue.get()
+
+        # Preempted by a track after running for half an hour
+        clock.now += 1800
+        queue.put("track", PRIORITY_INTERACTIVE)
+        assert queue.requeue(entry)
+
+        assert queue.snapshot()[1] == {'item': "playlist", 'priority': PRIORITY_BACKGROUND, 'waited': 60}
+        assert queue.get().item == "track"
+        # However long it waits, it only ties with interactive items queued after it
+        clock.now += 6000
+        queue.put("track 2", PRIORITY_INTERACTIVE)
+        assert queue.peek_priority() == PRIORITY_INTERACTIVE
+        assert queue.get().item == "playlist"
+
+    def test_requeued_key_raises_priority(self):
+        queue = DownloadQueue()
+        assert queue.put("playlist 1", PRIORITY_BACKGROUND, key=1)
+        queue.put("playlist 2", PRIORITY_USER, key=2)
+
+        assert not queue.put("playlist 1", PRIORITY_INTERACTIVE, key=1)
+
+        assert queue.qsize() == 2
+        assert queue.get().item == "playlist 1"
+
+    def test_close_stops_worker(self, app):
+        manager = DownloadManager(app)
+
+        manager.shutdown()
+
+        assert not manager.worker_thread.is_alive()
+        assert manager.download_queue.get(timeout=0) is None
+
+    def test_higher_priority_preempts_running_playlist(self, app, monkeypatch):
+        started = threading.Event()
+        downloads = []
+
+        def fake_download_playlist(playlist, quick_sync, cancellation_flags):
+            downloads.append(playlist.id)
+            if playlist.id == "background" and len(downloads) == 1:
+                started.set()
+                assert cancellation_flags["background"].wait(timeout=5)
+
+        monkeypatch.setattr(PlaylistRepository, "get_playlist_by_id", lambda playlist_id: DummyPlaylist(playlist_id))
+        monkeypatch.setattr(PlaylistRepository, "set_download_status", lambda playlist, status: None)
+        monkeypatch.setattr(YouTubeDownloadService, "download_playlist", fake_download_playlist)
+
+        manager = DownloadManager(app)
+        manager.add_to_queue("background", priority=PRIORITY_BACKGROUND)
+        assert started.wait(timeout=5)
+        manager.add_to_queue("interactive", priority=PRIORITY_INTERACTIVE)
+        manager.download_queue.join()
+
+        assert downloads == ["background", "interactive", "background"]
+
+        manager.shutdown()
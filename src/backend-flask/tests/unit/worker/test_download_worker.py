@@ -1,7 +1,16 @@
+import threading
+
+import pytest
+
+from app.extensions import db
+from app.models import Track
+from app.services.download_services.youtube_download_service import YouTubeDownloadService
+from app.utils.library_index import LibraryIndex
 from app.workers.download_worker import DownloadManager
 from app.repositories.playlist_repository import PlaylistRepository
 from app.services.download_services.spotify_download_service import SpotifyDownloadService
 from app.services.download_services.soundcloud_download_service import SoundcloudDownloadService
+from config import Config
 
 
 class DummyPlaylist:
@@ -63,3 +72,106 @@ class TestDownloadWorker:
 
         manager.shutdown()
 
+
+    @pytest.mark.usefixtures("init_database")
+    def test_re_download_track_is_queued_as_job(self, app, client, monkeypatch):
+        """
+        Test that re-downloading a track returns a job straight away, and the download manager downloads the track.
+        """
+        track = Track(platform_id="abc", platform="youtube", name="Track", artist="Artist",
+                      download_url="http://video/abc")
+        db.session.add(track)
+        db.session.commit()
+
+        def fake_download_track(track):
+            track.download_location = "Track.mp3"
+            db.session.commit()
+
+        monkeypatch.setattr(YouTubeDownloadService, "download_track", staticmethod(fake_download_track))
+
+        response = client.post(f'/api/tracks/{track.id}/download')
+
+        assert response.status_code == 202
+        job_id = response.get_json()['id']
+        app.download_manager.download_queue.join()
+        job = client.get(f'/api/tracks/download-jobs/{job_id}').get_json()
+        assert job['status'] == 'completed'
+        assert job['result']['download_location'].endswith("Track.mp3")
+
+    @pytest.mark.usefixtures("init_database")
+    def test_re_download_keeps_file_until_job_starts(self, app, client, monkeypatch, tmp_path):
+        """
+        Test that a re-download only removes the existing file once the download starts, so cancelling the queued
+        job leaves the track as it was.
+        """
+        monkeypatch.setattr(Config, "DOWNLOAD_FOLDER", str(tmp_path))
+        (tmp_path / "Track.mp3").write_bytes(b"audio")
+        track = Track(platform_id="abc", platform="youtube", name="Track", artist="Artist",
+                      download_url="http://video/abc", download_location="Track.mp3")
+        blocker = Track(platform_id="def", platform="youtube", name="Blocker", artist="Artist",
+                        download_url="http://video/def")
+        db.session.add_all([track, blocker])
+        db.session.commit()
+        blocker_started, release_blocker = threading.Event(), threading.Event()
+        removed_before_download = []
+
+        def fake_download_track(track):
+            if track.name == "Blocker":
+                blocker_started.set()
+                assert release_blocker.wait(timeout=5)
+                return
+            removed_before_download.append(track.download_location is None and not (tmp_path / "Track.mp3").exists())
+            track.download_location = "Track.mp3"
+            (tmp_path / "Track.mp3").write_bytes(b"new audio")
+            db.session.commit()
+
+        monkeypatch.setattr(YouTubeDownloadService, "download_track", staticmethod(fake_download_track))
+        # Keep the worker busy, so the re-download stays queued
+        app.download_manager.add_track_to_queue(blocker.id)
+        assert blocker_started.wait(timeout=5)
+        try:
+            assert client.post(f'/api/tracks/{track.id}/download').status_code == 202
+            assert client.delete(f'/api/tracks/{track.id}/download').status_code == 200
+        finally:
+            release_blocker.set()
+        app.download_manager.download_queue.join()
+
+        db.session.expire_all()
+        assert db.session.get(Track, track.id).download_location == "Track.mp3"
+        assert (tmp_path / "Track.mp3").read_bytes() == b"audio"
+
+        client.post(f'/api/tracks/{track.id}/download')
+        app.download_manager.download_queue.join()
+
+        assert removed_before_download == [True]
+        assert (tmp_path / "Track.mp3").read_bytes() == b"new audio"
+
+    @pytest.mark.usefixtures("init_database")
+    def test_re_download_keeps_shared_file(self, app, client, monkeypatch, tmp_path):
+        """
+        Test that re-downloading a track stored at the same file as another track keeps the file for the other
+        track, and that the last track's re-download removes it, from the live library index too.
+        """
+        monkeypatch.setattr(Config, "DOWNLOAD_FOLDER", str(tmp_path))
+        (tmp_path / "Shared.mp3").write_bytes(b"audio")
+        index = LibraryIndex(str(tmp_path), ["Shared.mp3"])
+        monkeypatch.setattr(LibraryIndex, "_live_index", index)
+        first, second = (Track(platform_id=platform_id, platform="youtube", name="Track", artist="Artist",
+                               download_url="http://video/abc", download_location="Shared.mp3")
+                         for platform_id in ("abc", "def"))
+        db.session.add_all([first, second])
+        db.session.commit()
+        monkeypatch.setattr(YouTubeDownloadService, "download_track", staticmethod(lambda track: None))
+
+        client.post(f'/api/tracks/{first.id}/download')
+        app.download_manager.download_queue.join()
+
+        db.session.expire_all()
+        assert db.session.get(Track, first.id).download_location is None
+        assert db.session.get(Track, second.id).download_location == "Shared.mp3"
+        assert (tmp_path / "Shared.mp3").exists() and index.contains("Shared.mp3")
+
+        client.post(f'/api/tracks/{second.id}/download')
+        app.download_manager.download_queue.join()
+
+        assert not (tmp_path / "Shared.mp3").exists() and not index.contains("Shared.mp3")
@@ -0,0 +1,78 @@
+import threading
+import time
+
+import pytest
+
+from app.workers.job_manager import JobManager, JobAlreadyRunningError
+
+
+def wait_for_job(job, timeout=5):
+    """ Poll until the job has finished. """
+    deadline = time.time() + timeout
+    while not job.is_finished and time.time() < deadline:
+        time.sleep(0.01)
+    assert job.is_finished, f"Job still {job.status} after {timeout}s"
+
+
+class TestJobManager:
+    def test_job_result_and_progress(self, app):
+        manager = JobManager(app)
+
+        def target(job, value):
+            job.report_progress(processed=1, total=1)
+            return value * 2
+
+        job = manager.start_job("test", target, 21)
+        wait_for_job(job)
+
+        assert job.status == "completed"
+        assert job.result == 42
+        assert job.progress == {'processed': 1, 'total': 1}
+        assert manager.get_job(job.id) is job
+
+    def test_failed_job_records_error(self, app):
+        manager = JobManager(app)
+
+        def target(job):
+            raise ValueError("Something broke")
+
+        job = manager.start_job("test", target)
+        wait_for_job(job)
+
+        assert job.status == "failed"
+        assert job.error == "Something broke"
+
+    def test_cancel_job(self, app):
+        manager = JobManager(app)
+        started = threading.Event()
+
+        def target(job):
+            started.set()
+            while True:
+                job.report_progress()
+                job.cancel_event.wait(0.01)
+
+        job = manager.start_job("test", target)
+        started.wait(5)
+        manager.cancel_job(job.id)
+        wait_for_job(job)
+
+        assert job.status == "cancelled"
+
+    def test_exclusive_jobs_cannot_overlap(self, app):
+        manager = JobManager(app)
+        release = threading.Event()
+
+        def target(job):
+            release.wait(5)
+
+        first_job = manager.start_job("export", target, exclusive=True)
+        with pytest.raises(JobAlreadyRunningError):
+            manager.start_job("export", target, exclusive=True)
+
+        release.set()
+        wait_for_job(first_job)
+
+        second_job = manager.start_job("export", target, exclusive=True)
+        wait_for_job(second_job)
+        assert second_job.status == "completed"
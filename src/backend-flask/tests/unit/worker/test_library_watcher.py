@@ -0,0 +1,106 @@
+import pytest
+
+from app.extensions import db
+from app.models import PartialDownload, Playlist, PlaylistTrack, Track
+from app.repositories.playlist_repository import PlaylistRepository
+from app.services.library_reconciliation_service import LibraryReconciliationService
+from app.utils.library_index import LibraryIndex
+from app.workers.library_watcher import InotifyBackend, PollingBackend
+
+
+def read_all_changes(backend, attempts=10):
+    """ Read changes from a backend until it reports some. """
+    for _ in range(attempts):
+        changes = backend.read_changes(timeout=0.2)
+        if changes:
+            return sorted(changes)
+    return []
+
+
+class TestLibraryWatcherBackends:
+    def test_polling_backend_detects_changes(self, tmp_path):
+        (tmp_path / "old.mp3").write_bytes(b"audio")
+        backend = PollingBackend(LibraryIndex.build(str(tmp_path)), interval=0)
+
+        (tmp_path / "old.mp3").unlink()
+        (tmp_path / "new.mp3").write_bytes(b"audio")
+        (tmp_path / "notes.txt").write_text("not audio")
+
+        assert read_all_changes(backend) == [("created", "new.mp3"), ("deleted", "old.mp3")]
+
+    @pytest.mark.skipif(not InotifyBackend.is_available(), reason="inotify is Linux only")
+    def test_inotify_backend_detects_changes(self, tmp_path):
+        (tmp_path / "old.mp3").write_bytes(b"audio")
+        backend = InotifyBackend(LibraryIndex.build(str(tmp_path)))
+        try:
+            (tmp_path / "old.mp3").unlink()
+            (tmp_path / "sub").mkdir()
+            (tmp_path / "sub" / "new.mp3").write_bytes(b"audio")
+
+            changes = []
+            for _ in range(10):
+                changes += backend.read_changes(timeout=0.2)
+                if len(changes) >= 2:
+                    break
+            assert ("deleted", "old.mp3") in changes
+            assert any(change == "created" and path.endswith("new.mp3") for change, path in changes)
+        finally:
+            backend.close()
+
+
+@pytest.mark.usefixtures("init_database")
+class TestApplyFileChanges:
+    """
+    Tests for applying watched file changes to the database.
+
+    Tests Include:
+    - Moved files are relocated, deleted files cleared and new files adopted
+    - Downloaded track counts of the affected playlists
+    - Files of downloads in progress are left to the download
+    """
+
+    def test_apply_file_changes(self, tmp_path):
+        moved = Track(platform_id="1", platform="spotify", name="Moved", artist="A", download_location="moved.mp3")
+        deleted = Track(platform_id="2", platform="spotify", name="Deleted", artist="A",
+                        download_location="deleted.mp3")
+        added = Track(platform_id="3", platform="soundcloud", name="Added", artist="A")
+        playlist = Playlist(name="Playlist", platform="spotify", external_id="pl")
+        db.session.add_all([moved, deleted, added, playlist])
+        db.session.flush()
+        for order, track in enumerate([moved, deleted, added]):
+            db.session.add(PlaylistTrack(playlist_id=playlist.id, track_id=track.id, track_order=order))
+        db.session.commit()
+
+        index = LibraryIndex(str(tmp_path), ["sub/moved.mp3", "Added.mp3"])
+        result = LibraryReconciliationService.apply_file_changes(
+            index, created=["sub/moved.mp3", "Added.mp3"], deleted=["moved.mp3", "deleted.mp3"])
+
+        assert [change['track_id'] for change in result['relocated']] == [moved.id]
+        assert [change['track_id'] for change in result['missing']] == [deleted.id]
+        assert [change['track_id'] for change in result['adopted']] == [added.id]
+        assert result['playlist_ids'] == [playlist.id]
+
+        db.session.expire_all()
+        assert db.session.get(Track, deleted.id).download_location is None
+        assert db.session.get(Track, added.id).download_location == "Added.mp3"
+        assert PlaylistRepository.get_downloaded_track_counts([playlist.id]) == {playlist.id: 2}
+
+    def test_download_in_progress_is_left_alone(self, tmp_path):
+        downloading = Track(platform_id="1", platform="youtube", name="Mix", artist="DJ")
+        db.session.add(downloading)
+        db.session.flush()
+        db.session.add(PartialDownload(track_id=downloading.id, file_stem="Mix - DJ", source_url="http://video/1"))
+        db.session.commit()
+
+        # The raw download, then the transcode replacing it with the MP3 before the track records it
+        index = LibraryIndex(str(tmp_path), ["Mix - DJ.m4a"])
+        raw = LibraryReconciliationService.apply_file_changes(index, created=["Mix - DJ.m4a"], deleted=[])
+        index.remove("Mix - DJ.m4a")
+        index.add("Mix - DJ.mp3")
+        transcoded = LibraryReconciliationService.apply_file_changes(index, created=["Mix - DJ.mp3"],
+                                                                     deleted=["Mix - DJ.m4a"])
+
+        for result in (raw, transcoded):
+            assert result['adopted'] == [] and result['missing'] == []
+        db.session.expire_all()
+        assert db.session.get(Track, downloading.id).download_location is None
@@ -0,0 +1,155 @@
+import json
+import os
+import subprocess
+import sys
+from datetime import datetime, timedelta
+
+import pytest
+
+from app.extensions import db
+from app.models import Folder, Playlist
+from app.workers import sync_scheduler
+from app.workers.download_queue import PRIORITY_BACKGROUND
+from app.workers.sync_scheduler import SyncScheduler
+from config import Config
+
+NOW = datetime(2024, 1, 1, 12, 0)
+
+
+class FakeDownloadManager:
+    """ Records queued playlists, which stay pending until finished. """
+
+    def __init__(self):
+        self.queued = {}
+
+    def add_to_queue(self, playlist_id, quick_sync=False, priority=None):
+        self.queued[playlist_id] = priority
+
+    def is_playlist_pending(self, playlist_id):
+        return playlist_id in self.queued
+
+
+@pytest.mark.usefixtures("init_database")
+class TestSyncScheduler:
+    """
+    Tests for the SyncScheduler class.
+
+    Tests Include:
+    - Playlists use their folder's sync interval and are first due with jitter
+    - Due playlists are synced and queued at background priority, at most max_concurrent at a time
+    - Syncs only start inside the configured windows
+    - Settings are validated and saved through the API, and loaded on startup
+    - Playlist and folder sync intervals are validated
+    """
+
+    @pytest.fixture
+    def scheduler(self, app, monkeypatch):
+        monkeypatch.setattr(Config, "SYNC_SCHEDULE", {'windows': [], 'max_concurrent': 2, 'jitter': 0.1})
+        monkeypatch.setattr(app, "download_manager", FakeDownloadManager())
+        synced = []
+        monkeypatch.setattr(sync_scheduler.PlaylistManagerService, "sync_playlists",
+                            staticmethod(lambda playlists: synced.extend(playlist.id for playlist in playlists)))
+        scheduler = SyncScheduler(app)
+        scheduler.synced = synced
+        return scheduler
+
+    @staticmethod
+    def _add_playlist(name, sync_interval=None, folder=None, next_sync_at=None, last_synced=None):
+        playlist = Playlist(name=name, platform="youtube", external_id=name, sync_interval=sync_interval,
+                            folder=folder, next_sync_at=next_sync_at, last_synced=last_synced)
+        db.session.add(playlist)
+        db.session.commit()
+        return playlist
+
+    def test_folder_interval_and_jitter(self, scheduler):
+        parent = Folder(name="Weekly", sync_interval=60 * 24 * 7)
+        child = Folder(name="Sets", parent=parent)
+        own = self._add_playlist("Own", sync_interval=60, folder=child, last_synced=NOW - timedelta(minutes=30))
+        inherited = self._add_playlist("Inherited", folder=child)
+        unscheduled = self._add_playlist("Manual", next_sync_at=NOW)
+
+        assert scheduler.tick(NOW) == []
+
+        db.session.expire_all()
+        assert SyncScheduler.get_interval(inherited) == timedelta(days=7)
+        assert NOW + timedelta(minutes=30) <= own.next_sync_at <= NOW + timedelta(minutes=36)
+        assert NOW <= inherited.next_sync_at <= NOW + timedelta(days=0.7)
+        assert unscheduled.next_sync_at is None
+
+    def test_due_playlists_are_bounded(self, scheduler, app):
+        playlists = [self._add_playlist(f"Playlist {i}", sync_interval=60, next_sync_at=NOW - timedelta(minutes=i))
+                     for i in range(3)]
+
+        started = scheduler.tick(NOW)
+        scheduler.wait_for_syncs()
+
+        # The longest overdue go first, the third waits for one to finish downloading
+        assert started == [playlists[2].id, playlists[1].id]
+        assert sorted(scheduler.synced) == sorted(started)
+        assert app.download_manager.queued == {playlist_id: PRIORITY_BACKGROUND for playlist_id in started}
+        db.session.expire_all()
+        assert all(NOW + timedelta(minutes=60) <= playlists[i].next_sync_at <= NOW + timedelta(minutes=66)
+                   for i in (1, 2))
+        assert scheduler.tick(NOW) == []
+
+        del app.download_manager.queued[playlists[2].id]
+        assert scheduler.tick(NOW) == [playlists[0].id]
+
+    def test_windows(self, scheduler, monkeypatch):
+        self._add_playlist("Nightly", sync_interval=60, next_sync_at=NOW - timedelta(minutes=1))
+        monkeypatch.setattr(Config, "SYNC_SCHEDULE", {'windows': [{'start': '23:00', 'end': '06:00', 'days': None}],
+                                                      'max_concurrent': 2, 'jitter': 0.1})
+
+        assert SyncScheduler.is_open(datetime(2024, 1, 2, 3, 0))
+        assert not SyncScheduler.is_open(datetime(2024, 1, 2, 12, 0))
+        monkeypatch.setattr(SyncScheduler, "is_open", staticmethod(lambda now=None: False))
+        assert scheduler.tick(NOW) == []
+        monkeypatch.setattr(SyncScheduler, "is_open", staticmethod(lambda now=None: True))
+        assert len(scheduler.tick(NOW)) == 1
+
+    def test_set_settings_route(self, client, tmp_path, monkeypatch):
+        monkeypatch.setattr(Config, "SETTINGS_PATH", str(tmp_path / "settings.yml"))
+        # Saving reloads every setting from the file, put the test ones back afterwards
+        for key in ("SPOTIFY_CLIENT_ID", "SPOTIFY_CLIENT_SECRET", "SOUNDCLOUD_CLIENT_ID", "SYNC_SCHEDULE"):
+            monkeypatch.setattr(Config, key, getattr(Config, key))
+
+        response = client.put('/api/sync-schedule', json={'windows': [{'start': '01:00', 'end': '06:00'}],
+                                                          'max_concurrent': 3})
+
+        assert response.status_code == 200
+        assert response.get_json()['settings'] == {'windows': [{'start': '01:00', 'end': '06:00', 'days': None}],
+                                                   'max_concurrent': 3, 'jitter': 0.1}
+        assert client.put('/api/sync-schedule', json={'max_concurrent': 0}).status_code == 400
+        assert client.put('/api/sync-schedule', json={'windows': [{'start': '1am'}]}).status_code == 400
+
+    def test_settings_are_loaded_on_startup(self, client, tmp_path, monkeypatch):
+        monkeypatch.setattr(Config, "SETTINGS_PATH", str(tmp_path / "settings.yml"))
+        for key in ("SPOTIFY_CLIENT_ID", "SPOTIFY_CLIENT_SECRET", "SOUNDCLOUD_CLIENT_ID", "SYNC_SCHEDULE"):
+            monkeypatch.setattr(Config, key, getattr(Config, key))
+        schedule = {'windows': [{'start': '01:00', 'end': '06:00'}], 'max_concurrent': 4, 'jitter': 0.2}
+        assert client.put('/api/sync-schedule', json=schedule).status_code == 200
+
+        # A new process reads the settings file two folders above its working directory
+        working_directory = tmp_path / "app" / "backend"
+        working_directory.mkdir(parents=True)
+        backend_folder = os.path.dirname(os.path.abspath(sys.modules[Config.__module__].__file__))
+        script = "import json; from config import Config; print(json.dumps(Config.SYNC_SCHEDULE))"
+        output = subprocess.run(
+            [sys.executable, "-c", script],
+            cwd=working_directory, env={**os.environ, 'PYTHONPATH': backend_folder}, capture_output=True, check=True)
+
+        assert json.loads(output.stdout) == {'windows': [{'start': '01:00', 'end': '06:00', 'days': None}],
+                                             'max_concurrent': 4, 'jitter': 0.2}
+
+    def test_sync_interval_validation(self, client):
+        folder = Folder(name="Folder")
+        playlist = self._add_playlist("Playlist", folder=folder)
+
+        for sync_interval in (True, 5, "60", 1.5):
+            assert client.put(f'/api/folders/{folder.id}', json={'sync_interval': sync_interval}).status_code == 400
+            assert client.patch(f'/api/playlists/{playlist.id}',
+                                json={'sync_interval': sync_interval}).status_code == 400
+
+        assert client.put(f'/api/folders/{folder.id}', json={'sync_interval': 60}).get_json()['sync_interval'] == 60
+        assert client.patch(f'/api/playlists/{playlist.id}',
+                            json={'sync_interval': None}).get_json()['sync_interval'] is None
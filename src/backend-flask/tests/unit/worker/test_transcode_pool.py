@@ -0,0 +1,67 @@
+import subprocess
+import threading
+
+import pytest
+
+from app.workers import transcode_pool
+from app.workers.transcode_pool import TranscodeError, TranscodePool
+
+
+class TestTranscodePool:
+    """
+    Tests for the TranscodePool.
+
+    Tests Include:
+    - Submitting blocks once the pool's queue is full, until work finishes
+    - Transcoding replaces the raw download with the MP3
+    - A failed transcode leaves the raw download and no partial MP3
+    """
+
+    def test_submit_blocks_when_queue_full(self):
+        pool = TranscodePool(workers=1, max_pending=1)
+        release = threading.Event()
+        first = pool.submit(release.wait)
+
+        submitted = threading.Event()
+        threading.Thread(target=lambda: (pool.submit(lambda: None), submitted.set()), daemon=True).start()
+
+        assert not submitted.wait(0.2)
+        release.set()
+        assert submitted.wait(5)
+        assert first.result(timeout=5)
+        pool.shutdown()
+
+    def test_transcode_replaces_raw_download(self, tmp_path, monkeypatch):
+        source = tmp_path / "Track.webm"
+        source.write_bytes(b"raw audio")
+        commands = []
+
+        def fake_run(command, **kwargs):
+            commands.append(command)
+            with open(command[-1], 'wb') as f:
+                f.write(b"mp3 audio")
+            return subprocess.CompletedProcess(command, 0, b"", b"")
+
+        monkeypatch.setattr(transcode_pool.subprocess, "run", fake_run)
+
+        result = TranscodePool.transcode_to_mp3("ffmpeg", str(source), str(tmp_path / "Track.mp3"))
+
+        assert result == str(tmp_path / "Track.mp3")
+        assert sorted(path.name for path in tmp_path.iterdir()) == ["Track.mp3"]
+        assert commands[0][0] == "ffmpeg" and "libmp3lame" in commands[0]
+
+    def test_failed_transcode_leaves_no_partial_file(self, tmp_path, monkeypatch):
+        source = tmp_path / "Track.webm"
+        source.write_bytes(b"raw audio")
+
+        def fake_run(command, **kwargs):
+            with open(command[-1], 'wb') as f:
+                f.write(b"half an mp3")
+            return subprocess.CompletedProcess(command, 1, b"", b"Invalid data found")
+
+        monkeypatch.setattr(transcode_pool.subprocess, "run", fake_run)
+
+        with pytest.raises(TranscodeError, match="Invalid data found"):
+            TranscodePool.transcode_to_mp3("ffmpeg", str(source), str(tmp_path / "Track.mp3"))
+
+        assert sorted(path.name for path in tmp_path.iterdir()) == ["Track.webm"]
@@ -41,10 +41,27 @@ export function deletePlaylists(playlistIds) {
     });
 }
 
-export function exportAll() {
-    return request('/api/export', {
-        method: 'GET',
+const EXPORT_POLL_INTERVAL_MS = 1000;
+
+// Starts a background export job and resolves with its result once the job has finished
+// format: 'itunes' (default) or 'rekordbox' for the native DJ_PLAYLISTS format
+export async function exportAll(format = 'itunes') {
+    let job = await request('/api/export', {
+        method: 'POST',
+        body: { format },
     });
+
+    while (job.status === 'queued' || job.status === 'running') {
+        await new Promise(resolve => setTimeout(resolve, EXPORT_POLL_INTERVAL_MS));
+        job = await request(`/api/export/${job.id}`, {
+            method: 'GET',
+        });
+    }
+
+    if (job.status !== 'completed') {
+        throw new Error(job.error || `Export ${job.status}`);
+    }
+    return job.result;
 }
 
 export function cancelDownload(playlistId) {
@@ -2,6 +2,8 @@
 import React, { useState, useEffect } from 'react';
 import { backendUrl } from '../config';
 
+const DOWNLOAD_POLL_INTERVAL_MS = 1000;
+
 const TrackModal = ({ track, onClose, handleUpdateTrack }) => {
     const [downloadUrl, setDownloadUrl] = useState(track.download_url || '');
     const [downloadLocation, setDownloadLocation] = useState(track.download_location || '');
@@ -75,10 +77,21 @@ const TrackModal = ({ track, onClose, handleUpdateTrack }) => {
                 method: 'POST',
             });
             if (response.ok) {
-                const updatedTrack = await response.json();
-                handleUpdateTrack(updatedTrack);
-                setDownloadLocation(updatedTrack.download_location || '');
-                setDownloadUrl(updatedTrack.download_url || '');
+                // The download runs in the background, poll its job until it has finished
+                let job = await response.json();
+                while (job.status === 'queued' || job.status === 'running') {
+                    await new Promise(resolve => setTimeout(resolve, DOWNLOAD_POLL_INTERVAL_MS));
+                    const jobResponse = await fetch(`${backendUrl}/api/tracks/download-jobs/${job.id}`);
+                    job = await jobResponse.json();
+                }
+                if (job.status === 'completed') {
+                    const updatedTrack = job.result;
+                    handleUpdateTrack(updatedTrack);
+                    setDownloadLocation(updatedTrack.download_location || '');
+                    setDownloadUrl(updatedTrack.download_url || '');
+                } else {
+                    setError(job.error || `Re-download ${job.status}`);
+                }
             } else {
                 const data = await response.json();
                 setError(data.error || 'Failed to re-download track');
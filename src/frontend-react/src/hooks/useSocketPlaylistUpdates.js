@@ -89,6 +89,20 @@ export function useSocketPlaylistUpdates() {
             })
         })
 
+        // Handle downloaded track counts changed by the library watcher
+        socket.on('library_updated', data => {
+            const counts = Object.fromEntries(data.playlists.map(p => [p.id, p.downloaded_track_count]))
+            queryClient.setQueryData(['playlists'], old => {
+                if (!old) return old
+
+                return old.map(playlist =>
+                    playlist.id in counts
+                        ? { ...playlist, downloaded_track_count: counts[playlist.id] }
+                        : playlist
+                )
+            })
+        })
+
         return () => {
             socket.disconnect()
         }